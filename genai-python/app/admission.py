@@ -0,0 +1,188 @@
+"""
+Admission control for agent runs.
+A bounded number of agent turns run at once; further requests wait in a bounded
+FIFO queue until a slot frees up or their queue deadline passes. Once saturated,
+requests are shed immediately with 429 (queue full) or 503 (waited too long)
+and a Retry-After estimate.
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"Request rejected by admission control ({reason})")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """An admission slot held by one request; released exactly once"""
+
+    def __init__(self, controller: Optional["AdmissionController"]):
+        self._controller = controller
+        self._acquired_at = time.monotonic()
+
+    def release(self):
+        controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._release(time.monotonic() - self._acquired_at)
+
+    def __del__(self):
+        # Safety net for streaming responses whose generator never started
+        self.release()
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, deadline-aware wait queue"""
+
+    def __init__(self):
+        self.max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+        self.max_queue = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+        self.queue_timeout_seconds = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "15"))
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # Moving average of how long a request holds its slot, for Retry-After estimates
+        self._avg_hold_seconds = 1.0
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Take an admission slot, waiting in the queue if all slots are busy.
+
+        Returns:
+            Ticket that must be released when the agent run finishes
+
+        Raises:
+            AdmissionRejected: When the queue is full or the queue deadline passes
+        """
+        if not self.enabled:
+            return AdmissionTicket(None)
+
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self._admit(0.0)
+            return AdmissionTicket(self)
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", 429)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued_total += 1
+        self._publish()
+        started = time.monotonic()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout_seconds)
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot that was already handed over
+            if future.done() and not future.cancelled():
+                self._release(0.0)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                self._discard(future)
+
+        if not done:
+            self._reject("queue_timeout", 503)
+
+        # The releasing request handed its slot over, so in_flight already counts this one
+        self._admit(time.monotonic() - started)
+        return AdmissionTicket(self)
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold an admission slot for the enclosed block"""
+        ticket = await self.acquire()
+        try:
+            yield
+        finally:
+            ticket.release()
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free, from the queue length and average hold time"""
+        slots = max(self.max_concurrency, 1)
+        return max(1, math.ceil(self._avg_hold_seconds * (len(self._waiters) + 1) / slots))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout_seconds,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "rejected": dict(self.rejected),
+            "avg_wait_ms": round(self.total_wait_seconds / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "avg_hold_ms": round(self._avg_hold_seconds * 1000, 2),
+            "retry_after_seconds": self.retry_after()
+        }
+
+    def _admit(self, waited: float):
+        self.admitted += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        metrics.observe_stage("admission_wait", waited)
+        self._publish()
+
+    def _reject(self, reason: str, status_code: int):
+        self.rejected[reason] += 1
+        metrics.admission_rejections.increment(reason=reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding chat request ({reason}): {self.in_flight} in flight, "
+                       f"{len(self._waiters)} queued, retry after {retry_after}s")
+        raise AdmissionRejected(reason, status_code, retry_after)
+
+    def _release(self, held_seconds: float):
+        if held_seconds > 0:
+            self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held_seconds
+        # Hand the slot straight to the oldest live waiter so newcomers cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def _discard(self, future: asyncio.Future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+        self._publish()
+
+    def _publish(self):
+        metrics.admission_in_flight.set(self.in_flight)
+        metrics.admission_queue_depth.set(len(self._waiters))
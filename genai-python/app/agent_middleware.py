@@ -0,0 +1,250 @@
+"""
+Middleware for the LangChain agent graph.
+Imported together with langchain.agents when the agent is created, so it does
+not add to application startup.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+# LangChain 1.x imports - updated paths
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app import deadline
+from app.ai_functions import tool_result_failed
+from app.metrics import registry as metrics
+from app.rate_limit import RateLimiter
+from app.tokens import estimate_message_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_request_tokens(request: ModelRequest) -> int:
+    """Prompt tokens of a model call: system prompt, messages and tool schemas"""
+    tokens = estimate_tokens(request.system_prompt or "")
+    tokens += sum(estimate_message_tokens(message) for message in request.messages)
+    for tool in request.tools:
+        schema = getattr(tool, "args", None) or {}
+        tokens += estimate_tokens(f"{getattr(tool, 'name', '')} {getattr(tool, 'description', '')} "
+                                  f"{json.dumps(schema, default=str)}")
+    return tokens
+
+
+def _response_tokens(response) -> Optional[int]:
+    """Total tokens reported by the provider, when usage is available"""
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    total = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None) if isinstance(message, AIMessage) else None
+        if usage:
+            total += usage.get("total_tokens", 0)
+    return total or None
+
+
+class RateLimitMiddleware(AgentMiddleware):
+    """Sends every model call of the agent through the LLM rate limiter"""
+
+    def __init__(self, limiter: RateLimiter):
+        super().__init__()
+        self.limiter = limiter
+        # Completion tokens reserved per call until the provider reports the real usage
+        self.completion_tokens = int(os.getenv("LLM_RATE_LIMIT_COMPLETION_TOKENS", "300"))
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        estimated = estimate_request_tokens(request) + self.completion_tokens
+        return await self.limiter.call(lambda: handler(request), estimated, usage=_response_tokens)
+
+
+class ToolExecutionMiddleware(AgentMiddleware):
+    """
+    Per-tool timeouts and timing for the agent's tool calls.
+    Tool calls of one model response already run concurrently as separate graph
+    tasks (bounded by the graph's max_concurrency). A call that exceeds its
+    timeout, or the time left until the turn deadline, is cancelled, and the model
+    gets an error result instead of waiting for the slow dependency.
+    """
+
+    def __init__(self, timeouts: Dict[str, float]):
+        super().__init__()
+        self.timeouts = timeouts
+        self.default_timeout = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+        self._stats: Dict[str, dict] = {}
+
+    def _timeout(self, tool_name: str) -> Optional[float]:
+        """Timeout of a tool call, capped at the time left in the turn"""
+        timeout = self.timeouts.get(tool_name, self.default_timeout)
+        left = deadline.remaining()
+        if left is not None:
+            return left if timeout <= 0 else min(timeout, left)
+        return timeout if timeout > 0 else None
+
+    async def awrap_tool_call(self, request, handler):
+        tool_call = request.tool_call
+        name = tool_call["name"]
+        timeout = self._timeout(name)
+        status = "error"
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(handler(request), timeout)
+            status = "error" if tool_result_failed(result) else "ok"
+            if isinstance(result, ToolMessage):
+                if status == "error" and result.status != "error":
+                    # The tools report failures as an {"error": ...} payload; mark the
+                    # message so that later middleware and the history see the failure
+                    result = result.model_copy(update={"status": "error"})
+                content = result.content
+                metrics.tool_output_chars.observe(len(content if isinstance(content, str) else str(content)), tool=name)
+            return result
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.warning(f"Tool {name} timed out after {timeout:.1f}s")
+            return ToolMessage(
+                content=json.dumps({"error": f"{name} did not respond within {timeout:.0f}s; its result is unknown. "
+                                             f"Tell the user the service is slow and to try again later."}),
+                tool_call_id=tool_call["id"],
+                name=name,
+                status="error"
+            )
+        except asyncio.CancelledError:
+            # The turn was cancelled (deadline or client disconnect) while the tool was running
+            status = "cancelled"
+            raise
+        finally:
+            self._record(name, status, time.perf_counter() - start)
+
+    def _record(self, name: str, status: str, elapsed: float):
+        metrics.observe_stage("tool", elapsed, tool=name)
+        metrics.tool_calls.increment(tool=name, status=status)
+        stats = self._stats.setdefault(name, {"calls": 0, "ok": 0, "error": 0, "timeout": 0, "cancelled": 0,
+                                               "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["calls"] += 1
+        stats[status] += 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "timeout_seconds": self.timeouts.get(name, self.default_timeout),
+                **{key: value for key, value in stats.items() if not key.endswith("_seconds")},
+                "avg_ms": round(stats["total_seconds"] / stats["calls"] * 1000, 2),
+                "max_ms": round(stats["max_seconds"] * 1000, 2)
+            }
+            for name, stats in sorted(self._stats.items())
+        }
+
+
+class ModelRouterMiddleware(AgentMiddleware):
+    """
+    Routes each model call of the agent to the fast model (the agent's own) or the strong model.
+    Lookups and tool-dispatch rounds stay on the fast model. Turns that called a write tool, turns
+    in which a tool failed or the model produced unusable tool calls, and turns that need many rounds
+    are escalated; so is a call whose fast attempt failed. Without a strong model every call stays fast.
+    """
+
+    def __init__(self, strong_model, write_tools):
+        super().__init__()
+        self.strong_model = strong_model
+        self.write_tools = set(write_tools)
+        self.enabled = strong_model is not None and os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+        # Model calls within one turn after which the strong model takes over
+        self.max_fast_rounds = int(os.getenv("MODEL_ROUTING_MAX_FAST_ROUNDS", "3"))
+        self._tiers: Dict[str, dict] = {}
+        self._reasons: Dict[str, int] = {}
+
+    def route(self, messages: list) -> Tuple[str, str]:
+        """
+        Pick the tier for the next model call from the current turn's messages.
+
+        Args:
+            messages: Messages of the model request
+
+        Returns:
+            Tuple of (tier, reason)
+        """
+        start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        turn = messages[start + 1:]
+        if not self.enabled:
+            return "fast", "single_model"
+
+        ai_messages = [m for m in turn if isinstance(m, AIMessage)]
+        if any(isinstance(m, ToolMessage) and tool_result_failed(m) for m in turn):
+            return "strong", "tool_error"
+        if any(m.invalid_tool_calls for m in ai_messages):
+            return "strong", "invalid_tool_call"
+        if len(ai_messages) >= self.max_fast_rounds:
+            return "strong", "many_rounds"
+        # Only an actual write tool call escalates; wording such as "can I book" or "did the
+        # schedule change" is often a question, and dispatch rounds should stay fast
+        if any(call["name"] in self.write_tools for m in ai_messages for call in m.tool_calls):
+            return "strong", "write"
+        return "fast", "tool_result" if ai_messages else "lookup"
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        tier, reason = self.route(request.messages)
+        if tier == "fast" and self.enabled:
+            try:
+                response = await self._call(request, handler, tier, reason)
+            except Exception as e:
+                logger.warning(f"Fast model call failed ({e}); retrying with the strong model")
+                return await self._call(request.override(model=self.strong_model), handler, "strong", "fast_error")
+            if not self._usable(response):
+                return await self._call(request.override(model=self.strong_model), handler, "strong", "fast_unusable")
+            return response
+        if tier == "strong":
+            request = request.override(model=self.strong_model)
+        return await self._call(request, handler, tier, reason)
+
+    @staticmethod
+    def _usable(response) -> bool:
+        """A fast answer is kept unless it is empty or only contains malformed tool calls"""
+        messages = response.result if isinstance(response, ModelResponse) else [response]
+        for message in messages:
+            if isinstance(message, AIMessage):
+                if message.invalid_tool_calls and not message.tool_calls:
+                    return False
+                if not message.tool_calls and not message.content:
+                    return False
+        return True
+
+    async def _call(self, request: ModelRequest, handler, tier: str, reason: str):
+        metrics.model_routing.increment(tier=tier, reason=reason)
+        self._reasons[f"{tier}:{reason}"] = self._reasons.get(f"{tier}:{reason}", 0) + 1
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await handler(request)
+            status = "ok"
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_stage("model_call", elapsed, tier=tier, status=status)
+            stats = self._tiers.setdefault(tier, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            if status == "error":
+                stats["errors"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "strong_model": getattr(self.strong_model, "model_name", None) or
+            getattr(self.strong_model, "deployment_name", None),
+            "max_fast_rounds": self.max_fast_rounds,
+            "tiers": {
+                tier: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "avg_ms": round(stats["total_seconds"] / stats["calls"] * 1000, 2),
+                    "max_ms": round(stats["max_seconds"] * 1000, 2)
+                }
+                for tier, stats in sorted(self._tiers.items())
+            },
+            "decisions": dict(sorted(self._reasons.items()))
+        }
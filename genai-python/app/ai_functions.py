@@ -3,6 +3,7 @@ AI Functions (Tools) for LangChain Agent.
 These functions are callable by the LLM to perform actions.
 """
 
+import os
 import logging
 import json
 from typing import List
@@ -11,10 +12,67 @@ from langchain_core.tools import tool
 
 from app.data_provider import DataProvider
 from app.vector_store import VectorStoreController
-from app.models import OwnerRequest, PetRequest
+from app.models import Owner, OwnerRequest, PetRequest
+from app.tokens import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# Fields that list_owners can project
+OWNER_FIELDS = ("id", "firstName", "lastName", "address", "city", "telephone", "pets")
+
+# Tools that change data; turns that use them are routed to the stronger model
+WRITE_TOOLS = ("add_owner_to_petclinic", "add_pet_to_owner")
+
+# Seconds a tool may run before the model gets a timeout error instead of its result, for
+# tools that differ from TOOL_TIMEOUT_SECONDS. Writes get longer, since a timed-out write
+# leaves its outcome unknown.
+TOOL_TIMEOUTS = {
+    "add_owner_to_petclinic": 20.0,
+    "add_pet_to_owner": 20.0,
+}
+
+
+def tool_result_failed(message) -> bool:
+    """
+    Whether a tool result reports a failure: an error status (timeouts) or the
+    {"error": ...} payload the tools return instead of raising.
+    
+    Args:
+        message: ToolMessage returned by a tool call
+        
+    Returns:
+        True when the tool call failed
+    """
+    if getattr(message, "status", None) == "error":
+        return True
+    content = getattr(message, "content", None)
+    if not isinstance(content, str) or '"error"' not in content:
+        return False
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and "error" in payload
+
+
+def _compact_json(data) -> str:
+    """Serialize tool output without whitespace to keep LLM prompts small"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _project_owner(owner: Owner, fields) -> dict:
+    """Project an owner onto the requested fields, flattening pets to a compact form"""
+    data = {}
+    for field in fields:
+        if field == "pets":
+            data["pets"] = [
+                {"id": pet.id, "name": pet.name, "type": pet.type.name, "birthDate": pet.birthDate}
+                for pet in owner.pets or []
+            ]
+        else:
+            data[field] = getattr(owner, field)
+    return data
+
 
 class AIFunctions:
     """Container for AI functions that can be called by the LLM"""
@@ -23,6 +81,10 @@ class AIFunctions:
         self.data_provider = data_provider
         self.vector_store_controller = vector_store_controller
         
+        # Upper bound on the size of a list_owners result passed back to the LLM
+        self.owners_token_budget = int(os.getenv("LIST_OWNERS_TOKEN_BUDGET", "2000"))
+        self.owners_max_limit = int(os.getenv("LIST_OWNERS_MAX_LIMIT", "50"))
+        
     def get_tools(self):
         """
         Get all available tools for the LangChain agent.
@@ -32,22 +94,106 @@ class AIFunctions:
         """
         
         @tool
-        async def list_owners() -> str:
+        async def list_owners(
+            lastName: str = "",
+            city: str = "",
+            petName: str = "",
+            offset: int = 0,
+            limit: int = 20,
+            fields: str = ""
+        ) -> str:
             """
-            List all the owners that the pet clinic has.
-            Use this when the user asks about owners, their information, or wants to see all owners.
+            List the owners that the pet clinic has, optionally filtered.
+            Use this when the user asks about owners, their information, or wants to see owners.
+            Prefer filters over listing everyone. If the result says "more" is true, there are
+            additional matches: call again with offset set to "nextOffset" or narrow the filters.
             
+            Args:
+                lastName: Optional last name (prefix, case-insensitive)
+                city: Optional city (case-insensitive)
+                petName: Optional name of one of the owner's pets (case-insensitive)
+                offset: Number of matching owners to skip (for paging)
+                limit: Maximum number of owners to return (default 20)
+                fields: Optional comma-separated fields to return, from
+                    id, firstName, lastName, address, city, telephone, pets (default: all)
+                
             Returns:
-                JSON string containing list of owners with their pets
+                Compact JSON string with matching owners, the total match count and paging info
             """
+            # Clamp paging first: the offset is echoed back and nextOffset is computed from it
+            offset = max(offset, 0)
+            limit = min(max(limit, 1), self.owners_max_limit)
             try:
-                owners = await self.data_provider.get_all_owners()
-                owners_list = [owner.model_dump() for owner in owners]
-                return json.dumps({"owners": owners_list}, ensure_ascii=False, indent=2)
+                selected = [f.strip() for f in fields.split(",") if f.strip() in OWNER_FIELDS] or list(OWNER_FIELDS)
+                if "id" not in selected:
+                    selected.insert(0, "id")
+                
+                owners, total = await self.data_provider.find_owners(
+                    last_name=lastName,
+                    city=city,
+                    pet_name=petName,
+                    offset=offset,
+                    limit=limit
+                )
+                
+                # Add owners until the token budget is reached
+                result = {"total": total, "offset": offset, "owners": []}
+                used = estimate_tokens(_compact_json(result)) + 30
+                for owner in owners:
+                    row = _project_owner(owner, selected)
+                    cost = estimate_tokens(_compact_json(row)) + 1
+                    if result["owners"] and used + cost > self.owners_token_budget:
+                        break
+                    result["owners"].append(row)
+                    used += cost
+                
+                next_offset = offset + len(result["owners"])
+                if next_offset < total:
+                    result["more"] = True
+                    result["nextOffset"] = next_offset
+                
+                return _compact_json(result)
             except Exception as e:
                 logger.error(f"Error in list_owners: {e}")
                 return json.dumps({"error": str(e)})
         
+        @tool
+        async def find_owner(name: str = "", telephone: str = "", city: str = "", limit: int = 5) -> str:
+            """
+            Find specific owners by name, phone number and/or city.
+            Use this to look up an owner's id (for example before adding a pet) instead of
+            listing all owners. Names tolerate small typos; a phone number may be given in full
+            or by its last digits.
+            
+            Args:
+                name: Owner's first and/or last name
+                telephone: Owner's phone number or its last digits
+                city: Owner's city
+                limit: Maximum number of matches to return (default 5)
+                
+            Returns:
+                Compact JSON string with the matching owners and a match score (1.0 = exact)
+            """
+            try:
+                if not (name.strip() or telephone.strip() or city.strip()):
+                    return json.dumps({"error": "Provide at least one of name, telephone or city"})
+                
+                matches = await self.data_provider.search_owners(
+                    name=name,
+                    telephone=telephone,
+                    city=city,
+                    limit=min(max(limit, 1), self.owners_max_limit)
+                )
+                return _compact_json({
+                    "owners": [
+                        {**_project_owner(owner, OWNER_FIELDS), "score": round(score, 2)}
+                        for owner, score in matches
+                    ]
+                })
+            except Exception as e:
+                logger.error(f"Error in find_owner: {e}")
+                return json.dumps({"error": str(e)})
+        
         @tool
         async def add_owner_to_petclinic(
             firstName: str,
@@ -86,7 +232,7 @@ class AIFunctions:
                 return json.dumps({"error": str(e)})
         
         @tool
-        def list_vets(query: str = "") -> str:
+        async def list_vets(query: str = "") -> str:
             """
             List the veterinarians that the pet clinic has.
             Use this when the user asks about vets, veterinarians, or their specialties.
@@ -105,9 +251,13 @@ class AIFunctions:
                 # Determine top_k based on query
                 top_k = 50 if not query else 20
                 
-                results = self.vector_store_controller.search_vets(search_query, top_k=top_k)
+                results = await self.vector_store_controller.asearch_vets(search_query, top_k=top_k)
                 
-                return json.dumps({"vets": results}, ensure_ascii=False, indent=2)
+                response = {"vets": results}
+                if not self.vector_store_controller.ready:
+                    # Semantic search is still warming up; results come from the name/specialty lookup
+                    response["note"] = "Vet search is still starting up, so these results may be incomplete."
+                return json.dumps(response, ensure_ascii=False, indent=2)
             except Exception as e:
                 logger.error(f"Error in list_vets: {e}")
                 return json.dumps({"error": str(e)})
@@ -121,6 +271,7 @@ class AIFunctions:
         ) -> str:
             """
             Add a pet with the specified petTypeId to an owner identified by ownerId.
+            Use find_owner to look up the ownerId if you do not know it.
             
             The allowed Pet type IDs are:
             - 1: cat
@@ -161,8 +312,23 @@ class AIFunctions:
         # Return all tools
         return [
             list_owners,
+            find_owner,
             add_owner_to_petclinic,
             list_vets,
             add_pet_to_owner
         ]
+    
+    def get_tool_timeouts(self) -> dict:
+        """
+        Get the timeout of every tool: TOOL_TIMEOUT_SECONDS unless TOOL_TIMEOUTS differs,
+        overridable per tool with TOOL_TIMEOUT_<TOOL NAME>.
+        
+        Returns:
+            Dict of tool name to timeout in seconds (0 means no timeout)
+        """
+        default = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+        return {
+            tool.name: float(os.getenv(f"TOOL_TIMEOUT_{tool.name.upper()}", str(TOOL_TIMEOUTS.get(tool.name, default))))
+            for tool in self.get_tools()
+        }
 
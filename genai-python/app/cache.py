@@ -0,0 +1,178 @@
+"""
+Read-through cache with stale-while-revalidate and single-flight loading.
+Used by DataProvider to avoid repeated full fetches from other microservices.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """Cached value with the time it was loaded"""
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.loaded_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+
+class SingleFlightCache:
+    """
+    TTL cache where concurrent misses for the same key share one loader call.
+
+    Entries younger than ttl are served directly. Entries older than ttl but
+    within ttl + stale_ttl are served stale while one background refresh runs.
+    Older entries are treated as misses.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._entries: Dict[str, CacheEntry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped on every write so that loads started before it are not stored
+        self._generation = 0
+        # Bumped whenever cached data changes, for consumers that key on the data version
+        self.version = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a value from the cache, loading it on a miss.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function that fetches the value
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        if not self.enabled:
+            self.misses += 1
+            return await loader()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age < self.ttl:
+                self.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_load(key, loader)
+                return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def peek(self, key: str) -> Any:
+        """Get the cached value regardless of age, without loading or counting a lookup"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def update(self, key: str, fn: Callable[[Any], Any]):
+        """
+        Patch a cached value in place of invalidating it.
+
+        Args:
+            key: Cache key
+            fn: Function returning the new value from the current one
+        """
+        self._generation += 1
+        self.version += 1
+        # A load started before the write would return pre-write data; later readers must not join it
+        self._inflight.pop(key, None)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        try:
+            entry.value = fn(entry.value)
+        except Exception as e:
+            logger.warning(f"Failed to patch {self.name} cache entry {key}: {e}; invalidating")
+            self._entries.pop(key, None)
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        Invalidate one key, or the whole cache when no key is given.
+
+        Args:
+            key: Cache key to drop
+        """
+        self._generation += 1
+        self.version += 1
+        # Loads already running finish for their own callers but are no longer joined or stored
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Get cache hit/miss counters"""
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "entries": len(self._entries),
+            "version": self.version,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
+
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Start a single shared load for the key and store its result when done"""
+        generation = self._generation
+        future = asyncio.ensure_future(loader())
+        self._inflight[key] = future
+
+        def _done(f: asyncio.Future):
+            # A load detached by a write must not remove the load that replaced it
+            if self._inflight.get(key) is f:
+                self._inflight.pop(key)
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                self.errors += 1
+                logger.warning(f"Failed to load {self.name} cache entry {key}: {error}")
+                return
+            if generation == self._generation:
+                value = f.result()
+                previous = self._entries.get(key)
+                if previous is None or previous.value != value:
+                    self.version += 1
+                self._entries[key] = CacheEntry(value)
+
+        future.add_done_callback(_done)
+        return future
@@ -4,23 +4,29 @@ This module handles chat interactions with the LLM and function calling.
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Optional
-# #region agent log
-import json
-def _debug_log(location, message, data, hypothesis_id):
-    import time
-    log_entry = json.dumps({"location": location, "message": message, "data": data, "hypothesisId": hypothesis_id, "timestamp": int(time.time()*1000)})
-    print(f"[DEBUG] {log_entry}", flush=True)
-# #endregion
-# LangChain 1.x imports - using new create_agent API
-from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
+# LangChain 1.x imports - langchain.agents and langchain_openai are imported on first use
+# (in _create_agent / _init_llm) to keep application startup fast
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, ToolMessage
 
-from app.ai_functions import AIFunctions
+from app.ai_functions import AIFunctions, WRITE_TOOLS, tool_result_failed
 from app.data_provider import DataProvider
 from app.vector_store import VectorStoreController
+from app.conversation_store import ConversationStore
+from app.history import HistoryManager
+from app.shared_state import StateBackend
+from app.response_cache import ResponseCache
+from app.intent_router import IntentRouter
+from app.admission import AdmissionController, AdmissionRejected
+from app.rate_limit import llm_limiter
+from app.tokens import estimate_tokens
+from app.deadline import DeadlineExceeded, turn_deadline, remaining as deadline_remaining
+from app.metrics import MetricsCallbackHandler, registry as metrics
+from app.diagnostics import DiagnosticsCallbackHandler, diagnostics
 
 logger = logging.getLogger(__name__)
 
@@ -28,47 +34,112 @@ logger = logging.getLogger(__name__)
 class PetclinicChatClient:
     """Chat client for the Pet Clinic AI assistant"""
     
-    def __init__(self, data_provider: DataProvider, vector_store_controller: VectorStoreController):
+    def __init__(
+        self,
+        data_provider: DataProvider,
+        vector_store_controller: VectorStoreController,
+        state_backend: Optional[StateBackend] = None
+    ):
         self.data_provider = data_provider
         self.vector_store_controller = vector_store_controller
         
         # Initialize AI functions
         self.ai_functions = AIFunctions(data_provider, vector_store_controller)
+        self.tools = self.ai_functions.get_tools()
         
-        # Initialize LLM
+        # Initialize LLM (fast tier) and, when configured, the stronger model for escalated turns
         self.llm = self._init_llm()
+        self.strong_llm = self._init_llm(strong=True)
         
-        # Conversation history (stored in memory)
-        self.messages = []
+        # Conversation history per session (in memory, or in the shared state backend with several workers)
+        self.conversation_store = ConversationStore(state_backend)
         
-        # Create agent graph
+        # Keeps the history sent with each turn within a token budget
+        self.history = HistoryManager(summarizer=self._summarize)
+        
+        # Answers to repeated read-only questions
+        self.response_cache = ResponseCache(state_backend)
+        
+        # Bounded concurrency and wait queue for agent runs (fast path and cache hits bypass it)
+        self.admission = AdmissionController()
+        
+        # Template answers for simple intents, tried before the agent
+        self.intent_router = IntentRouter(self.tools, data_provider)
+        
+        # Time allowed for one agent turn; running tool calls are cancelled when it expires
+        self.turn_deadline_seconds = float(os.getenv("AGENT_TURN_DEADLINE_SECONDS", "60"))
+        # Tool calls of one model response that run at the same time
+        self.tool_max_concurrency = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+        # Streamed text a model round may produce before it is known not to call tools;
+        # past it the round's tokens are forwarded as they arrive
+        self.stream_holdback_chars = int(os.getenv("STREAM_HOLDBACK_CHARS", "200"))
+        
+        # Create agent graph (one compiled graph shared by all sessions)
         self.agent_graph = self._create_agent()
     
-    def _init_llm(self):
-        """Initialize the appropriate LLM based on environment variables"""
+    def _init_llm(self, strong: bool = False):
+        """
+        Initialize the appropriate LLM based on environment variables.
+        
+        Args:
+            strong: Build the stronger model that escalated turns are routed to
+                (OPENAI_STRONG_MODEL / AZURE_OPENAI_STRONG_DEPLOYMENT)
+            
+        Returns:
+            Chat model, or None for the strong tier when it is not configured
+        """
         azure_key = os.getenv("AZURE_OPENAI_KEY")
         azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         
         if azure_key and azure_endpoint:
-            logger.info("Using Azure OpenAI")
+            from langchain_openai import AzureChatOpenAI
+            
+            deployment = os.getenv("AZURE_OPENAI_STRONG_DEPLOYMENT") if strong else \
+                os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
+            if not deployment:
+                return None
+            logger.info(f"Using Azure OpenAI ({'strong' if strong else 'fast'} tier: {deployment})")
             return AzureChatOpenAI(
                 azure_endpoint=azure_endpoint,
                 api_key=azure_key,
-                azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o"),
+                azure_deployment=deployment,
                 temperature=0.7,
-                api_version="2024-02-15-preview"
+                api_version="2024-02-15-preview",
+                # Retries are done by the rate limiter middleware, which backs off for all callers together
+                max_retries=0
             )
         else:
-            logger.info("Using OpenAI")
+            from langchain_openai import ChatOpenAI
+            
+            model = os.getenv("OPENAI_STRONG_MODEL") if strong else os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+            if not model:
+                return None
+            logger.info(f"Using OpenAI ({'strong' if strong else 'fast'} tier: {model})")
             openai_key = os.getenv("OPENAI_API_KEY", "demo")
             return ChatOpenAI(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+                model=model,
                 temperature=0.7,
-                openai_api_key=openai_key
+                openai_api_key=openai_key,
+                # OpenAI-compatible endpoint, e.g. the local fake server used by the benchmarks
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                # Retries are done by the rate limiter middleware, which backs off for all callers together
+                max_retries=0
             )
     
+    async def _summarize(self, prompt: str) -> str:
+        """Summarize dropped conversation turns with the chat model (HISTORY_SUMMARY_ENABLED)"""
+        llm = self.llm.bind(max_tokens=self.history.summary_tokens)
+        response = await llm_limiter.call(
+            lambda: llm.ainvoke(prompt),
+            estimate_tokens(prompt) + self.history.summary_tokens,
+            usage=lambda result: (result.usage_metadata or {}).get("total_tokens")
+        )
+        return response.content
+    
     def _create_agent(self):
         """Create the LangChain agent graph with tools"""
+        from langchain.agents import create_agent
+        from app.agent_middleware import ModelRouterMiddleware, RateLimitMiddleware, ToolExecutionMiddleware
         
         # System prompt matching the Spring version
         system_message = """You are a friendly AI assistant designed to help with the management of a veterinarian pet clinic called Spring Petclinic.
@@ -83,32 +154,57 @@ When dealing with vets, if the user is unsure about the returned results, explai
 
 For owners, pets or visits - provide the correct data."""
         
-        # Get tools
-        tools = self.ai_functions.get_tools()
-        
         # Create agent using LangChain 1.x API with Splunk AI Agent Monitoring metadata
         # Per Splunk documentation: agent_name and workflow_name should be set via metadata
         # Reference: https://docs.splunk.com/observability/en/apm/apm-spans-traces/ai-agent-monitoring.html
-        agent_graph = create_agent(
-            model=self.llm,
-            tools=tools,
-            system_prompt=system_message,
-            debug=True
-        ).with_config({
+        config = {
             "metadata": {
                 "agent_name": "petclinic_assistant",
                 "workflow_name": "petclinic_ai_workflow"
             }
-        })
+        }
+        # Tool calls requested together run as parallel graph tasks, at most this many at once
+        if self.tool_max_concurrency > 0:
+            config["max_concurrency"] = self.tool_max_concurrency
+        if metrics.enabled:
+            # LLM call latency and token usage
+            config["callbacks"] = [MetricsCallbackHandler(metrics)]
+        # Agent steps as diagnostic events; switchable at runtime, unlike the graph's debug output.
+        # Attached per run (see _run_config) so that runs pay no callback dispatch while it is off
+        self.diagnostics_handler = DiagnosticsCallbackHandler(diagnostics)
+        
+        # Fast / strong model choice per model call, with per-tier latency
+        self.model_router = ModelRouterMiddleware(self.strong_llm, WRITE_TOOLS)
+        
+        # Per-tool timeouts, timing and timeout counts
+        self.tool_execution = ToolExecutionMiddleware(self.ai_functions.get_tool_timeouts())
+        
+        agent_graph = create_agent(
+            model=self.llm,
+            tools=self.tools,
+            system_prompt=system_message,
+            # Requests/tokens per minute limits and retries around every model call
+            middleware=[self.model_router, RateLimitMiddleware(llm_limiter), self.tool_execution],
+            # Full graph state dumps on every step; for local debugging only
+            debug=os.getenv("AGENT_DEBUG", "false").lower() == "true"
+        ).with_config(config)
         
         return agent_graph
     
-    async def chat(self, query: str) -> str:
+    def _run_config(self) -> Optional[dict]:
+        """Per-run graph config; adds the diagnostics callbacks only while diagnostics are enabled"""
+        if diagnostics.enabled:
+            return {"callbacks": [self.diagnostics_handler]}
+        return None
+    
+    async def chat(self, query: str, session_id: Optional[str] = None) -> str:
         """
         Process a chat message and return the response.
         
         Args:
             query: User's message
+            session_id: Conversation session id; without one the turn starts
+                from an empty history and nothing is remembered
             
         Returns:
             AI assistant's response
@@ -116,41 +212,304 @@ For owners, pets or visits - provide the correct data."""
         try:
             logger.info(f"Processing chat query: {query}")
             
-            # #region agent log
-            _debug_log("chat_client.py:chat", "Chat method entry", {"query": query[:30], "history_len": len(self.messages), "instance_id": id(self)}, "A")
-            # #endregion
-            
-            # Add user message to conversation history
-            self.messages.append(HumanMessage(content=query))
-            
-            # Invoke the agent graph with messages
-            response = await self.agent_graph.ainvoke({"messages": self.messages})
-            
-            # Extract the AI messages from response
-            ai_messages = [msg for msg in response.get("messages", []) if isinstance(msg, AIMessage)]
+            if session_id is None:
+                with metrics.timer("chat_request"):
+                    output, _ = await self._answer(query, [])
+                return output
             
-            if ai_messages:
-                # Get the last AI message
-                last_ai_message = ai_messages[-1]
-                output = last_ai_message.content
-                
-                # Update conversation history with the response
-                self.messages = response.get("messages", self.messages)
+            session = self.conversation_store.get_session(session_id)
+            async with session.lock:
+                history = self.history.for_prompt(await self.conversation_store.get_history(session_id))
+                if diagnostics.enabled:
+                    diagnostics.event("chat_client.py:chat", "Chat method entry",
+                                      {"query": query[:30], "history_len": len(history), "session_id": session_id})
                 
-                logger.info(f"Chat response generated successfully")
+                with metrics.timer("chat_request"):
+                    output, messages = await self._answer(query, history)
+                if messages is not None:
+                    # Update conversation history with the response
+                    await self.conversation_store.save_history(session_id, await self.history.for_storage(messages))
                 return output
-            else:
-                return "I'm sorry, I couldn't process that request."
             
+        except AdmissionRejected:
+            metrics.chat_requests.increment(path="shed")
+            raise
+        except DeadlineExceeded as e:
+            metrics.chat_requests.increment(path="deadline")
+            logger.warning(f"{e}; query: {query}")
+            return "Sorry, that took too long to process. Please try again in a moment."
         except Exception as e:
+            metrics.chat_requests.increment(path="error")
             logger.error(f"Error processing chat message: {e}", exc_info=True)
             return "Chat is currently unavailable. Please try again later."
     
-    def reset_memory(self):
-        """Reset the conversation memory"""
-        # #region agent log
-        _debug_log("chat_client.py:reset_memory", "Reset called", {"history_len_before": len(self.messages)}, "C")
-        # #endregion
-        self.messages = []
+    async def _answer(self, query: str, history: list):
+        """
+        Answer on the fast path or from the response cache when possible, otherwise run an agent turn.
+        Only the first turn of a conversation is cached, since later answers depend on history.
+        
+        Args:
+            query: User's message
+            history: Previous messages of the conversation
+            
+        Returns:
+            Tuple of (response text, updated message list or None when no answer was produced)
+        """
+        with metrics.timer("fast_path"):
+            routed = await self.intent_router.route(query)
+        if routed is not None:
+            metrics.chat_requests.increment(path="fast_path")
+            return routed, list(history) + [HumanMessage(content=query), AIMessage(content=routed)]
+        
+        cacheable = self.response_cache.enabled and not history
+        if not cacheable:
+            return await self._timed_turn(query, history)
+        
+        version = await self.data_provider.data_version()
+        cached = await self.response_cache.get(query, version)
+        if cached is not None:
+            metrics.chat_requests.increment(path="response_cache")
+            logger.info("Chat response served from the response cache")
+            return cached, [HumanMessage(content=query), AIMessage(content=cached)]
+        
+        output, messages = await self._timed_turn(query, history)
+        # Skip answers computed while the underlying data changed
+        if messages is not None and isinstance(output, str) and await self.data_provider.data_version() == version:
+            tool_names = [
+                tool_call["name"]
+                for message in messages if isinstance(message, AIMessage)
+                for tool_call in message.tool_calls
+            ]
+            # Answers to failed tool calls ("the customers service is unavailable") must not be replayed
+            tool_failed = any(isinstance(message, ToolMessage) and tool_result_failed(message) for message in messages)
+            await self.response_cache.put(query, version, output, tool_names, tool_failed=tool_failed)
+        return output, messages
+    
+    async def _timed_turn(self, query: str, history: list):
+        """Run an agent turn under admission control and record its latency for the fast path statistics"""
+        async with self.admission.admit():
+            start = time.perf_counter()
+            result = await self._run_turn(query, history)
+            elapsed = time.perf_counter() - start
+        self.intent_router.record_agent_turn(elapsed)
+        metrics.observe_stage("agent_turn", elapsed)
+        metrics.chat_requests.increment(path="agent")
+        return result
+    
+    async def _run_turn(self, query: str, history: list):
+        """
+        Run one agent turn on top of the given history.
+        
+        Args:
+            query: User's message
+            history: Previous messages of the conversation
+            
+        Returns:
+            Tuple of (response text, updated message list or None when no answer was produced)
+        """
+        # Add user message to a copy of the conversation history
+        messages = list(history) + [HumanMessage(content=query)]
+        
+        # Invoke the agent graph with messages; cancelling it at the deadline also cancels running tool calls
+        with turn_deadline(self.turn_deadline_seconds):
+            try:
+                response = await asyncio.wait_for(
+                    self.agent_graph.ainvoke({"messages": messages}, self._run_config()),
+                    self.turn_deadline_seconds if self.turn_deadline_seconds > 0 else None
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(self.turn_deadline_seconds)
+        
+        # Extract the AI messages from response
+        ai_messages = [msg for msg in response.get("messages", []) if isinstance(msg, AIMessage)]
+        
+        self._record_rounds(response.get("messages", []), len(messages))
+        
+        if ai_messages:
+            # Get the last AI message
+            output = ai_messages[-1].content
+            logger.info(f"Chat response generated successfully")
+            return output, response.get("messages", messages)
+        
+        return "I'm sorry, I couldn't process that request.", None
+    
+    async def chat_stream(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        include_tool_events: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Process a chat message and stream the response as it is generated.
+        
+        Args:
+            query: User's message
+            session_id: Conversation session id; without one nothing is remembered
+            include_tool_events: Also emit tool_start / tool_end progress events
+            
+        Yields:
+            Event dicts with "event" ("token", "tool_start", "tool_end", "error", "done") and "data"
+        """
+        try:
+            logger.info(f"Processing streaming chat query: {query}")
+            
+            if session_id is None:
+                async for event in self._stream_turn(query, [], None, include_tool_events):
+                    yield event
+                return
+            
+            session = self.conversation_store.get_session(session_id)
+            async with session.lock:
+                history = self.history.for_prompt(await self.conversation_store.get_history(session_id))
+                async for event in self._stream_turn(query, history, session_id, include_tool_events):
+                    yield event
+        
+        except DeadlineExceeded as e:
+            metrics.chat_requests.increment(path="deadline")
+            logger.warning(f"{e}; query: {query}")
+            yield {"event": "error", "data": "Sorry, that took too long to process. Please try again in a moment."}
+        except Exception as e:
+            logger.error(f"Error processing streaming chat message: {e}", exc_info=True)
+            yield {"event": "error", "data": "Chat is currently unavailable. Please try again later."}
+    
+    async def _stream_turn(
+        self,
+        query: str,
+        history: list,
+        session_id: Optional[str],
+        include_tool_events: bool
+    ) -> AsyncIterator[dict]:
+        """
+        Run one agent turn with the graph's async stream and translate it into events.
+        
+        Args:
+            query: User's message
+            history: Previous messages of the conversation
+            session_id: Session whose history is updated once the turn completes
+            include_tool_events: Also emit tool progress events
+            
+        Yields:
+            Event dicts for the streaming endpoint
+        """
+        messages = list(history) + [HumanMessage(content=query)]
+        final_state = None
+        streamed_text = False
+        start = time.perf_counter()
+        
+        # Only the final answer is streamed. Each model round's text is held back until the round
+        # completes without tool calls or grows past stream_holdback_chars; rounds that call tools,
+        # and rounds abandoned for a retry or an escalation to the strong model, are dropped.
+        rounds = {}
+        current_round = None
+        
+        # Tool calls are capped at the deadline and waiting for the next event is too;
+        # closing the stream cancels whatever the graph is still running
+        with turn_deadline(self.turn_deadline_seconds):
+            async with aclosing(self.agent_graph.astream(
+                {"messages": messages},
+                self._run_config(),
+                stream_mode=["messages", "updates", "values"]
+            )) as stream:
+                while True:
+                    try:
+                        async with asyncio.timeout(deadline_remaining()):
+                            mode, chunk = await anext(stream)
+                    except StopAsyncIteration:
+                        break
+                    except TimeoutError:
+                        raise DeadlineExceeded(self.turn_deadline_seconds)
+                    
+                    if mode == "messages":
+                        message, metadata = chunk
+                        # Only model tokens are streamed; tool outputs arrive as ToolMessages
+                        if not isinstance(message, AIMessageChunk):
+                            continue
+                        if message.id != current_round:
+                            self._drop_unfinished_round(rounds.get(current_round))
+                            current_round = message.id
+                        state = rounds.setdefault(message.id, {"pending": [], "size": 0, "live": False,
+                                                                "tools": False, "done": False})
+                        if message.tool_call_chunks or message.tool_calls:
+                            state["tools"] = True
+                            state["pending"].clear()
+                            continue
+                        text = message.content if isinstance(message.content, str) else ""
+                        if not text or state["tools"]:
+                            continue
+                        state["pending"].append(text)
+                        state["size"] += len(text)
+                        if state["live"] or state["size"] > self.stream_holdback_chars:
+                            state["live"] = True
+                            for token in state["pending"]:
+                                streamed_text = True
+                                yield {"event": "token", "data": token}
+                            state["pending"].clear()
+                    
+                    elif mode == "updates":
+                        for update in chunk.values():
+                            for message in (update or {}).get("messages", []):
+                                if isinstance(message, AIMessage):
+                                    state = rounds.get(message.id)
+                                    if state is not None:
+                                        state["done"] = True
+                                        if not message.tool_calls:
+                                            # The round answered without tools: release its held-back text
+                                            for token in state["pending"]:
+                                                streamed_text = True
+                                                yield {"event": "token", "data": token}
+                                        state["pending"].clear()
+                                    if include_tool_events:
+                                        for tool_call in message.tool_calls:
+                                            yield {"event": "tool_start", "data": {"name": tool_call["name"], "args": tool_call["args"]}}
+                                elif isinstance(message, ToolMessage) and include_tool_events:
+                                    yield {"event": "tool_end", "data": {"name": message.name, "status": message.status}}
+                    
+                    elif mode == "values":
+                        final_state = chunk
+        
+        final_messages = (final_state or {}).get("messages", [])
+        self._record_rounds(final_messages, len(messages))
+        metrics.observe_stage("stream_turn", time.perf_counter() - start)
+        metrics.chat_requests.increment(path="stream")
+        ai_messages = [msg for msg in final_messages if isinstance(msg, AIMessage)]
+        
+        if not ai_messages:
+            yield {"event": "token", "data": "I'm sorry, I couldn't process that request."}
+        else:
+            if not streamed_text:
+                # Model did not stream tokens (e.g. streaming unsupported); send the full answer at once
+                yield {"event": "token", "data": ai_messages[-1].content}
+            if session_id is not None:
+                await self.conversation_store.save_history(session_id, await self.history.for_storage(final_messages))
+        
+        logger.info(f"Streaming chat response completed")
+        yield {"event": "done", "data": ""}
+    
+    @staticmethod
+    def _drop_unfinished_round(state: Optional[dict]):
+        """Discard the held-back text of a model round that ended without a result (retried or escalated)"""
+        if state is None or state["done"]:
+            return
+        if state["live"]:
+            logger.warning("A streamed model round was retried after its text was sent")
+        state["pending"].clear()
+    
+    @staticmethod
+    def _record_rounds(messages: list, prompt_length: int):
+        """Record how many LLM calls the turn took (one per AI message it added)"""
+        rounds = sum(1 for msg in messages[prompt_length:] if isinstance(msg, AIMessage))
+        if rounds:
+            metrics.llm_rounds.observe(rounds)
+    
+    async def reset_memory(self, session_id: str):
+        """
+        Reset the conversation memory of one session.
+        
+        Args:
+            session_id: Session to reset
+        """
+        if diagnostics.enabled:
+            diagnostics.event("chat_client.py:reset_memory", "Reset called",
+                              {"session_id": session_id, "sessions_before": (await self.conversation_store.stats())["sessions"]})
+        await self.conversation_store.reset(session_id)
         logger.info("Conversation memory reset")
-
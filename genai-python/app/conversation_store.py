@@ -0,0 +1,208 @@
+"""
+Session-keyed conversation store.
+Keeps bounded per-session chat history so that concurrent chats never share messages.
+With a shared state backend the history is kept there, so any worker can continue a session.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from app.shared_state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _message_size(message: BaseMessage) -> int:
+    """Approximate the in-memory footprint of a message by its content length"""
+    content = message.content
+    if isinstance(content, str):
+        size = len(content)
+    else:
+        size = len(str(content))
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        size += len(str(tool_calls))
+    return size
+
+
+class ConversationSession:
+    """Conversation history and turn lock for a single session"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.messages: List[BaseMessage] = []
+        self.size = 0
+        self.last_access = time.monotonic()
+        # Serializes turns within the same session; different sessions run in parallel
+        self.lock = asyncio.Lock()
+
+
+class ConversationStore:
+    """
+    Conversation store keyed by session id.
+    Sessions are evicted by LRU order, idle TTL and a hard memory cap. With a shared
+    backend, histories live in the backend (expiring after the idle TTL) and only the
+    per-session turn locks are kept in memory.
+    """
+
+    # Backend namespace of the shared histories
+    NAMESPACE = "conversations"
+
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self.max_sessions = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+        # Backstop only; HistoryManager keeps the history within its token budget
+        self.max_messages = int(os.getenv("CONVERSATION_MAX_MESSAGES", "30"))
+        self.ttl_seconds = float(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))
+        self.max_total_chars = int(os.getenv("CONVERSATION_MAX_TOTAL_CHARS", str(20 * 1024 * 1024)))
+
+        # Only a backend shared between workers replaces the in-process history
+        self.backend = backend if backend is not None and backend.shared else None
+
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._total_size = 0
+        self.evictions = 0
+
+    def get_session(self, session_id: str) -> ConversationSession:
+        """
+        Get the session for the given id, creating it if needed.
+
+        Args:
+            session_id: Conversation session id
+
+        Returns:
+            ConversationSession instance (most recently used)
+        """
+        self._evict_expired()
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ConversationSession(session_id)
+            self._sessions[session_id] = session
+            self._evict_overflow()
+        else:
+            self._sessions.move_to_end(session_id)
+
+        session.last_access = time.monotonic()
+        return session
+
+    async def get_history(self, session_id: str) -> List[BaseMessage]:
+        """Get a copy of the conversation history for a session"""
+        if self.backend is not None:
+            stored = await self.backend.aget(self.NAMESPACE, session_id)
+            return messages_from_dict(stored) if stored else []
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        return list(session.messages)
+
+    async def save_history(self, session_id: str, messages: List[BaseMessage]):
+        """
+        Replace the conversation history of a session, keeping only the most recent messages.
+
+        Args:
+            session_id: Conversation session id
+            messages: Full message list returned by the agent
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self.get_session(session_id)
+
+        trimmed = self._trim(messages)
+        if self.backend is not None:
+            await self.backend.aset(self.NAMESPACE, session_id, messages_to_dict(trimmed), ttl=self.ttl_seconds or None)
+            session.last_access = time.monotonic()
+            return
+
+        new_size = sum(_message_size(m) for m in trimmed)
+
+        self._total_size += new_size - session.size
+        session.messages = trimmed
+        session.size = new_size
+        session.last_access = time.monotonic()
+
+        self._evict_overflow(keep=session_id)
+
+    async def reset(self, session_id: str):
+        """
+        Reset the conversation memory of one session.
+
+        Args:
+            session_id: Session to reset
+        """
+        if self.backend is not None:
+            await self.backend.adelete(self.NAMESPACE, session_id)
+
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_size -= session.size
+
+    async def clear(self):
+        """Reset the conversation memory of every session (administrative operation)"""
+        self._sessions.clear()
+        self._total_size = 0
+        if self.backend is not None:
+            await self.backend.aclear(self.NAMESPACE)
+
+    async def stats(self) -> dict:
+        """Get store statistics"""
+        return {
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "sessions": await self.backend.acount(self.NAMESPACE) if self.backend is not None else len(self._sessions),
+            "total_chars": self._total_size,
+            "evictions": self.evictions,
+            "max_sessions": self.max_sessions,
+            "max_messages": self.max_messages,
+            "ttl_seconds": self.ttl_seconds,
+            "max_total_chars": self.max_total_chars
+        }
+
+    def _trim(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Keep at most max_messages, always starting at a user message so that
+        tool results are never separated from the AI message that requested them.
+        A leading system message (the conversation summary) is kept.
+        """
+        if len(messages) <= self.max_messages:
+            return list(messages)
+
+        head = list(messages[:1]) if messages and messages[0].type == "system" else []
+        start = len(messages) - self.max_messages + len(head)
+        while start < len(messages) and messages[start].type != "human":
+            start += 1
+        return head + list(messages[start:])
+
+    def _evict_expired(self):
+        """Drop sessions that have been idle for longer than the TTL"""
+        if self.ttl_seconds <= 0:
+            return
+
+        deadline = time.monotonic() - self.ttl_seconds
+        # OrderedDict is kept in LRU order, so expired sessions are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= deadline or session.lock.locked():
+                break
+            self._drop(session_id)
+
+    def _evict_overflow(self, keep: Optional[str] = None):
+        """Evict least recently used sessions until both the count and memory caps hold"""
+        for session_id in list(self._sessions.keys()):
+            if len(self._sessions) <= self.max_sessions and self._total_size <= self.max_total_chars:
+                break
+            if session_id == keep or self._sessions[session_id].lock.locked():
+                continue
+            self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        """Remove a session and account for its memory"""
+        session = self._sessions.pop(session_id)
+        self._total_size -= session.size
+        self.evictions += 1
+        logger.debug(f"Evicted conversation session {session_id}")
@@ -4,10 +4,16 @@ This module handles communication with customers-service and vets-service.
 """
 
 import os
+import json
+import hashlib
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import httpx
 from app.models import Owner, Vet, Pet, OwnerRequest, PetRequest
+from app.cache import SingleFlightCache
+from app.metrics import registry as metrics
+from app.owner_index import OwnerIndex
+from app.shared_state import StateBackend
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +21,7 @@ logger = logging.getLogger(__name__)
 class DataProvider:
     """Provides data access to other microservices"""
     
-    def __init__(self):
+    def __init__(self, state: Optional[StateBackend] = None):
         self.customers_service_url = os.getenv(
             "CUSTOMERS_SERVICE_URL", 
             "http://customers-service"
@@ -24,9 +30,246 @@ class DataProvider:
             "VETS_SERVICE_URL",
             "http://vets-service"
         )
-        self.timeout = 30.0
         
+        # Connection pool settings for the shared HTTP client
+        self.timeout = httpx.Timeout(
+            float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+            connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        )
+        self.http2 = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+        
+        # Shared client, created in the FastAPI lifespan via start()
+        self.client: Optional[httpx.AsyncClient] = None
+        
+        # Read-through caches for full owner and vet listings
+        self.owners_cache = SingleFlightCache(
+            "owners",
+            ttl=float(os.getenv("OWNERS_CACHE_TTL_SECONDS", "30")),
+            stale_ttl=float(os.getenv("OWNERS_CACHE_STALE_SECONDS", "60"))
+        )
+        # Name / phone / city index over the cached owner list
+        self.owner_index = OwnerIndex()
+        
+        self.vets_cache = SingleFlightCache(
+            "vets",
+            ttl=float(os.getenv("VETS_CACHE_TTL_SECONDS", "300")),
+            stale_ttl=float(os.getenv("VETS_CACHE_STALE_SECONDS", "600"))
+        )
+        
+        # With several workers, writes and refreshes that load changed data bump a shared
+        # per-listing version so that every worker drops its cached list and cached
+        # answers are keyed consistently
+        self.state = state if state is not None and state.shared else None
+        self._seen_versions = {"owners": 0, "vets": 0}
+    
+    async def start(self):
+        """Create the shared pooled HTTP client"""
+        if self.client is not None:
+            return
+        
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; falling back to HTTP/1.1")
+                http2 = False
+        
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=http2)
+        logger.info(f"HTTP client started (max_connections={self.limits.max_connections}, "
+                    f"max_keepalive={self.limits.max_keepalive_connections}, http2={http2})")
+    
+    async def aclose(self):
+        """Close the shared HTTP client and release pooled connections"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("HTTP client closed")
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, starting it lazily if the lifespan has not run"""
+        if self.client is None:
+            await self.start()
+        return self.client
+        
+    def cache_stats(self) -> dict:
+        """Get hit/miss counters of the owner and vet caches"""
+        return {
+            "owners": self.owners_cache.stats(),
+            "vets": self.vets_cache.stats()
+        }
+    
+    async def data_version(self) -> str:
+        """Version of the cached owner and vet data; changes whenever either changes"""
+        if self.state is not None:
+            # Local cache versions differ between workers; only the shared counters are comparable
+            owners = await self.state.acounter("versions", "owners")
+            vets = await self.state.acounter("versions", "vets")
+            return f"shared.{owners}.{vets}"
+        return f"{self.owners_cache.version}.{self.vets_cache.version}"
+    
+    async def _sync_shared_version(self, kind: str, cache: SingleFlightCache):
+        """Drop a cached listing when another worker has changed it since it was loaded"""
+        version = await self.state.acounter("versions", kind)
+        if version != self._seen_versions[kind]:
+            self._seen_versions[kind] = version
+            cache.invalidate("all")
+    
+    async def _publish_shared_version(self, kind: str, items: list):
+        """
+        Bump the shared version of a listing when a load returned different content than
+        the last load by any worker, so that changes made outside this service (or seen
+        first by another worker) also change the data version.
+        
+        Args:
+            kind: Listing name ("owners" or "vets")
+            items: Freshly loaded listing
+        """
+        digest = hashlib.sha256(
+            json.dumps([item.model_dump(mode="json") for item in items], sort_keys=True).encode()
+        ).hexdigest()
+        if await self.state.aget("data_hashes", kind) == digest:
+            return
+        await self.state.aset("data_hashes", kind, digest)
+        version = await self.state.aincrement("versions", kind)
+        if version is not None:
+            # This worker already holds the new content
+            self._seen_versions[kind] = version
+    
     async def get_all_owners(self) -> List[Owner]:
+        """
+        Get all owners, served from the read-through cache when possible.
+        
+        Returns:
+            List of Owner objects
+        """
+        if self.state is not None:
+            await self._sync_shared_version("owners", self.owners_cache)
+        return await self.owners_cache.get("all", self._load_owners)
+    
+    async def find_owners(
+        self,
+        last_name: Optional[str] = None,
+        city: Optional[str] = None,
+        pet_name: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Owner], int]:
+        """
+        Find owners matching optional filters, with paging.
+        Filtering runs on the cached owner list since customers-service only lists all owners.
+        
+        Args:
+            last_name: Case-insensitive last name prefix
+            city: Case-insensitive city name
+            pet_name: Case-insensitive name of one of the owner's pets
+            offset: Number of matching owners to skip
+            limit: Maximum number of owners to return (all when None)
+            
+        Returns:
+            Tuple of (page of matching owners, total number of matches)
+        """
+        owners = await self.get_all_owners()
+        
+        last_name = (last_name or "").strip().lower()
+        city = (city or "").strip().lower()
+        pet_name = (pet_name or "").strip().lower()
+        
+        matches = [
+            owner for owner in owners
+            if (not last_name or owner.lastName.lower().startswith(last_name))
+            and (not city or owner.city.lower() == city)
+            and (not pet_name or any(pet.name.lower() == pet_name for pet in owner.pets or []))
+        ]
+        
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        return matches[offset:end], len(matches)
+    
+    async def search_owners(
+        self,
+        name: Optional[str] = None,
+        telephone: Optional[str] = None,
+        city: Optional[str] = None,
+        limit: int = 5
+    ) -> List[Tuple[Owner, float]]:
+        """
+        Look owners up in the local owner index, rebuilding it when the owner list changed.
+        
+        Args:
+            name: First and/or last name (typos tolerated)
+            telephone: Full phone number or its last digits
+            city: City name (typos tolerated)
+            limit: Maximum number of results
+            
+        Returns:
+            List of (owner, match score) sorted by descending score
+        """
+        owners = await self.get_all_owners()
+        if owners is not self.owner_index.source:
+            self.owner_index.build(owners)
+        return self.owner_index.search(name=name, telephone=telephone, city=city, limit=limit)
+    
+    async def _after_owner_write(self, fn, changed_owner_id: Optional[int]):
+        """
+        Update the caches after a successful owner write. The write has already happened
+        upstream, so a failure here only drops the cached owner list; it is never reported
+        as a failed write (the agent would retry it and create a duplicate).
+        
+        Args:
+            fn: Function returning the new owner list from the cached one
+            changed_owner_id: Id of the owner that was added or changed
+        """
+        try:
+            await self._patch_owners(fn, changed_owner_id)
+        except Exception as e:
+            logger.warning(f"Failed to update cached owners after a write: {e}; reloading on next use")
+            self.owners_cache.invalidate("all")
+    
+    async def _patch_owners(self, fn, changed_owner_id: Optional[int]):
+        """
+        Patch the cached owner list and keep the owner index in step with it.
+        
+        Args:
+            fn: Function returning the new owner list from the cached one
+            changed_owner_id: Id of the owner that was added or changed
+        """
+        if self.state is not None:
+            # Tell the other workers; this worker patches its own list below unless
+            # another worker wrote in between (or the shared counter could not be
+            # updated), in which case the list is reloaded
+            version = await self.state.aincrement("versions", "owners")
+            missed_writes = version is None or version != self._seen_versions["owners"] + 1
+            if version is not None:
+                self._seen_versions["owners"] = version
+            if missed_writes:
+                self.owners_cache.invalidate("all")
+                return
+        
+        previous = self.owners_cache.peek("all")
+        self.owners_cache.update("all", fn)
+        current = self.owners_cache.peek("all")
+        
+        # Incremental index update when the index reflects the list that was just patched;
+        # otherwise the next search rebuilds it from the cache
+        if previous is not None and current is not None and self.owner_index.source is previous:
+            changed = next((owner for owner in current if owner.id == changed_owner_id), None)
+            if changed is not None:
+                self.owner_index.upsert(changed, source=current)
+    
+    async def _load_owners(self) -> List[Owner]:
+        """Cache loader for the owner list"""
+        owners = await self._fetch_all_owners()
+        if self.state is not None:
+            await self._publish_shared_version("owners", owners)
+        return owners
+    
+    async def _fetch_all_owners(self) -> List[Owner]:
         """
         Fetch all owners from customers-service.
         
@@ -34,11 +277,12 @@ class DataProvider:
             List of Owner objects
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            client = await self._get_client()
+            with metrics.timer("data_provider", operation="get_owners"):
                 response = await client.get(f"{self.customers_service_url}/owners")
-                response.raise_for_status()
-                data = response.json()
-                return [Owner(**owner) for owner in data]
+            response.raise_for_status()
+            data = response.json()
+            return [Owner(**owner) for owner in data]
         except httpx.HTTPError as e:
             logger.error(f"Error fetching owners: {e}")
             raise
@@ -57,19 +301,24 @@ class DataProvider:
             Created Owner object
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            client = await self._get_client()
+            with metrics.timer("data_provider", operation="add_owner"):
                 response = await client.post(
                     f"{self.customers_service_url}/owners",
                     json=owner_request.model_dump()
                 )
-                response.raise_for_status()
-                return Owner(**response.json())
+            response.raise_for_status()
+            owner = Owner(**response.json())
         except httpx.HTTPError as e:
             logger.error(f"Error adding owner: {e}")
             raise
         except Exception as e:
             logger.error(f"Unexpected error adding owner: {e}")
             raise
+        
+        # Append the new owner to the cached listing instead of refetching it
+        await self._after_owner_write(lambda owners: owners + [owner], owner.id)
+        return owner
     
     async def add_pet_to_owner(self, owner_id: int, pet_request: PetRequest) -> Pet:
         """
@@ -83,29 +332,62 @@ class DataProvider:
             Created Pet object
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Convert typeId to type object for API
-                pet_data = {
-                    "name": pet_request.name,
-                    "birthDate": pet_request.birthDate,
-                    "type": {
-                        "id": pet_request.typeId
-                    }
+            client = await self._get_client()
+            # Convert typeId to type object for API
+            pet_data = {
+                "name": pet_request.name,
+                "birthDate": pet_request.birthDate,
+                "type": {
+                    "id": pet_request.typeId
                 }
+            }
+            with metrics.timer("data_provider", operation="add_pet"):
                 response = await client.post(
                     f"{self.customers_service_url}/owners/{owner_id}/pets",
                     json=pet_data
                 )
-                response.raise_for_status()
-                return Pet(**response.json())
+            response.raise_for_status()
+            pet = Pet(**response.json())
         except httpx.HTTPError as e:
             logger.error(f"Error adding pet to owner {owner_id}: {e}")
             raise
         except Exception as e:
             logger.error(f"Unexpected error adding pet: {e}")
             raise
+        
+        # Attach the new pet to the cached owner instead of refetching all owners
+        await self._after_owner_write(lambda owners: self._with_pet(owners, owner_id, pet), owner_id)
+        return pet
+    
+    @staticmethod
+    def _with_pet(owners: List[Owner], owner_id: int, pet: Pet) -> List[Owner]:
+        """Return a copy of the owner list with the pet added to the given owner"""
+        if not any(owner.id == owner_id for owner in owners):
+            raise KeyError(f"owner {owner_id} not cached")
+        return [
+            owner.model_copy(update={"pets": list(owner.pets or []) + [pet]}) if owner.id == owner_id else owner
+            for owner in owners
+        ]
     
     async def get_all_vets(self) -> List[Vet]:
+        """
+        Get all veterinarians, served from the read-through cache when possible.
+        
+        Returns:
+            List of Vet objects
+        """
+        if self.state is not None:
+            await self._sync_shared_version("vets", self.vets_cache)
+        return await self.vets_cache.get("all", self._load_vets)
+    
+    async def _load_vets(self) -> List[Vet]:
+        """Cache loader for the vet list"""
+        vets = await self._fetch_all_vets()
+        if self.state is not None:
+            await self._publish_shared_version("vets", vets)
+        return vets
+    
+    async def _fetch_all_vets(self) -> List[Vet]:
         """
         Fetch all veterinarians from vets-service.
         
@@ -113,11 +395,12 @@ class DataProvider:
             List of Vet objects
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            client = await self._get_client()
+            with metrics.timer("data_provider", operation="get_vets"):
                 response = await client.get(f"{self.vets_service_url}/vets")
-                response.raise_for_status()
-                data = response.json()
-                return [Vet(**vet) for vet in data]
+            response.raise_for_status()
+            data = response.json()
+            return [Vet(**vet) for vet in data]
         except httpx.HTTPError as e:
             logger.error(f"Error fetching vets: {e}")
             raise
@@ -0,0 +1,47 @@
+"""
+Per-turn deadline for agent runs.
+The deadline is kept in a context variable so that the tool calls the agent
+graph runs in its own tasks can cap their timeouts at the time left.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_turn_deadline: ContextVar[Optional[float]] = ContextVar("turn_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an agent turn runs past its deadline"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Agent turn did not finish within {seconds:g}s")
+        self.seconds = seconds
+
+
+@contextmanager
+def turn_deadline(seconds: float):
+    """
+    Set the deadline of the agent turn run in the enclosed block.
+
+    Args:
+        seconds: Time allowed for the turn; 0 or less means no deadline
+    """
+    token = _turn_deadline.set(time.monotonic() + seconds if seconds > 0 else None)
+    try:
+        yield
+    finally:
+        try:
+            _turn_deadline.reset(token)
+        except ValueError:
+            # A streaming turn's generator may be closed from another context
+            pass
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current turn's deadline, or None without a deadline"""
+    deadline = _turn_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
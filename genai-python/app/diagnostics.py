@@ -0,0 +1,224 @@
+"""
+Diagnostic tracing for troubleshooting chat requests.
+Events are level-gated and sampled, and written as JSON lines through a bounded
+queue drained by a background thread, so the event loop never blocks on stdout.
+Tracing is off by default and can be switched at runtime via /actuator/diagnostics.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, Union
+from uuid import UUID
+
+# LangChain 1.x imports - updated paths
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+EventData = Union[Dict[str, Any], Callable[[], Dict[str, Any]], None]
+
+
+class _JsonFormatter(logging.Formatter):
+    """Serializes the diagnostic event attached to a record (runs on the listener thread)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = getattr(record, "diagnostic", None) or {"message": record.getMessage()}
+        return json.dumps(event, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops events instead of blocking or raising when the queue is full"""
+
+    def __init__(self, event_queue: queue.Queue):
+        super().__init__(event_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread; pass the record through untouched
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class Diagnostics:
+    """Level-gated, sampled diagnostic event writer"""
+
+    def __init__(self):
+        self.level = logging.getLevelName(os.getenv("DIAGNOSTICS_LEVEL", "DEBUG").upper())
+        if not isinstance(self.level, int):
+            self.level = logging.DEBUG
+        self.sample_rate = float(os.getenv("DIAGNOSTICS_SAMPLE_RATE", "1.0"))
+        self.queue_size = int(os.getenv("DIAGNOSTICS_QUEUE_SIZE", "10000"))
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._handler = _DroppingQueueHandler(self._queue)
+        self._listener: Optional[QueueListener] = None
+
+        # Dedicated logger so diagnostic events never mix with the application log
+        self._logger = logging.getLogger("app.diagnostics.events")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.DEBUG)
+        self._logger.addHandler(self._handler)
+
+        self.emitted = 0
+        self.sampled_out = 0
+        # Single attribute checked on the hot path
+        self.enabled = False
+        self.configure(enabled=os.getenv("DIAGNOSTICS_ENABLED", "false").lower() == "true")
+
+    def configure(
+        self,
+        enabled: Optional[bool] = None,
+        level: Optional[Union[int, str]] = None,
+        sample_rate: Optional[float] = None
+    ) -> dict:
+        """
+        Change the diagnostic settings at runtime.
+
+        Args:
+            enabled: Turn tracing on or off
+            level: Minimum event level (name or number)
+            sample_rate: Fraction of events to keep (0.0 - 1.0)
+
+        Returns:
+            Current settings and counters
+
+        Raises:
+            TypeError: When a value has the wrong type ("false" or 1 for enabled); nothing is changed
+        """
+        # Validate everything before changing anything, so a bad request cannot half-apply
+        if enabled is not None and not isinstance(enabled, bool):
+            raise TypeError(f"enabled must be true or false, got {enabled!r}")
+        if sample_rate is not None and (isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))):
+            raise TypeError(f"sample_rate must be a number, got {sample_rate!r}")
+        if level is not None and (isinstance(level, bool) or not isinstance(level, (int, str))):
+            raise TypeError(f"level must be a level name or number, got {level!r}")
+
+        if level is not None:
+            resolved = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+            if not isinstance(resolved, int):
+                raise ValueError(f"Unknown diagnostics level '{level}'")
+            self.level = resolved
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("sample_rate must be between 0.0 and 1.0")
+            self.sample_rate = sample_rate
+        if enabled is not None:
+            if enabled:
+                self._start_listener()
+            self.enabled = enabled
+            logger.info(f"Diagnostics {'enabled' if enabled else 'disabled'} "
+                        f"(level={logging.getLevelName(self.level)}, sample_rate={self.sample_rate})")
+        return self.stats()
+
+    def event(self, location: str, message: str, data: EventData = None, level: int = logging.DEBUG):
+        """
+        Emit a diagnostic event if tracing is enabled for the level and the event is sampled.
+
+        Args:
+            location: Code location, e.g. "chat_client.py:chat"
+            message: Short description
+            data: Event fields, or a callable returning them (only evaluated when emitted)
+            level: Event level
+        """
+        if not self.enabled or level < self.level:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+
+        event = {
+            "timestamp": int(time.time() * 1000),
+            "level": logging.getLevelName(level),
+            "location": location,
+            "message": message,
+            "data": data() if callable(data) else data
+        }
+        self.emitted += 1
+        self._logger.log(level, message, extra={"diagnostic": event})
+
+    def stop(self):
+        """Flush queued events and stop the writer thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": logging.getLevelName(self.level),
+            "sample_rate": self.sample_rate,
+            "emitted": self.emitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self._handler.dropped,
+            "queued": self._queue.qsize()
+        }
+
+    def _start_listener(self):
+        if self._listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(_JsonFormatter())
+        self._listener = QueueListener(self._queue, output)
+        self._listener.start()
+
+
+class DiagnosticsCallbackHandler(BaseCallbackHandler):
+    """Emits agent steps (LLM and tool calls) as diagnostic events; a no-op while tracing is off"""
+
+    run_inline = True
+
+    def __init__(self, diagnostics: Diagnostics):
+        self.diagnostics = diagnostics
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        if self.diagnostics.enabled:
+            self.diagnostics.event("agent:model", "LLM call started", lambda: {
+                "run_id": str(run_id),
+                "messages": sum(len(batch) for batch in messages)
+            })
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        if self.diagnostics.enabled:
+            self.diagnostics.event("agent:model", "LLM call finished", lambda: {
+                "run_id": str(run_id),
+                "tool_calls": [
+                    call["name"]
+                    for generations in response.generations for generation in generations
+                    for call in getattr(getattr(generation, "message", None), "tool_calls", None) or []
+                ]
+            })
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        if self.diagnostics.enabled:
+            self.diagnostics.event("agent:tool", "Tool call started", lambda: {
+                "run_id": str(run_id),
+                "tool": (serialized or {}).get("name"),
+                "input": str(input_str)[:200]
+            })
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        if self.diagnostics.enabled:
+            self.diagnostics.event("agent:tool", "Tool call finished", lambda: {
+                "run_id": str(run_id),
+                "output_chars": len(str(getattr(output, "content", output)))
+            })
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        if self.diagnostics.enabled:
+            self.diagnostics.event("agent:tool", "Tool call failed", {"run_id": str(run_id), "error": str(error)},
+                                   level=logging.WARNING)
+
+
+# Process-wide diagnostics instance
+diagnostics = Diagnostics()
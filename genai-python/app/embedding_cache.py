@@ -0,0 +1,213 @@
+"""
+Query-embedding cache for the vector store.
+Wraps an Embeddings model with an in-memory LRU tier and an optional on-disk SQLite tier.
+The disk tier is a best-effort cache: async lookups run it in a worker thread, and a
+locked or unreadable file counts as a miss rather than failing the query.
+"""
+
+import os
+import json
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+# LangChain 1.x imports - updated paths
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings import REMOTE_EMBEDDING_PROVIDERS, get_embedding_provider_name
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query so that trivially different spellings share a cache entry"""
+    return " ".join(text.lower().split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches query embeddings.
+    Document embeddings are passed through to the underlying model unchanged.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_entries: int = 1024,
+        disk_path: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection; held only in worker threads on the async path
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._open_disk_tier(disk_path)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _open_disk_tier(self, disk_path: str):
+        """Open (or create) the SQLite file backing the on-disk tier"""
+        try:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            # The file is shared by all workers; WAL lets readers proceed while one of them writes,
+            # and a short busy timeout turns a locked file into a quick miss
+            self._db = sqlite3.connect(disk_path, timeout=1.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, embedding TEXT NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Query embedding disk cache enabled at {disk_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to open query embedding disk cache at {disk_path}: {e}")
+            self._db = None
+
+    def _key(self, text: str) -> str:
+        """Cache key from the embedding model and normalized query text"""
+        raw = f"{self.model_name}\n{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return embedding
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        """Read the disk tier; any SQLite or decoding error is a miss"""
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT embedding FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+            return json.loads(row[0]) if row is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Failed to read query embedding from disk cache: {e}")
+            return None
+
+    def _disk_put(self, key: str, embedding: List[float]):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, embedding) VALUES (?, ?)",
+                    (key, json.dumps(embedding))
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write query embedding to disk cache: {e}")
+
+    def _disk_result(self, key: str, embedding: Optional[List[float]]) -> Optional[List[float]]:
+        """Count the outcome of a lookup that missed the memory tier"""
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._remember(key, embedding)
+            self.disk_hits += 1
+            return embedding
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        """Look the key up in the memory tier, then the disk tier"""
+        embedding = self._memory_get(key)
+        if embedding is not None:
+            return embedding
+        return self._disk_result(key, self._disk_get(key) if self._db is not None else None)
+
+    async def _alookup(self, key: str) -> Optional[List[float]]:
+        """Like _lookup, with the disk read in a worker thread"""
+        embedding = self._memory_get(key)
+        if embedding is not None:
+            return embedding
+        disk = await asyncio.to_thread(self._disk_get, key) if self._db is not None else None
+        return self._disk_result(key, disk)
+
+    def _remember_locked(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._remember(key, embedding)
+
+    def _remember(self, key: str, embedding: List[float]):
+        """Insert into the LRU memory tier, evicting the oldest entry when full"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(text)
+            self._remember_locked(key, embedding)
+            if self._db is not None:
+                self._disk_put(key, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        embedding = await self._alookup(key)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(text)
+            self._remember_locked(key, embedding)
+            if self._db is not None:
+                await asyncio.to_thread(self._disk_put, key, embedding)
+        return embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        """Get cache hit/miss counters"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_cached_embeddings(embeddings: Embeddings, model_name: str, persist_directory: str) -> Embeddings:
+    """
+    Wrap an embeddings model with the query cache configured from environment variables.
+
+    Args:
+        embeddings: Underlying embeddings model
+        model_name: Embedding model / deployment name, part of the cache key
+        persist_directory: Vector store directory; the disk tier lives next to it
+
+    Returns:
+        CachedEmbeddings, or the original model when caching is disabled or the
+        provider is local (recomputing its vectors is cheaper than a cache lookup)
+    """
+    max_entries = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    if max_entries <= 0 or get_embedding_provider_name() not in REMOTE_EMBEDDING_PROVIDERS:
+        return embeddings
+
+    disk_path = None
+    if os.getenv("EMBEDDING_CACHE_DISK", "true").lower() == "true":
+        default_path = str(Path(persist_directory).parent / "embedding_cache" / "query_embeddings.sqlite3")
+        disk_path = os.getenv("EMBEDDING_CACHE_PATH", default_path)
+
+    return CachedEmbeddings(embeddings, model_name, max_entries=max_entries, disk_path=disk_path)
@@ -0,0 +1,159 @@
+"""
+Pluggable embedding backends for the vector store.
+The backend is selected with the EMBEDDING_PROVIDER environment variable.
+"""
+
+import os
+import re
+import math
+import hashlib
+import logging
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+# LangChain 1.x imports - updated paths
+from langchain_core.embeddings import Embeddings
+
+from app.rate_limit import RateLimitedEmbeddings, embedding_limiter
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local CPU embeddings using signed feature hashing.
+    Word unigrams and character n-grams are hashed into a fixed number of
+    dimensions with sublinear term frequency weighting and L2 normalization.
+    Needs no network access and is deterministic across processes.
+    """
+
+    def __init__(self, dimensions: int = 512, char_ngram: int = 3):
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+
+    def _features(self, text: str) -> Dict[str, int]:
+        """Count word and character n-gram features of a text"""
+        counts: Dict[str, int] = {}
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            counts["w:" + token] = counts.get("w:" + token, 0) + 1
+            padded = f"<{token}>"
+            for i in range(max(1, len(padded) - self.char_ngram + 1)):
+                gram = "c:" + padded[i:i + self.char_ngram]
+                counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            index = value % self.dimensions
+            sign = 1.0 if (value >> 63) & 1 else -1.0
+            # Word features carry more meaning than character n-grams
+            weight = 2.0 if feature.startswith("w:") else 1.0
+            vector[index] += sign * weight * (1.0 + math.log(count))
+
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+def _create_openai_embeddings() -> Tuple[Embeddings, str]:
+    from langchain_openai import OpenAIEmbeddings
+
+    logger.info("Using OpenAI embeddings")
+    model_name = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    embeddings = OpenAIEmbeddings(
+        openai_api_key=os.getenv("OPENAI_API_KEY", "demo"),
+        model=model_name,
+        base_url=base_url,
+        # OpenAI-compatible servers take raw text rather than tiktoken token ids
+        check_embedding_ctx_length=base_url is None,
+        # Retries are done by the embedding rate limiter
+        max_retries=0
+    )
+    return RateLimitedEmbeddings(embeddings, embedding_limiter), f"openai:{model_name}"
+
+
+def _create_azure_embeddings() -> Tuple[Embeddings, str]:
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    logger.info("Using Azure OpenAI embeddings")
+    deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+    embeddings = AzureOpenAIEmbeddings(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_KEY"),
+        azure_deployment=deployment,
+        max_retries=0
+    )
+    return RateLimitedEmbeddings(embeddings, embedding_limiter), f"azure:{deployment}"
+
+
+def _create_local_embeddings() -> Tuple[Embeddings, str]:
+    dimensions = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "512"))
+    logger.info(f"Using local hashing embeddings ({dimensions} dimensions)")
+    return HashingEmbeddings(dimensions=dimensions), f"local:hashing-{dimensions}"
+
+
+# Providers that call a remote API; only their embeddings are worth caching or sharing a collection
+REMOTE_EMBEDDING_PROVIDERS = ("openai", "azure")
+
+# Provider name -> factory returning (embeddings, model name)
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], Tuple[Embeddings, str]]] = {
+    "openai": _create_openai_embeddings,
+    "azure": _create_azure_embeddings,
+    "local": _create_local_embeddings,
+}
+
+
+def register_embedding_provider(name: str, factory: Callable[[], Tuple[Embeddings, str]]):
+    """
+    Register an additional embedding provider.
+
+    Args:
+        name: Value of EMBEDDING_PROVIDER that selects the provider
+        factory: Callable returning (embeddings, model name)
+    """
+    EMBEDDING_PROVIDERS[name] = factory
+
+
+def get_embedding_provider_name() -> str:
+    """Resolve the configured provider; "auto" keeps the Azure-then-OpenAI default"""
+    provider = os.getenv("EMBEDDING_PROVIDER", "auto").lower()
+    if provider == "auto":
+        if os.getenv("AZURE_OPENAI_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+            return "azure"
+        return "openai"
+    return provider
+
+
+def create_embeddings() -> Tuple[Embeddings, str]:
+    """
+    Create the configured embeddings backend.
+
+    Returns:
+        Tuple of (embeddings, model name used to key caches and collections)
+    """
+    provider = get_embedding_provider_name()
+    factory = EMBEDDING_PROVIDERS.get(provider)
+    if factory is None:
+        raise ValueError(
+            f"Unknown EMBEDDING_PROVIDER '{provider}'. Available: {', '.join(sorted(EMBEDDING_PROVIDERS))}"
+        )
+    return factory()
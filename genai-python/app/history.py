@@ -0,0 +1,229 @@
+"""
+Token-budgeted conversation history.
+The history sent with each agent turn is compacted so that its size stays flat
+however long the conversation runs: the last turns are kept verbatim, older turns
+are reduced to the question and the final answer (their tool calls and raw tool
+outputs are dropped), stale tool outputs are truncated when the budget is tight,
+and turns that no longer fit are dropped, optionally folded into a running summary.
+The system prompt is not part of the history; the agent adds it to every call.
+"""
+
+import os
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.metrics import registry as metrics
+from app.tokens import CHARS_PER_TOKEN, estimate_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Marks the system message holding the summary of dropped turns
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+Turn = List[BaseMessage]
+Summarizer = Callable[[str], Awaitable[str]]
+
+
+def _turn_tokens(turn: Turn) -> int:
+    return sum(estimate_message_tokens(message) for message in turn)
+
+
+def _transcript(turns: List[Turn]) -> str:
+    """Plain-text transcript of the questions and answers of some turns"""
+    lines = []
+    for turn in turns:
+        for message in turn:
+            if isinstance(message, HumanMessage):
+                lines.append(f"User: {message.content}")
+            elif isinstance(message, AIMessage) and not message.tool_calls and message.content:
+                lines.append(f"Assistant: {message.content}")
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """Compacts conversation history to a token budget before it is sent or stored"""
+
+    def __init__(self, summarizer: Optional[Summarizer] = None):
+        self.token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+        self.keep_turns = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+        self.tool_output_tokens = int(os.getenv("HISTORY_TOOL_OUTPUT_TOKENS", "150"))
+        self.summary_tokens = int(os.getenv("HISTORY_SUMMARY_TOKENS", "200"))
+        summary_enabled = os.getenv("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"
+        self.summarizer = summarizer if summary_enabled else None
+
+        self.compactions = 0
+        self.turns_condensed = 0
+        self.turns_dropped = 0
+        self.tool_outputs_truncated = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def describe(self) -> str:
+        """One-line description of the memory policy for the service info"""
+        summary = ", older turns summarized" if self.summarizer else ""
+        return (f"Per-session conversation memory (last {self.keep_turns} turns verbatim, "
+                f"{self.token_budget}-token history budget{summary})")
+
+    def for_prompt(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Compact a stored history for the next agent turn.
+
+        Args:
+            messages: Conversation history
+
+        Returns:
+            History within the token budget
+        """
+        kept, _, _ = self._compact(messages)
+        if kept:
+            metrics.history_tokens.observe(sum(estimate_message_tokens(m) for m in kept))
+        return kept
+
+    async def for_storage(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Compact the message list of a finished turn before it is stored, folding
+        dropped turns into the summary when summarization is enabled.
+
+        Args:
+            messages: History plus the messages of the finished turn
+
+        Returns:
+            History to store
+        """
+        kept, dropped, summary = self._compact(messages, record=True)
+        if not dropped or self.summarizer is None:
+            return kept
+
+        try:
+            text = await self.summarizer(self._summary_prompt(summary, dropped))
+            self.summaries += 1
+        except Exception as e:
+            # Keep the previous summary; the dropped turns are lost either way
+            self.summary_failures += 1
+            logger.warning(f"Conversation summary failed: {e}")
+            return kept
+        new_summary = SystemMessage(content=SUMMARY_PREFIX + text.strip())
+        return [new_summary] + [m for m in kept if not self._is_summary(m)]
+
+    def stats(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "keep_turns": self.keep_turns,
+            "tool_output_tokens": self.tool_output_tokens,
+            "summary_enabled": self.summarizer is not None,
+            "compactions": self.compactions,
+            "turns_condensed": self.turns_condensed,
+            "turns_dropped": self.turns_dropped,
+            "tool_outputs_truncated": self.tool_outputs_truncated,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures
+        }
+
+    @staticmethod
+    def _is_summary(message: BaseMessage) -> bool:
+        return isinstance(message, SystemMessage) and isinstance(message.content, str) and \
+            message.content.startswith(SUMMARY_PREFIX)
+
+    def _compact(
+        self,
+        messages: List[BaseMessage],
+        record: bool = False
+    ) -> Tuple[List[BaseMessage], List[Turn], Optional[SystemMessage]]:
+        """
+        Apply the compaction policy.
+
+        Args:
+            messages: Conversation history
+            record: Count the compaction in the statistics
+
+        Returns:
+            Tuple of (compacted history, dropped turns, summary message or None)
+        """
+        summary = messages[0] if messages and self._is_summary(messages[0]) else None
+        turns = self._split(messages[1:] if summary is not None else messages)
+        condensed = truncated = 0
+
+        # Turns before the last keep_turns: question and final answer only
+        verbatim_from = max(len(turns) - self.keep_turns, 0)
+        for i in range(verbatim_from):
+            shorter = self._condense(turns[i])
+            if len(shorter) < len(turns[i]):
+                turns[i] = shorter
+                condensed += 1
+
+        budget = self.token_budget - (estimate_message_tokens(summary) if summary is not None else 0)
+        sizes = [_turn_tokens(turn) for turn in turns]
+
+        # Over budget: truncate stale tool outputs (all turns but the latest), oldest first
+        for i in range(len(turns) - 1):
+            if sum(sizes) <= budget:
+                break
+            turns[i], count = self._truncate_tool_outputs(turns[i])
+            truncated += count
+            sizes[i] = _turn_tokens(turns[i])
+
+        # Still over: drop the oldest turns, always keeping the latest one
+        dropped: List[Turn] = []
+        while len(turns) > 1 and sum(sizes) > budget:
+            dropped.append(turns.pop(0))
+            sizes.pop(0)
+
+        # The latest turn alone is over budget: truncate its tool outputs as well
+        if turns and sum(sizes) > budget:
+            turns[-1], count = self._truncate_tool_outputs(turns[-1])
+            truncated += count
+
+        if record and (condensed or truncated or dropped):
+            self.compactions += 1
+            self.turns_condensed += condensed
+            self.tool_outputs_truncated += truncated
+            self.turns_dropped += len(dropped)
+
+        kept = [summary] if summary is not None else []
+        for turn in turns:
+            kept.extend(turn)
+        return kept, dropped, summary
+
+    @staticmethod
+    def _split(messages: List[BaseMessage]) -> List[Turn]:
+        """Split a history into turns, each starting at a user message"""
+        turns: List[Turn] = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+
+    @staticmethod
+    def _condense(turn: Turn) -> Turn:
+        """Reduce a turn to its user message and final answer, dropping tool calls and their outputs"""
+        question = [m for m in turn[:1] if isinstance(m, HumanMessage)]
+        answers = [m for m in turn if isinstance(m, AIMessage) and not m.tool_calls]
+        return question + answers[-1:] if question else turn
+
+    def _truncate_tool_outputs(self, turn: Turn) -> Tuple[Turn, int]:
+        """Shorten the tool outputs of a turn to tool_output_tokens each"""
+        limit = self.tool_output_tokens * CHARS_PER_TOKEN
+        result, count = [], 0
+        for message in turn:
+            content = message.content
+            if isinstance(message, ToolMessage) and isinstance(content, str) and len(content) > limit:
+                message = message.model_copy(
+                    update={"content": f"{content[:limit]}... [truncated {len(content) - limit} chars]"}
+                )
+                count += 1
+            result.append(message)
+        return result, count
+
+    def _summary_prompt(self, summary: Optional[SystemMessage], dropped: List[Turn]) -> str:
+        previous = summary.content[len(SUMMARY_PREFIX):] if summary is not None else ""
+        return (
+            f"Update the summary of a conversation between a user and a pet clinic assistant. "
+            f"Keep names, IDs and facts the user may refer to later, and stay under "
+            f"{self.summary_tokens * 3 // 4} words.\n\n"
+            f"Current summary:\n{previous or '(none)'}\n\n"
+            f"Conversation to add:\n{_transcript(dropped)}"
+        )
@@ -0,0 +1,175 @@
+"""
+Batched ingestion pipeline for the vet vector store.
+Documents are consumed lazily, embedded in batches with bounded concurrency and
+written to the collection batch by batch. Failed writes are retried here; embedding
+calls are retried by the embeddings model itself (the rate limiter for remote
+providers), so a failed embedding fails its batch.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import tracemalloc
+from itertools import islice
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional
+
+# LangChain 1.x imports - updated paths
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Writer signature: (documents, embeddings) -> None
+BatchWriter = Callable[[List[Document], List[List[float]]], Awaitable[None]]
+
+
+def batched(items: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    """Yield lists of at most size items without materializing the whole iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestionStats:
+    """Throughput and memory measurements of one ingestion run"""
+
+    def __init__(self, total: Optional[int] = None):
+        self.total = total
+        self.documents = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+        self.started = time.monotonic()
+        self.elapsed_seconds = 0.0
+        self.peak_memory_bytes: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        elapsed = self.elapsed_seconds or (time.monotonic() - self.started)
+        return {
+            "total": self.total,
+            "documents": self.documents,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "documents_per_second": round(self.documents / elapsed, 1) if elapsed > 0 else 0.0,
+            "peak_memory_bytes": self.peak_memory_bytes
+        }
+
+
+class IngestionPipeline:
+    """Embeds and writes documents in bounded batches, retrying failed writes"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        writer: BatchWriter,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_base_delay: Optional[float] = None,
+        progress_callback: Optional[Callable[[IngestionStats], None]] = None
+    ):
+        self.embeddings = embeddings
+        self.writer = writer
+        self.batch_size = batch_size or int(os.getenv("INGEST_BATCH_SIZE", "64"))
+        self.concurrency = concurrency or int(os.getenv("INGEST_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("INGEST_MAX_RETRIES", "3"))
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else float(
+            os.getenv("INGEST_RETRY_BASE_DELAY", "1.0")
+        )
+        self.trace_memory = os.getenv("INGEST_TRACE_MEMORY", "false").lower() == "true"
+        self.progress_callback = progress_callback
+
+    async def run(self, documents: Iterable[Document], total: Optional[int] = None) -> IngestionStats:
+        """
+        Ingest documents.
+
+        At most `concurrency` batches are held in memory at any time, so peak
+        memory depends on batch_size * concurrency rather than on the catalog size.
+
+        Args:
+            documents: Documents to ingest (may be a lazy generator)
+            total: Expected number of documents, for progress reporting
+
+        Returns:
+            IngestionStats for the run
+        """
+        stats = IngestionStats(total)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        try:
+            for batch in batched(documents, self.batch_size):
+                # Wait for a free slot before pulling the next batch from the source
+                await semaphore.acquire()
+                task = asyncio.create_task(self._ingest_batch(batch, stats))
+                task.add_done_callback(lambda _: semaphore.release())
+                pending.add(task)
+                pending = {t for t in pending if not t.done()}
+
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            if self.trace_memory and tracemalloc.is_tracing():
+                stats.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+                if tracing:
+                    tracemalloc.stop()
+            stats.elapsed_seconds = time.monotonic() - stats.started
+
+        logger.info(f"Ingestion finished: {stats.as_dict()}")
+        if stats.failed_batches:
+            raise RuntimeError(f"{stats.failed_batches} ingestion batch(es) failed")
+        return stats
+
+    async def _ingest_batch(self, batch: List[Document], stats: IngestionStats):
+        """Embed one batch once, then write it, retrying the write with jittered exponential backoff"""
+        texts = [doc.page_content for doc in batch]
+
+        try:
+            started = time.monotonic()
+            vectors = await self.embeddings.aembed_documents(texts)
+            stats.embed_seconds += time.monotonic() - started
+        except Exception as e:
+            # Already retried with backoff by the embeddings model; retrying here would multiply the attempts
+            stats.failed_batches += 1
+            logger.error(f"Embedding a batch of {len(batch)} documents failed: {e}")
+            return
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                started = time.monotonic()
+                await self.writer(batch, vectors)
+                stats.write_seconds += time.monotonic() - started
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    stats.failed_batches += 1
+                    logger.error(f"Writing a batch of {len(batch)} documents failed: {e}")
+                    return
+                stats.retries += 1
+                delay = self.retry_base_delay * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"Writing an ingestion batch failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        stats.documents += len(batch)
+        stats.batches += 1
+        if self.progress_callback:
+            self.progress_callback(stats)
+        else:
+            total = f"/{stats.total}" if stats.total is not None else ""
+            logger.info(f"Ingested {stats.documents}{total} documents ({stats.batches} batches)")
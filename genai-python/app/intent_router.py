@@ -0,0 +1,201 @@
+"""
+Deterministic fast path for simple chat intents.
+Questions such as "list all vets" or "how many owners are there" are answered from the
+cached data or a direct tool call and rendered with a template, without any LLM round-trip.
+Anything that does not clearly match an enabled intent is handed to the agent.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.data_provider import DataProvider
+from app.models import Vet
+
+logger = logging.getLogger(__name__)
+
+# Handler signature: (router, regex match) -> rendered answer, or None to defer to the agent
+IntentHandler = Callable[["IntentRouter", "re.Match"], Awaitable[Optional[str]]]
+
+
+class Intent:
+    """A named set of query patterns and the handler that answers them"""
+
+    def __init__(self, name: str, patterns: List[str], handler: IntentHandler):
+        self.name = name
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.handler = handler
+
+    def match(self, query: str) -> Optional["re.Match"]:
+        for pattern in self.patterns:
+            match = pattern.fullmatch(query)
+            if match:
+                return match
+        return None
+
+
+def _specialty_names(vet: Vet) -> List[str]:
+    return [specialty.name.lower() for specialty in vet.specialties or []]
+
+
+def _render_vets(vets: List[Vet]) -> str:
+    lines = []
+    for vet in vets:
+        name = f"{vet.firstName or ''} {vet.lastName or ''}".strip()
+        lines.append(f"- Dr. {name} ({', '.join(_specialty_names(vet)) or 'no specialty'})")
+    return "\n".join(lines)
+
+
+async def _list_vets(router: "IntentRouter", match: "re.Match") -> Optional[str]:
+    vets = await router.data_provider.get_all_vets()
+    # Long lists go to the agent, which follows the system prompt's rule for large vet lists
+    if not vets or len(vets) > router.max_items:
+        return None
+    return "Here are the veterinarians of our clinic:\n" + _render_vets(vets)
+
+
+async def _vets_by_specialty(router: "IntentRouter", match: "re.Match") -> Optional[str]:
+    term = match.group("specialty").lower()
+    all_vets = await router.data_provider.get_all_vets()
+    # Only answer for a known specialty; names and free text are left to the agent
+    specialties = {name for vet in all_vets for name in _specialty_names(vet)}
+    if term in specialties:
+        specialty = term
+    else:
+        # A prefix ("dent") only counts when it names a single specialty; ambiguous ones go to the agent
+        candidates = sorted(name for name in specialties if name.startswith(term))
+        if len(candidates) != 1:
+            return None
+        specialty = candidates[0]
+
+    vets = [vet for vet in all_vets if specialty in _specialty_names(vet)]
+    if len(vets) > router.max_items:
+        return None
+    return f"These veterinarians specialize in {specialty}:\n" + _render_vets(vets)
+
+
+async def _count_owners(router: "IntentRouter", match: "re.Match") -> Optional[str]:
+    result = json.loads(await router.tools["list_owners"].ainvoke({"limit": 1, "fields": "id"}))
+    if "total" not in result:
+        return None
+    total = result["total"]
+    return f"There {'is' if total == 1 else 'are'} {total} owner{'' if total == 1 else 's'} registered in the clinic."
+
+
+_VETS = r"(?:vets|veterinarians|doctors)"
+
+# Intent name -> intent; FAST_PATH_INTENTS selects which of them are enabled
+INTENTS: Dict[str, Intent] = {
+    "list_vets": Intent("list_vets", [
+        rf"(?:please )?(?:list|show)(?: me)?(?: all)?(?: the)?(?: of)?(?: your| our)? {_VETS}(?: please)?[.?!]*",
+        rf"(?:who are|what are)(?: all)? (?:the|your|our) {_VETS}[.?!]*",
+    ], _list_vets),
+    "vets_by_specialty": Intent("vets_by_specialty", [
+        rf"(?:please )?(?:list|show|find)(?: me)?(?: all)?(?: the)? {_VETS} "
+        rf"(?:with|in|for|specializing in|specialized in|who do|that do) (?P<specialty>[a-z]+)[.?!]*",
+        rf"(?:which|what) {_VETS} (?:do|does|specialize in|are specialized in|have) (?P<specialty>[a-z]+)[.?!]*",
+        rf"who (?:does|do|specializes in) (?P<specialty>[a-z]+)[.?!]*",
+    ], _vets_by_specialty),
+    "count_owners": Intent("count_owners", [
+        r"how many (?:pet )?owners(?: are there| do we have| do you have| are registered)?[.?!]*",
+    ], _count_owners),
+}
+
+
+def register_intent(intent: Intent):
+    """
+    Register an additional fast-path intent.
+
+    Args:
+        intent: Intent to add; it is enabled when listed in FAST_PATH_INTENTS
+    """
+    INTENTS[intent.name] = intent
+
+
+class IntentRouter:
+    """Routes simple queries to a tool call plus template; reports hits and latency saved"""
+
+    def __init__(self, tools: list, data_provider: DataProvider):
+        self.tools = {t.name: t for t in tools}
+        self.data_provider = data_provider
+
+        self.enabled = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+        names = os.getenv("FAST_PATH_INTENTS", ",".join(INTENTS))
+        self.intents = [INTENTS[name.strip()] for name in names.split(",") if name.strip() in INTENTS]
+        self.max_items = int(os.getenv("FAST_PATH_MAX_ITEMS", "50"))
+
+        self.hits: Dict[str, int] = {intent.name: 0 for intent in self.intents}
+        self.deferred = 0
+        self.misses = 0
+        self.errors = 0
+        self.fast_path_seconds = 0.0
+        self.latency_saved_seconds = 0.0
+        # Running mean of agent turn latency, used to estimate the time saved by a hit
+        self._agent_turns = 0
+        self._agent_seconds = 0.0
+
+    async def route(self, query: str) -> Optional[str]:
+        """
+        Answer a query on the fast path if it matches an enabled intent.
+
+        Args:
+            query: User's message
+
+        Returns:
+            Rendered answer, or None when the agent should handle the query
+        """
+        if not self.enabled:
+            return None
+
+        text = " ".join(query.strip().split())
+        for intent in self.intents:
+            match = intent.match(text)
+            if match is None:
+                continue
+
+            start = time.perf_counter()
+            try:
+                answer = await intent.handler(self, match)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Fast path intent {intent.name} failed, deferring to the agent: {e}")
+                return None
+            if answer is None:
+                self.deferred += 1
+                return None
+
+            elapsed = time.perf_counter() - start
+            self.hits[intent.name] += 1
+            self.fast_path_seconds += elapsed
+            if self._agent_turns:
+                self.latency_saved_seconds += max(self._agent_seconds / self._agent_turns - elapsed, 0.0)
+            logger.info(f"Fast path answered intent {intent.name} in {elapsed * 1000:.1f}ms")
+            return answer
+
+        self.misses += 1
+        return None
+
+    def record_agent_turn(self, seconds: float):
+        """Record the latency of a turn handled by the agent"""
+        self._agent_turns += 1
+        self._agent_seconds += seconds
+
+    def stats(self) -> dict:
+        """Get fast path statistics"""
+        hits = sum(self.hits.values())
+        routed = hits + self.deferred + self.misses
+        return {
+            "enabled": self.enabled,
+            "intents": [intent.name for intent in self.intents],
+            "hits": dict(self.hits),
+            "deferred": self.deferred,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(hits / routed, 4) if routed else 0.0,
+            "avg_fast_path_ms": round(self.fast_path_seconds / hits * 1000, 2) if hits else 0.0,
+            "avg_agent_turn_ms": round(self._agent_seconds / self._agent_turns * 1000, 2) if self._agent_turns else 0.0,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3)
+        }
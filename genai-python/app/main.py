@@ -3,23 +3,24 @@ FastAPI application for GenAI Python Service.
 Spring PetClinic GenAI Service - Python Implementation
 """
 
+import asyncio
 import logging
 import os
-# #region agent log
 import json
-def _debug_log(location, message, data, hypothesis_id):
-    import time
-    log_entry = json.dumps({"location": location, "message": message, "data": data, "hypothesisId": hypothesis_id, "timestamp": int(time.time()*1000)})
-    print(f"[DEBUG] {log_entry}", flush=True)
-# #endregion
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.startup import WarmUp
+from app.shared_state import create_state_backend, worker_count
 from app.data_provider import DataProvider
 from app.vector_store import VectorStoreController
-from app.chat_client import PetclinicChatClient
+from app.metrics import registry as metrics
+from app.diagnostics import diagnostics
+from app.admission import AdmissionRejected
+from app.rate_limit import limiter_stats
+from app.history import HistoryManager
 
 # Configure logging
 logging.basicConfig(
@@ -28,32 +29,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global instances
-data_provider = DataProvider()
-vector_store_controller = VectorStoreController(data_provider)
-chat_client = None
+# Conversation session is identified by this header or cookie
+SESSION_HEADER = os.getenv("CHAT_SESSION_HEADER", "X-Session-Id")
+SESSION_COOKIE = os.getenv("CHAT_SESSION_COOKIE", "chat_session_id")
+
+
+def _get_session_id(request: Request):
+    """
+    Resolve the conversation session id from the request header or cookie.
+    
+    Returns:
+        Session id, or None when the request is not part of a conversation
+    """
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if session_id:
+        session_id = session_id.strip()[:128]
+    return session_id or None
+
+
+async def _warm_up_chat_client(state):
+    """Build the chat client off the event loop (imports the LLM SDK and compiles the agent graph)"""
+    
+    def build():
+        from app.chat_client import PetclinicChatClient
+        return PetclinicChatClient(state.data_provider, state.vector_store_controller, state.state_backend)
+    
+    state.chat_client = await asyncio.to_thread(build)
+    logger.info("Chat client initialized")
+
+
+async def _warm_up_vector_store(state):
+    """Open and sync the vector store, then keep it in sync with vets-service in the background"""
+    await state.vector_store_controller.load_vector_store_on_startup()
+    logger.info("Vector store loaded successfully")
+    state.vector_store_controller.synchronizer.start()
+
+
+async def _require_chat_client(request: Request):
+    """
+    Get the chat client, waiting briefly for it while the service is still warming up.
+    
+    Raises:
+        HTTPException: 503 with Retry-After when the chat client is not available
+    """
+    state = request.app.state
+    if state.chat_client is None and not await state.warm_up.wait_for("chatClient"):
+        raise HTTPException(
+            status_code=503,
+            detail="Chat client not initialized",
+            headers={"Retry-After": "5"}
+        )
+    return state.chat_client
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifespan event handler for startup and shutdown.
-    Initializes vector store on startup.
+    Creates the per-worker components on app.state, starts accepting requests
+    right away and warms up the chat client and vector store in the background.
     """
     # Startup
-    logger.info("Starting GenAI Python Service...")
+    logger.info(f"Starting GenAI Python Service (worker pid {os.getpid()}, {worker_count()} worker(s))...")
     
-    # Load vector store
-    try:
-        await vector_store_controller.load_vector_store_on_startup()
-        logger.info("Vector store loaded successfully")
-    except Exception as e:
-        logger.error(f"Failed to load vector store: {e}")
+    # Each worker process owns its components; state shared between workers goes through the backend
+    state = app.state
+    state.state_backend = create_state_backend()
+    state.data_provider = DataProvider(state.state_backend)
+    state.vector_store_controller = VectorStoreController(state.data_provider)
+    state.chat_client = None
+    state.warm_up = WarmUp()
     
-    # Initialize chat client
-    global chat_client
-    chat_client = PetclinicChatClient(data_provider, vector_store_controller)
-    logger.info("Chat client initialized")
+    # Start the shared HTTP client used for all downstream service calls
+    await state.data_provider.start()
+    
+    # Heavy components are built in the background; readiness tracks their progress
+    state.warm_up.start([
+        ("chatClient", lambda: _warm_up_chat_client(state)),
+        ("vectorStore", lambda: _warm_up_vector_store(state)),
+    ])
     
     logger.info("GenAI Python Service started successfully")
     
@@ -61,6 +115,12 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down GenAI Python Service...")
+    await state.warm_up.stop()
+    await state.vector_store_controller.synchronizer.stop()
+    await state.data_provider.aclose()
+    state.vector_store_controller.close()
+    state.state_backend.close()
+    diagnostics.stop()
 
 
 # Create FastAPI application
@@ -101,21 +161,173 @@ async def health_check():
 
 
 @app.get("/actuator/health")
-async def actuator_health():
+async def actuator_health(request: Request):
     """Spring Boot Actuator compatible health check"""
+    state = request.app.state
     return {
         "status": "UP",
         "components": {
+            "readiness": _readiness(state),
             "vectorStore": {
-                "status": "UP" if vector_store_controller.get_vector_store() else "DOWN"
+                "status": "UP" if state.vector_store_controller.get_vector_store() else "DOWN",
+                "details": {
+                    "sync": state.vector_store_controller.synchronizer.stats(),
+                    "lookup": state.vector_store_controller.lookup_index.stats()
+                }
             },
             "chatClient": {
-                "status": "UP" if chat_client else "DOWN"
+                "status": "UP" if state.chat_client else "DOWN"
+            },
+            "worker": {
+                "status": "UP",
+                "details": {
+                    "pid": os.getpid(),
+                    "workers": worker_count(),
+                    "state": state.state_backend.stats()
+                }
             }
         }
     }
 
 
+def _readiness(state) -> dict:
+    """Ready to take chat traffic once the chat client is up; vet search degrades until the vector store is"""
+    return {
+        "status": "UP" if state.chat_client else "OUT_OF_SERVICE",
+        "details": state.warm_up.stats()
+    }
+
+
+@app.get("/actuator/health/liveness")
+async def liveness():
+    """Liveness probe: the process is serving requests"""
+    return {"status": "UP"}
+
+
+@app.get("/actuator/health/readiness")
+async def readiness(request: Request):
+    """Readiness probe: 503 until the chat client has warmed up"""
+    state = _readiness(request.app.state)
+    return JSONResponse(content=state, status_code=200 if state["status"] == "UP" else 503)
+
+
+@app.get("/actuator/caches")
+async def actuator_caches(request: Request):
+    """Hit/miss counters of the owner, vet, query embedding and response caches"""
+    state = request.app.state
+    return {
+        "caches": {
+            **state.data_provider.cache_stats(),
+            "queryEmbeddings": state.vector_store_controller.embedding_cache_stats(),
+            "responses": await state.chat_client.response_cache.stats() if state.chat_client else None
+        }
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Chat pipeline metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/actuator/diagnostics")
+async def get_diagnostics():
+    """Current diagnostic tracing settings and counters"""
+    return diagnostics.stats()
+
+
+@app.post("/actuator/diagnostics")
+async def set_diagnostics(request: Request):
+    """
+    Switch diagnostic tracing at runtime.
+    
+    Request body: JSON with any of "enabled" (bool), "level" (e.g. "DEBUG") and "sample_rate" (0.0 - 1.0);
+    values of the wrong type (e.g. "enabled": "false") are rejected with 400
+    """
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise TypeError("Request body must be a JSON object")
+        return diagnostics.configure(
+            enabled=body.get("enabled"),
+            level=body.get("level"),
+            sample_rate=body.get("sample_rate")
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/actuator/fastpath")
+async def actuator_fastpath(request: Request):
+    """Hit counts and latency saved by the fast-path intent router"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    return chat_client.intent_router.stats()
+
+
+@app.get("/actuator/admission")
+async def actuator_admission(request: Request):
+    """In-flight agent runs, queue depth, wait times and shed requests"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    return chat_client.admission.stats()
+
+
+@app.get("/actuator/conversations")
+async def actuator_conversations(request: Request):
+    """Conversation store size and history compaction counters"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    return {"store": await chat_client.conversation_store.stats(), "history": chat_client.history.stats()}
+
+
+@app.delete("/actuator/conversations")
+async def actuator_clear_conversations(request: Request):
+    """Reset the conversation memory of every session"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    await chat_client.conversation_store.clear()
+    logger.info("Conversation memory of every session reset")
+    return {"status": "success", "message": "All conversation memory reset"}
+
+
+@app.get("/actuator/tools")
+async def actuator_tools(request: Request):
+    """Per-tool call counts, latency, errors and timeouts"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    return chat_client.tool_execution.stats()
+
+
+@app.get("/actuator/routing")
+async def actuator_routing(request: Request):
+    """Model tier decisions and per-tier latency"""
+    chat_client = request.app.state.chat_client
+    if not chat_client:
+        raise HTTPException(status_code=503, detail="Chat client not initialized")
+    return chat_client.model_router.stats()
+
+
+@app.get("/actuator/ratelimits")
+async def actuator_ratelimits():
+    """Client-side LLM and embedding rate limits, throttled time, provider 429s and retries"""
+    return limiter_stats()
+
+
+def _shed_response(rejection: AdmissionRejected) -> PlainTextResponse:
+    """429 when the wait queue is full, 503 when the request waited too long; both with Retry-After"""
+    return PlainTextResponse(
+        content="The assistant is busy right now. Please try again shortly.",
+        status_code=rejection.status_code,
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
+
 @app.post("/chatclient")
 async def chat_endpoint(request: Request):
     """
@@ -135,30 +347,33 @@ async def chat_endpoint(request: Request):
         
         logger.info(f"Received chat request: {query_text[:100]}...")
         
-        # #region agent log
-        _debug_log("main.py:chat_endpoint", "Chat request received", {"query": query_text[:50], "msg_count_before": len(chat_client.messages) if chat_client else 0, "client_id": id(chat_client)}, "A")
-        # #endregion
+        session_id = _get_session_id(request)
         
-        # Get response from chat client
-        if not chat_client:
-            raise HTTPException(status_code=503, detail="Chat client not initialized")
+        if diagnostics.enabled:
+            diagnostics.event("main.py:chat_endpoint", "Chat request received",
+                              {"query": query_text[:50], "session_id": session_id})
         
-        response = await chat_client.chat(query_text)
+        # Get response from chat client (waits briefly while the service warms up)
+        chat_client = await _require_chat_client(request)
         
-        # #region agent log
-        _debug_log("main.py:chat_endpoint", "Chat response generated", {"response_len": len(response), "msg_count_after": len(chat_client.messages) if chat_client else 0}, "A")
-        # #endregion
+        # Opt-in streaming: clients that accept an event stream get SSE instead of plain text
+        if "text/event-stream" in request.headers.get("accept", ""):
+            ticket = await chat_client.admission.acquire()
+            return _stream_response(chat_client, ticket, query_text, session_id, _wants_tool_events(request))
         
-        # Clear conversation history after each request to prevent history from persisting across browser reloads
-        chat_client.reset_memory()
+        # Requests without a session id start from an empty history and leave nothing behind,
+        # so conversation history does not persist across browser reloads
+        response = await chat_client.chat(query_text, session_id=session_id)
         
-        # #region agent log
-        _debug_log("main.py:chat_endpoint", "Memory auto-cleared", {"msg_count_after_reset": len(chat_client.messages)}, "A")
-        # #endregion
+        if diagnostics.enabled:
+            diagnostics.event("main.py:chat_endpoint", "Chat response generated",
+                              {"response_len": len(response), "session_id": session_id})
         
         # Return plain text response
         return PlainTextResponse(content=response)
         
+    except AdmissionRejected as e:
+        return _shed_response(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -169,29 +384,87 @@ async def chat_endpoint(request: Request):
         )
 
 
+@app.post("/chatclient/stream")
+async def chat_stream_endpoint(request: Request):
+    """
+    Streaming chat endpoint.
+    Accepts plain text query and returns the response as Server-Sent Events.
+    
+    Request body: plain text query
+    Response: text/event-stream with "token", optional "tool_start" / "tool_end", and "done" events
+    """
+    query = await request.body()
+    query_text = query.decode('utf-8')
+    
+    if not query_text or not query_text.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    chat_client = await _require_chat_client(request)
+    
+    # Streams always run the agent; shed before the response headers are sent
+    try:
+        ticket = await chat_client.admission.acquire()
+    except AdmissionRejected as e:
+        return _shed_response(e)
+    
+    logger.info(f"Received streaming chat request: {query_text[:100]}...")
+    return _stream_response(chat_client, ticket, query_text, _get_session_id(request), _wants_tool_events(request))
+
+
+def _wants_tool_events(request: Request) -> bool:
+    """Tool progress events are sent when requested via ?tools=true or the X-Stream-Tool-Events header"""
+    flag = request.query_params.get("tools") or request.headers.get("X-Stream-Tool-Events", "")
+    return flag.lower() in ("1", "true", "yes")
+
+
+def _stream_response(chat_client, ticket, query_text: str, session_id, include_tool_events: bool) -> StreamingResponse:
+    """Wrap the chat client's event stream as a Server-Sent Events response, holding the admission ticket"""
+    
+    async def event_source():
+        try:
+            async for event in chat_client.chat_stream(query_text, session_id, include_tool_events):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+        finally:
+            ticket.release()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/chat/reset")
-async def reset_chat_memory():
-    """Reset the conversation memory"""
-    # #region agent log
-    _debug_log("main.py:reset_chat_memory", "Reset endpoint called", {"msg_count_before": len(chat_client.messages) if chat_client else 0}, "C")
-    # #endregion
+async def reset_chat_memory(request: Request):
+    """Reset the conversation memory of the caller's session"""
+    session_id = _get_session_id(request)
+    chat_client = request.app.state.chat_client
+    if not session_id:
+        # Never let an anonymous caller wipe every session; that is DELETE /actuator/conversations
+        raise HTTPException(status_code=400, detail="X-Session-Id header or chat_session_id cookie is required")
+    if diagnostics.enabled:
+        diagnostics.event("main.py:reset_chat_memory", "Reset endpoint called", {"session_id": session_id})
     try:
         if chat_client:
-            chat_client.reset_memory()
-            # #region agent log
-            _debug_log("main.py:reset_chat_memory", "Memory reset complete", {"msg_count_after": len(chat_client.messages)}, "C")
-            # #endregion
+            await chat_client.reset_memory(session_id)
+            if diagnostics.enabled:
+                diagnostics.event("main.py:reset_chat_memory", "Memory reset complete",
+                                  await chat_client.conversation_store.stats())
             return {"status": "success", "message": "Conversation memory reset"}
         else:
             raise HTTPException(status_code=503, detail="Chat client not initialized")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error resetting memory: {e}")
         raise HTTPException(status_code=500, detail="Failed to reset memory")
 
 
 @app.get("/info")
-async def service_info():
+async def service_info(request: Request):
     """Service information endpoint"""
+    chat_client = request.app.state.chat_client
+    history = chat_client.history if chat_client else HistoryManager()
     return {
         "service": "genai-python",
         "description": "Python implementation of Spring PetClinic GenAI Service",
@@ -201,7 +474,7 @@ async def service_info():
             "Conversational AI chatbot",
             "Function calling (list owners, add owner, list vets, add pet)",
             "RAG with vector store for vet data",
-            "Conversation memory (10 messages)"
+            history.describe()
         ],
         "environment": {
             "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
@@ -227,10 +500,12 @@ if __name__ == "__main__":
     
     port = int(os.getenv("PORT", "8084"))
     
+    # WEB_CONCURRENCY worker processes; auto-reload is for local development and implies a single worker
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=port,
-        reload=True
+        workers=worker_count(),
+        reload=os.getenv("RELOAD", "false").lower() == "true"
     )
 
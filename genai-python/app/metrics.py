@@ -0,0 +1,293 @@
+"""
+Chat pipeline metrics.
+Stage latencies, LLM rounds, tool calls, token counts and tool payload sizes are
+recorded as OpenTelemetry instruments (when the OTel API is installed) and kept in
+a small local registry that GET /metrics renders in Prometheus text format.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+# LangChain 1.x imports - updated paths
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError:  # pragma: no cover - OTel is optional
+    otel_metrics = None
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+SIZE_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Fixed-bucket histogram per label set, mirrored to an OTel histogram"""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], unit: str, otel_name: str):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+        self._otel = None
+        if otel_metrics is not None and MetricsRegistry.otel_enabled():
+            self._otel = otel_metrics.get_meter(__name__).create_histogram(otel_name, unit=unit, description=description)
+
+    def observe(self, value: float, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Layout: one count per bucket, then +Inf count, then sum
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+        if self._otel is not None:
+            self._otel.record(value, attributes=labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+            cumulative += values[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set, mirrored to an OTel counter"""
+
+    def __init__(self, name: str, description: str, unit: str, otel_name: str):
+        self.name = name
+        self.description = description
+        self.enabled = True
+        self._series: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+        self._otel = None
+        if otel_metrics is not None and MetricsRegistry.otel_enabled():
+            self._otel = otel_metrics.get_meter(__name__).create_counter(otel_name, unit=unit, description=description)
+
+    def increment(self, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + value
+        if self._otel is not None:
+            self._otel.add(value, attributes=labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Current value per label set, mirrored to an OTel up-down counter"""
+
+    def __init__(self, name: str, description: str, unit: str, otel_name: str):
+        self.name = name
+        self.description = description
+        self.enabled = True
+        self._series: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+        self._otel = None
+        if otel_metrics is not None and MetricsRegistry.otel_enabled():
+            self._otel = otel_metrics.get_meter(__name__).create_up_down_counter(
+                otel_name, unit=unit, description=description
+            )
+
+    def set(self, value: float, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            delta = value - self._series.get(key, 0)
+            self._series[key] = value
+        if self._otel is not None and delta:
+            self._otel.add(delta, attributes=labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Instruments of the chat pipeline"""
+
+    def __init__(self):
+        self.enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+        self.stage_duration = Histogram(
+            "genai_stage_duration_seconds", "Duration of chat pipeline stages",
+            LATENCY_BUCKETS, "s", "genai.stage.duration"
+        )
+        self.chat_requests = Counter(
+            "genai_chat_requests_total", "Chat requests by how they were answered",
+            "{request}", "genai.chat.requests"
+        )
+        self.llm_rounds = Histogram(
+            "genai_llm_rounds_per_request", "LLM calls needed to answer one chat request",
+            COUNT_BUCKETS, "{call}", "genai.llm.rounds"
+        )
+        self.llm_tokens = Counter(
+            "genai_llm_tokens_total", "LLM tokens by type (prompt / completion)",
+            "{token}", "genai.llm.tokens"
+        )
+        self.tool_calls = Counter(
+            "genai_tool_calls_total", "Tool calls by tool and status",
+            "{call}", "genai.tool.calls"
+        )
+        self.tool_output_chars = Histogram(
+            "genai_tool_output_chars", "Size of tool outputs passed back to the LLM",
+            SIZE_BUCKETS, "{char}", "genai.tool.output.size"
+        )
+        self.model_routing = Counter(
+            "genai_model_routing_total", "Agent model calls by model tier and routing reason",
+            "{call}", "genai.model.routing"
+        )
+        self.history_tokens = Histogram(
+            "genai_history_tokens", "Estimated tokens of the conversation history sent with an agent turn",
+            SIZE_BUCKETS, "{token}", "genai.history.tokens"
+        )
+        self.admission_in_flight = Gauge(
+            "genai_admission_in_flight", "Agent runs currently holding an admission slot",
+            "{request}", "genai.admission.in_flight"
+        )
+        self.admission_queue_depth = Gauge(
+            "genai_admission_queue_depth", "Requests waiting for an admission slot",
+            "{request}", "genai.admission.queue_depth"
+        )
+        self.admission_rejections = Counter(
+            "genai_admission_rejections_total", "Requests shed by admission control, by reason",
+            "{request}", "genai.admission.rejections"
+        )
+        self.rate_limit_events = Counter(
+            "genai_rate_limit_events_total", "Client-side rate limiter events by call kind (llm / embedding) and event",
+            "{event}", "genai.rate_limit.events"
+        )
+        for instrument in self.instruments():
+            instrument.enabled = self.enabled
+
+    def instruments(self) -> list:
+        return [self.stage_duration, self.chat_requests, self.llm_rounds,
+                self.llm_tokens, self.tool_calls, self.tool_output_chars, self.history_tokens,
+                self.model_routing, self.admission_in_flight, self.admission_queue_depth,
+                self.admission_rejections, self.rate_limit_events]
+
+    @staticmethod
+    def otel_enabled() -> bool:
+        return os.getenv("METRICS_OTEL_ENABLED", "true").lower() == "true"
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Record the duration of the enclosed block as a pipeline stage"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_duration.observe(time.perf_counter() - start, stage=stage, **labels)
+
+    def observe_stage(self, stage: str, seconds: float, **labels):
+        self.stage_duration.observe(seconds, stage=stage, **labels)
+
+    def render(self) -> str:
+        """Render every instrument in Prometheus text exposition format"""
+        lines: List[str] = []
+        for instrument in self.instruments():
+            lines.extend(instrument.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording LLM call latency and token usage.
+    Tool calls are recorded by the agent's tool execution middleware, which also sees timeouts.
+    """
+
+    # Called directly on the event loop; the handlers only update counters
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.registry.observe_stage("llm_call", time.perf_counter() - started)
+
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        if not prompt_tokens and not completion_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        if prompt_tokens:
+            self.registry.llm_tokens.increment(prompt_tokens, type="prompt")
+        if completion_tokens:
+            self.registry.llm_tokens.increment(completion_tokens, type="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.registry.observe_stage("llm_call", time.perf_counter() - started, status="error")
+
+
+# Process-wide registry shared by the data provider, vector store and chat client
+registry = MetricsRegistry()
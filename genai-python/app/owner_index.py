@@ -0,0 +1,166 @@
+"""
+Local owner lookup index keyed by normalized name, phone and city.
+Lets the agent resolve an owner id with one cheap lookup instead of listing every owner.
+"""
+
+import re
+import difflib
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.models import Owner
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Minimum similarity for a fuzzy name or city match
+FUZZY_CUTOFF = 0.75
+# Minimum number of trailing digits for a partial phone match
+MIN_PHONE_SUFFIX = 4
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+
+def _digits(text: str) -> str:
+    return re.sub(r"\D", "", text or "")
+
+
+class OwnerIndex:
+    """In-memory owner index with exact and fuzzy matching"""
+
+    def __init__(self):
+        self._owners: Dict[int, Owner] = {}
+        self._names: Dict[str, Set[int]] = {}
+        self._cities: Dict[str, Set[int]] = {}
+        self._phones: Dict[str, Set[int]] = {}
+        # Owner list the index was built from, to detect when a rebuild is needed
+        self.source: Optional[list] = None
+
+    def build(self, owners: List[Owner]):
+        """
+        Rebuild the index from the full owner list.
+
+        Args:
+            owners: Owners returned by DataProvider.get_all_owners
+        """
+        self._owners, self._names, self._cities, self._phones = {}, {}, {}, {}
+        for owner in owners:
+            self._add(owner)
+        self.source = owners
+        logger.debug(f"Owner index built with {len(self._owners)} owners")
+
+    def upsert(self, owner: Owner, source: Optional[list] = None):
+        """
+        Add or replace a single owner without rebuilding.
+
+        Args:
+            owner: Created or updated owner
+            source: Owner list that now includes the change, if known
+        """
+        if owner.id is not None and owner.id in self._owners:
+            self._remove(self._owners[owner.id])
+        self._add(owner)
+        if source is not None:
+            self.source = source
+
+    def get(self, owner_id: int) -> Optional[Owner]:
+        return self._owners.get(owner_id)
+
+    def _add(self, owner: Owner):
+        if owner.id is None:
+            return
+        self._owners[owner.id] = owner
+        for token in _tokens(f"{owner.firstName} {owner.lastName}"):
+            self._names.setdefault(token, set()).add(owner.id)
+        city = " ".join(_tokens(owner.city))
+        if city:
+            self._cities.setdefault(city, set()).add(owner.id)
+        phone = _digits(owner.telephone)
+        if phone:
+            self._phones.setdefault(phone, set()).add(owner.id)
+
+    def _remove(self, owner: Owner):
+        for table in (self._names, self._cities, self._phones):
+            for key in [k for k, ids in table.items() if owner.id in ids]:
+                table[key].discard(owner.id)
+                if not table[key]:
+                    del table[key]
+        self._owners.pop(owner.id, None)
+
+    @staticmethod
+    def _fuzzy(key: str, table: Dict[str, Set[int]]) -> Dict[int, float]:
+        """Owner ids matching a key exactly (score 1.0) or fuzzily (score = similarity)"""
+        if key in table:
+            return {owner_id: 1.0 for owner_id in table[key]}
+        scores: Dict[int, float] = {}
+        for candidate in difflib.get_close_matches(key, table.keys(), n=5, cutoff=FUZZY_CUTOFF):
+            ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+            for owner_id in table[candidate]:
+                scores[owner_id] = max(scores.get(owner_id, 0.0), ratio)
+        return scores
+
+    def _match_phone(self, telephone: str) -> Dict[int, float]:
+        digits = _digits(telephone)
+        if digits in self._phones:
+            return {owner_id: 1.0 for owner_id in self._phones[digits]}
+        if len(digits) < MIN_PHONE_SUFFIX:
+            return {}
+        return {
+            owner_id: 0.9
+            for phone, ids in self._phones.items() if phone.endswith(digits)
+            for owner_id in ids
+        }
+
+    def search(
+        self,
+        name: Optional[str] = None,
+        telephone: Optional[str] = None,
+        city: Optional[str] = None,
+        limit: int = 5
+    ) -> List[Tuple[Owner, float]]:
+        """
+        Find owners matching all of the given criteria.
+
+        Args:
+            name: First and/or last name; every word must match (typos tolerated)
+            telephone: Full phone number or its last digits
+            city: City name (typos tolerated)
+            limit: Maximum number of results
+
+        Returns:
+            List of (owner, score) sorted by descending score; score is 1.0 for exact matches
+        """
+        criteria: List[Dict[int, float]] = []
+
+        for token in _tokens(name):
+            criteria.append(self._fuzzy(token, self._names))
+        if telephone and _digits(telephone):
+            criteria.append(self._match_phone(telephone))
+        city_key = " ".join(_tokens(city))
+        if city_key:
+            criteria.append(self._fuzzy(city_key, self._cities))
+
+        if not criteria:
+            return []
+
+        candidates = set(criteria[0])
+        for matches in criteria[1:]:
+            candidates &= set(matches)
+
+        scored = [
+            (self._owners[owner_id], sum(matches[owner_id] for matches in criteria) / len(criteria))
+            for owner_id in candidates
+        ]
+        scored.sort(key=lambda item: (-item[1], item[0].id))
+        return scored[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "owners": len(self._owners),
+            "names": len(self._names),
+            "cities": len(self._cities),
+            "phones": len(self._phones)
+        }
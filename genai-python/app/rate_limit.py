@@ -0,0 +1,357 @@
+"""
+Client-side rate limiting and retries for LLM and embedding calls.
+Token buckets keep requests and estimated tokens per minute under the account
+quota, so bursts queue briefly in the process instead of turning into provider
+429s. When the provider does throttle, every caller of the same limiter pauses
+for the provider's retry hint and the send rate is lowered, then recovers
+gradually; retries use jittered exponential backoff.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# LangChain 1.x imports - updated paths
+from langchain_core.embeddings import Embeddings
+
+from app.metrics import registry as metrics
+from app.shared_state import worker_count
+from app.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying besides 429
+RETRYABLE_STATUSES = {408, 409, 500, 502, 503, 504}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than the limiter's max wait"""
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: a caller takes its amount right away,
+    possibly driving the bucket negative, and waits until the refill covers the debt.
+    Callers are therefore served in arrival order without polling.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.per_minute = per_minute
+        self.capacity = max(per_minute * burst_seconds / 60.0, 1.0)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, scale: float) -> float:
+        """
+        Take amount from the bucket.
+
+        Args:
+            amount: Requests or tokens to take; capped at the bucket capacity
+            scale: Fraction of the configured rate currently allowed
+
+        Returns:
+            Seconds until the reservation is covered
+        """
+        rate = self.per_minute * scale / 60.0
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * rate)
+        self._updated = now
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / rate)
+
+    def refund(self, amount: float):
+        """Return (or, when negative, additionally charge) part of a reservation"""
+        self.level = min(self.capacity, self.level + amount)
+
+
+def parse_retry_hint(headers) -> Optional[float]:
+    """
+    Seconds the provider asks us to wait, from a 429 response's headers.
+
+    Args:
+        headers: Response headers (case-insensitive mapping)
+
+    Returns:
+        Seconds to wait, or None when the response carries no hint
+    """
+    if headers is None:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        # An HTTP date; fall back to the reset headers
+        pass
+    waits = []
+    for kind in ("requests", "tokens"):
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if reset and headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            parts = _DURATION_PART.findall(reset)
+            units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+            waits.append(sum(float(value) * units[unit] for value, unit in parts))
+    return max(waits) if waits else None
+
+
+def classify_error(error: BaseException) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide whether a failed call is worth retrying.
+
+    Args:
+        error: Exception raised by the provider client
+
+    Returns:
+        Tuple of (retryable, throttled by the provider, retry hint in seconds or None)
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status == 429:
+        # Exhausted billing quota is reported as 429 too, but waiting does not help
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False, True, None
+        return True, True, parse_retry_hint(getattr(response, "headers", None))
+    if status in RETRYABLE_STATUSES:
+        return True, False, parse_retry_hint(getattr(response, "headers", None))
+    if status is not None:
+        return False, False, None
+
+    try:
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True, False, None
+    except ImportError:  # pragma: no cover - only the local embedding provider is usable then
+        pass
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)), False, None
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one kind of provider call,
+    with a cooldown shared by all callers after a 429 and an adaptive send rate.
+    """
+
+    # Send rate multiplier after a provider 429 (multiplicative decrease) ...
+    THROTTLE_DECREASE = 0.8
+    # ... and its additive recovery per successful call
+    RECOVERY_STEP = 0.02
+    MIN_SCALE = 0.25
+
+    def __init__(self, kind: str, env_prefix: str):
+        self.kind = kind
+        workers = worker_count()
+        # Quotas are per account; each worker process takes an equal share
+        self.rpm = float(os.getenv(f"{env_prefix}_RPM", "0")) / workers
+        self.tpm = float(os.getenv(f"{env_prefix}_TPM", "0")) / workers
+        burst_seconds = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+        self.max_wait_seconds = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+        self.max_retries = int(os.getenv(f"{env_prefix}_MAX_RETRIES", "4"))
+        self.backoff_base_seconds = float(os.getenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "0.5"))
+        self.backoff_max_seconds = float(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "20"))
+
+        self._requests = TokenBucket(self.rpm, burst_seconds) if self.rpm > 0 else None
+        self._tokens = TokenBucket(self.tpm, burst_seconds) if self.tpm > 0 else None
+        # Reservations are taken from the event loop and from executor threads (sync embeddings)
+        self._lock = threading.Lock()
+        self._scale = 1.0
+        self._paused_until = 0.0
+
+        self.calls = 0
+        self.throttled_calls = 0
+        self.throttled_seconds = 0.0
+        self.provider_throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def limited(self) -> bool:
+        """True when a requests or tokens per minute quota is configured"""
+        return self._requests is not None or self._tokens is not None
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and the estimated tokens; returns the seconds to wait"""
+        with self._lock:
+            wait = self._paused_until - time.monotonic()
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, self._scale))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, self._scale))
+            wait = max(wait, 0.0)
+            if wait > self.max_wait_seconds:
+                # Give the reservation back; the caller is not going to use it
+                if self._requests is not None:
+                    self._requests.refund(1)
+                if self._tokens is not None:
+                    self._tokens.refund(tokens)
+                self.rejected += 1
+                metrics.rate_limit_events.increment(kind=self.kind, event="rejected")
+                raise RateLimitExceeded(
+                    f"{self.kind} rate limit would delay the call by {wait:.1f}s "
+                    f"(max {self.max_wait_seconds:.0f}s)"
+                )
+            self.calls += 1
+            if wait > 0:
+                self.throttled_calls += 1
+                self.throttled_seconds += wait
+        if wait > 0:
+            metrics.observe_stage("rate_limit_wait", wait, kind=self.kind)
+            metrics.rate_limit_events.increment(kind=self.kind, event="throttled")
+        return wait
+
+    def _settle(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket with the provider-reported usage and let the send rate recover"""
+        with self._lock:
+            if actual is not None and self._tokens is not None:
+                self._tokens.refund(estimated - actual)
+            self._scale = min(1.0, self._scale + self.RECOVERY_STEP)
+
+    def _backoff(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed call, or None when it must not be retried.
+        Provider 429s also pause every other caller of this limiter and lower the send rate.
+        """
+        retryable, throttled, hint = classify_error(error)
+        if throttled:
+            self.provider_throttled += 1
+            metrics.rate_limit_events.increment(kind=self.kind, event="provider_throttled")
+        if not retryable or attempt >= self.max_retries:
+            self.failures += 1
+            metrics.rate_limit_events.increment(kind=self.kind, event="failed")
+            return None
+
+        # Full jitter keeps retries of concurrent callers from arriving together
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        if hint is not None:
+            delay = hint + random.uniform(0, max(0.1 * hint, 0.05))
+        if throttled:
+            with self._lock:
+                now = time.monotonic()
+                # Calls sent in the same burst fail together; lower the rate once per pause
+                if self.limited and now >= self._paused_until:
+                    self._scale = max(self.MIN_SCALE, self._scale * self.THROTTLE_DECREASE)
+                self._paused_until = max(self._paused_until, now + delay)
+            logger.warning(f"{self.kind} call throttled by the provider; pausing {delay:.2f}s" +
+                           (f", send rate now {self._scale:.0%} of the configured quota" if self.limited else ""))
+        else:
+            logger.warning(f"{self.kind} call failed ({error}); retrying in {delay:.2f}s")
+        self.retries += 1
+        metrics.rate_limit_events.increment(kind=self.kind, event="retry")
+        metrics.observe_stage("rate_limit_backoff", delay, kind=self.kind)
+        # Throttled calls wait out the shared pause in _reserve instead of sleeping here
+        return 0.0 if throttled else delay
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        usage: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Any:
+        """
+        Run a provider call within the limits, retrying transient failures.
+
+        Args:
+            fn: Coroutine function performing the call
+            estimated_tokens: Tokens the call is expected to consume
+            usage: Extracts the actual token count from the result, when reported
+
+        Returns:
+            Result of fn
+
+        Raises:
+            RateLimitExceeded: When the call would wait longer than the max wait
+        """
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                continue
+            self._settle(estimated_tokens, usage(result) if usage else None)
+            return result
+
+    def call_sync(self, fn: Callable[[], Any], estimated_tokens: int) -> Any:
+        """Blocking variant of call() for synchronous code paths running in worker threads"""
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                if delay > 0:
+                    time.sleep(delay)
+                continue
+            self._settle(estimated_tokens, None)
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "limited": self.limited,
+            "rpm": round(self.rpm, 1),
+            "tpm": round(self.tpm, 1),
+            "workers": worker_count(),
+            "send_rate": round(self._scale, 3),
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "calls": self.calls,
+            "throttled_calls": self.throttled_calls,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "provider_throttled": self.provider_throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected
+        }
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Embeddings wrapper sending every provider call through a rate limiter"""
+
+    def __init__(self, embeddings: Embeddings, limiter: RateLimiter):
+        self.embeddings = embeddings
+        self.limiter = limiter
+
+    @staticmethod
+    def _estimate(texts: List[str]) -> int:
+        return sum(estimate_tokens(text) for text in texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.limiter.call_sync(lambda: self.embeddings.embed_documents(texts), self._estimate(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.limiter.call_sync(lambda: self.embeddings.embed_query(text), estimate_tokens(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.limiter.call(lambda: self.embeddings.aembed_documents(texts), self._estimate(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.limiter.call(lambda: self.embeddings.aembed_query(text), estimate_tokens(text))
+
+
+# Process-wide limiters; every chat client and vector store of the worker shares them
+llm_limiter = RateLimiter("llm", "LLM_RATE_LIMIT")
+embedding_limiter = RateLimiter("embedding", "EMBEDDING_RATE_LIMIT")
+
+
+def limiter_stats() -> Dict[str, dict]:
+    return {"llm": llm_limiter.stats(), "embedding": embedding_limiter.stats()}
@@ -0,0 +1,155 @@
+"""
+Answer cache for read-only chat turns.
+Repeated questions such as "which vets do radiology?" are answered without running the agent.
+With a shared state backend the answers are shared by every worker.
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from app.embedding_cache import normalize_query
+from app.shared_state import StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Tools that only read data; a turn that called anything else is never cached
+READ_ONLY_TOOLS = frozenset({"list_owners", "find_owner", "list_vets"})
+
+
+class CachedResponse:
+    """Cached answer with the time it was stored"""
+
+    def __init__(self, output: str):
+        self.output = output
+        self.stored_at = time.monotonic()
+
+
+class ResponseCache:
+    """
+    LRU cache of agent answers keyed by normalized query and data version.
+    Entries expire after a TTL and are evicted by count and total size. With a shared
+    backend, entries are stored there and bounded by the TTL only.
+    """
+
+    # Backend namespace of shared answers
+    NAMESPACE = "responses"
+
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self.max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        self.ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+        self.max_total_chars = int(os.getenv("RESPONSE_CACHE_MAX_TOTAL_CHARS", str(2 * 1024 * 1024)))
+
+        self.backend = backend if backend is not None and backend.shared else None
+
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._total_size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    async def get(self, query: str, data_version: str) -> Optional[str]:
+        """
+        Get a cached answer.
+
+        Args:
+            query: User's message
+            data_version: Current version of the owner and vet data
+
+        Returns:
+            Cached answer, or None on a miss
+        """
+        key = (normalize_query(query), data_version)
+        if self.backend is not None:
+            output = await self.backend.aget(self.NAMESPACE, self._shared_key(key))
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return output
+
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.stored_at >= self.ttl_seconds:
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.output
+
+    async def put(self, query: str, data_version: str, output: str, tool_names: Iterable[str], tool_failed: bool = False):
+        """
+        Store an answer if the turn only used read-only tools and none of them failed.
+
+        Args:
+            query: User's message
+            data_version: Data version the answer was computed against
+            output: Agent answer
+            tool_names: Names of the tools called during the turn
+            tool_failed: A tool call of the turn failed, so the answer likely reports the failure
+        """
+        if tool_failed or any(name not in READ_ONLY_TOOLS for name in tool_names):
+            self.bypassed += 1
+            return
+        if not output or len(output) > self.max_total_chars:
+            return
+
+        key = (normalize_query(query), data_version)
+        if self.backend is not None:
+            await self.backend.aset(self.NAMESPACE, self._shared_key(key), output, ttl=self.ttl_seconds)
+            self.stores += 1
+            return
+
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = CachedResponse(output)
+        self._total_size += len(output)
+        self.stores += 1
+
+        while len(self._entries) > self.max_entries or self._total_size > self.max_total_chars:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def clear(self):
+        """Drop every cached answer"""
+        self._entries.clear()
+        self._total_size = 0
+        if self.backend is not None:
+            await self.backend.aclear(self.NAMESPACE)
+
+    async def stats(self) -> dict:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "entries": await self.backend.acount(self.NAMESPACE) if self.backend is not None else len(self._entries),
+            "total_chars": self._total_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    @staticmethod
+    def _shared_key(key: Tuple[str, str]) -> str:
+        query, data_version = key
+        return f"{data_version}\x1f{query}"
+
+    def _drop(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        self._total_size -= len(entry.output)
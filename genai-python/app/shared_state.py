@@ -0,0 +1,275 @@
+"""
+Pluggable state backends for conversation history, cached answers and data versions.
+The memory backend is process-local. The SQLite backend keeps the state in a local
+file so that every worker process of the same host (pod) sees it, without any
+external service. Async callers use the a-prefixed methods, which run blocking
+backends in a worker thread so that a busy database never stalls the event loop.
+"""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend:
+    """Namespaced key/value store with per-entry TTL and counters"""
+
+    name = "base"
+    # True when other worker processes see the same state
+    shared = False
+    # True when calls block on I/O; the async methods then run them in a worker thread
+    blocking = False
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Get a value, or None when it is missing or expired"""
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serializable value, expiring after ttl seconds when given"""
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def clear(self, namespace: str):
+        """Delete every value in a namespace"""
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        """Number of live values in a namespace"""
+        raise NotImplementedError
+
+    def increment(self, namespace: str, key: str) -> Optional[int]:
+        """Atomically increment a counter and return the new value (None when the write failed)"""
+        raise NotImplementedError
+
+    def counter(self, namespace: str, key: str) -> int:
+        """Current value of a counter (0 when never incremented)"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "shared": self.shared}
+
+    def close(self):
+        """Release resources held by the backend"""
+
+    async def _call(self, fn: Callable, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aget(self, namespace: str, key: str) -> Optional[Any]:
+        return await self._call(self.get, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        await self._call(self.set, namespace, key, value, ttl)
+
+    async def adelete(self, namespace: str, key: str):
+        await self._call(self.delete, namespace, key)
+
+    async def aclear(self, namespace: str):
+        await self._call(self.clear, namespace)
+
+    async def acount(self, namespace: str) -> int:
+        return await self._call(self.count, namespace)
+
+    async def aincrement(self, namespace: str, key: str) -> Optional[int]:
+        return await self._call(self.increment, namespace, key)
+
+    async def acounter(self, namespace: str, key: str) -> int:
+        return await self._call(self.counter, namespace, key)
+
+
+class MemoryStateBackend(StateBackend):
+    """Process-local backend; the default for a single worker"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+
+    def get(self, namespace, key):
+        item = self._values.get((namespace, key))
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[(namespace, key)]
+            return None
+        return value
+
+    def set(self, namespace, key, value, ttl=None):
+        self._values[(namespace, key)] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, namespace, key):
+        self._values.pop((namespace, key), None)
+
+    def clear(self, namespace):
+        for item_key in [k for k in self._values if k[0] == namespace]:
+            del self._values[item_key]
+
+    def count(self, namespace):
+        now = time.monotonic()
+        return sum(1 for (ns, _), (_, expires_at) in self._values.items()
+                   if ns == namespace and (expires_at is None or expires_at > now))
+
+    def increment(self, namespace, key):
+        value = self._counters.get((namespace, key), 0) + 1
+        self._counters[(namespace, key)] = value
+        return value
+
+    def counter(self, namespace, key):
+        return self._counters.get((namespace, key), 0)
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State shared by the worker processes of one host through a SQLite file in WAL mode.
+    Values are stored as JSON; expired rows are skipped on read and pruned periodically.
+    The state is a cache: on a database error (e.g. "database is locked") reads return
+    nothing and writes are dropped, after logging and counting the error.
+    """
+
+    name = "sqlite"
+    shared = True
+    blocking = True
+
+    # Expired rows are pruned after this many writes
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counters (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "value INTEGER NOT NULL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        self._writes = 0
+        self.errors = 0
+        logger.info(f"Using shared SQLite state at {path}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[list]:
+        """Run one statement; returns None (after logging and counting) when SQLite fails"""
+        try:
+            with self._lock:
+                return self._db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared state {sql.split(' ', 1)[0].lower()} failed: {e}")
+            return None
+
+    def get(self, namespace, key):
+        rows = self._execute("SELECT value, expires_at FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+        if not rows:
+            return None
+        value, expires_at = rows[0]
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, namespace, key, value, ttl=None):
+        rows = self._execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), time.time() + ttl if ttl else None)
+        )
+        if rows is None:
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._execute("DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def delete(self, namespace, key):
+        self._execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace):
+        self._execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+
+    def count(self, namespace):
+        rows = self._execute(
+            "SELECT COUNT(*) FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time())
+        )
+        return rows[0][0] if rows else 0
+
+    def increment(self, namespace, key):
+        rows = self._execute(
+            "INSERT INTO counters (namespace, key, value) VALUES (?, ?, 1) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = value + 1 RETURNING value",
+            (namespace, key)
+        )
+        return rows[0][0] if rows else None
+
+    def counter(self, namespace, key):
+        rows = self._execute("SELECT value FROM counters WHERE namespace = ? AND key = ?", (namespace, key))
+        return rows[0][0] if rows else 0
+
+    def stats(self):
+        return {**super().stats(), "path": self.path, "errors": self.errors}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _create_sqlite_backend() -> StateBackend:
+    return SQLiteStateBackend(os.getenv("STATE_SQLITE_PATH", "./state/shared_state.sqlite3"))
+
+
+# Backend name -> factory
+STATE_BACKENDS: Dict[str, Callable[[], StateBackend]] = {
+    "memory": MemoryStateBackend,
+    "sqlite": _create_sqlite_backend,
+}
+
+
+def register_state_backend(name: str, factory: Callable[[], StateBackend]):
+    """
+    Register an additional state backend (e.g. one backed by an external store).
+
+    Args:
+        name: Value of STATE_BACKEND that selects the backend
+        factory: Callable returning the backend
+    """
+    STATE_BACKENDS[name] = factory
+
+
+def worker_count() -> int:
+    """Number of worker processes, as configured for uvicorn via WEB_CONCURRENCY"""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+def create_state_backend() -> StateBackend:
+    """
+    Create the configured state backend.
+    STATE_BACKEND=auto (the default) uses SQLite when running several workers and memory otherwise.
+
+    Returns:
+        StateBackend instance
+    """
+    name = os.getenv("STATE_BACKEND", "auto").lower()
+    if name == "auto":
+        name = "sqlite" if worker_count() > 1 else "memory"
+    factory = STATE_BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown STATE_BACKEND '{name}'. Available: {', '.join(sorted(STATE_BACKENDS))}")
+    return factory()
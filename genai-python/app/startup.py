@@ -0,0 +1,132 @@
+"""
+Two-phase application startup.
+The service accepts requests as soon as the lifespan handler yields; heavy
+components (chat client, vector store) are built by a background warm-up task
+whose progress backs the readiness probe.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+# Taken when the application module is first imported, as close to process start as we get
+PROCESS_STARTED = time.monotonic()
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+UP = "UP"
+FAILED = "FAILED"
+
+WarmUpStep = Tuple[str, Callable[[], Awaitable[None]]]
+
+
+class WarmUp:
+    """Runs the warm-up steps in the background and tracks their state and timings"""
+
+    def __init__(self):
+        # How long a request may wait for a component that is still warming up
+        self.request_wait_seconds = float(os.getenv("STARTUP_REQUEST_WAIT_SECONDS", "10"))
+
+        self.steps: Dict[str, dict] = {}
+        self.accepting_seconds: Optional[float] = None
+        self.completed_seconds: Optional[float] = None
+        self._events: Dict[str, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, steps: List[WarmUpStep]):
+        """
+        Mark the service as accepting requests and run the warm-up steps concurrently.
+
+        Args:
+            steps: (component name, async callable) pairs
+        """
+        self.accepting_seconds = time.monotonic() - PROCESS_STARTED
+        metrics.observe_stage("startup", self.accepting_seconds, phase="accepting")
+        logger.info(f"Accepting requests {self.accepting_seconds:.2f}s after start; warming up in the background")
+
+        for name, _ in steps:
+            self.steps[name] = {"status": PENDING}
+            self._events[name] = asyncio.Event()
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def _run(self, steps: List[WarmUpStep]):
+        await asyncio.gather(*(self._run_step(name, step) for name, step in steps))
+        self.completed_seconds = time.monotonic() - PROCESS_STARTED
+        metrics.observe_stage("startup", self.completed_seconds, phase="warm")
+        failed = [name for name, step in self.steps.items() if step["status"] == FAILED]
+        if failed:
+            logger.error(f"Warm-up finished {self.completed_seconds:.2f}s after start; failed: {', '.join(failed)}")
+        else:
+            logger.info(f"Warm-up complete {self.completed_seconds:.2f}s after start")
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]):
+        state = self.steps[name]
+        state["status"] = RUNNING
+        started = time.monotonic()
+        try:
+            await step()
+            state["status"] = UP
+        except Exception as e:
+            state["status"] = FAILED
+            state["error"] = str(e)
+            logger.error(f"Warm-up of {name} failed: {e}")
+        finally:
+            state["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+            metrics.observe_stage("warm_up", time.monotonic() - started, component=name)
+            self._events[name].set()
+
+    def is_ready(self, name: str) -> bool:
+        return self.steps.get(name, {}).get("status") == UP
+
+    async def wait_for(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until a component has finished warming up.
+
+        Args:
+            name: Component name
+            timeout: Seconds to wait (defaults to STARTUP_REQUEST_WAIT_SECONDS)
+
+        Returns:
+            True when the component is up
+        """
+        event = self._events.get(name)
+        if event is None:
+            return False
+        if not event.is_set():
+            try:
+                await asyncio.wait_for(event.wait(), self.request_wait_seconds if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                return False
+        return self.is_ready(name)
+
+    @property
+    def state(self) -> str:
+        """STARTING, WARMING_UP, READY or DEGRADED (warm-up finished with failures)"""
+        if self._task is None:
+            return "STARTING"
+        if self.completed_seconds is None:
+            return "WARMING_UP"
+        return "READY" if all(step["status"] == UP for step in self.steps.values()) else "DEGRADED"
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "accepting_after_seconds": round(self.accepting_seconds, 3) if self.accepting_seconds is not None else None,
+            "warm_after_seconds": round(self.completed_seconds, 3) if self.completed_seconds is not None else None,
+            "components": {name: dict(step) for name, step in self.steps.items()}
+        }
+
+    async def stop(self):
+        """Cancel a warm-up that is still running"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
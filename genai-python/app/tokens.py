@@ -0,0 +1,46 @@
+"""
+Cheap token estimates used to keep prompts and tool outputs within budget.
+"""
+
+import json
+import math
+
+# Average characters per token for English text / JSON with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# Role and framing tokens the chat format adds per message or tool call
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without running a tokenizer.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message) -> int:
+    """
+    Estimate the tokens a chat message takes in a prompt: its content, any tool
+    calls it makes and a small per-message overhead.
+
+    Args:
+        message: LangChain message
+
+    Returns:
+        Approximate token count
+    """
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(tool_call.get("name", "") + json.dumps(tool_call.get("args", {}), default=str))
+        tokens += MESSAGE_OVERHEAD_TOKENS
+    return tokens
@@ -0,0 +1,338 @@
+"""
+Vector index backends for the vet vector store.
+Chroma is the default for a single worker; the NumPy index is a lightweight in-process
+alternative for small corpora such as the vet list, and the only backend that several
+worker processes can share.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.shared_state import worker_count
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndex:
+    """Interface shared by all vector index backends"""
+
+    backend = "base"
+
+    def get_all(self) -> Dict[str, dict]:
+        """Get the metadata of every stored document, keyed by document id"""
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], metadatas: List[dict], documents: List[str]):
+        """Insert or replace documents with precomputed embeddings"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        """Delete documents by id"""
+        raise NotImplementedError
+
+    def query(self, embedding: List[float], k: int) -> List[str]:
+        """Get the contents of the k documents most similar to the embedding"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored documents"""
+        raise NotImplementedError
+
+    def persist(self):
+        """Flush pending writes to disk (no-op for backends that persist on write)"""
+
+    def reload(self) -> bool:
+        """
+        Pick up changes persisted by another process (read-only workers).
+
+        Returns:
+            True when a newer version was loaded
+        """
+        return False
+
+
+class ChromaVectorIndex(VectorIndex):
+    """Vector index backed by an embedded, persistent Chroma collection"""
+
+    backend = "chroma"
+
+    def __init__(self, persist_directory: str, collection_name: str):
+        # Imported lazily: chromadb is heavy and unused by the NumPy backend
+        import chromadb
+        from chromadb.config import Settings
+
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # Embeddings are always computed by the service, so no Chroma-side embedding function
+        self.collection = self.client.get_or_create_collection(collection_name, embedding_function=None)
+
+    def get_all(self) -> Dict[str, dict]:
+        stored = self.collection.get(include=["metadatas"])
+        return dict(zip(stored["ids"], stored["metadatas"]))
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def query(self, embedding, k):
+        n_results = min(k, self.collection.count())
+        if n_results <= 0:
+            return []
+        result = self.collection.query(query_embeddings=[embedding], n_results=n_results, include=["documents"])
+        return result["documents"][0]
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyVectorIndex(VectorIndex):
+    """
+    In-memory vector index using a contiguous float32 matrix of normalized embeddings.
+    Queries are a single matrix-vector product followed by argpartition top-k.
+    Persisted as a versioned vectors-*.npy file (memory-mapped on load, so workers on the
+    same host share its pages) plus a metadata.json file that names it. Replacing
+    metadata.json is the commit point, so readers never pair vectors and metadata
+    from different versions.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, persist_directory: str, collection_name: str):
+        self.directory = Path(persist_directory) / "numpy" / collection_name
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        # Rows of _matrix line up with _ids / _metadatas / _documents. _matrix is a view of
+        # the first rows of _buffer, which grows geometrically; new rows are written past the
+        # end of the view and published by swapping in a longer view, so readers never see a
+        # partially added row and ingesting N vectors costs O(N) copies in total.
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        # Writable backing array; None while _matrix is a read-only memory-mapped file
+        self._buffer: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._metadatas: List[dict] = []
+        self._documents: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # (matrix, documents) published together for lock-free queries
+        self._snapshot = (self._matrix, self._documents)
+        # Modification time of the metadata file that was loaded, to detect newer versions
+        self._loaded_mtime: Optional[int] = None
+
+        self._load()
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.directory / "metadata.json"
+
+    def _load(self) -> bool:
+        """Load a persisted index; the matrix stays memory-mapped until the first write"""
+        if not self.metadata_path.exists():
+            return False
+        try:
+            mtime = self.metadata_path.stat().st_mtime_ns
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Indexes persisted before versioned vector files always used vectors.npy
+            matrix = np.load(self.directory / meta.get("vectors", "vectors.npy"), mmap_mode="r")
+            if matrix.shape[0] != len(meta["ids"]):
+                raise ValueError("vectors and metadata are out of sync")
+            self._matrix = matrix
+            self._buffer = None
+            self._ids = meta["ids"]
+            self._metadatas = meta["metadatas"]
+            self._documents = meta["documents"]
+            self._rows = {doc_id: i for i, doc_id in enumerate(self._ids)}
+            self._snapshot = (self._matrix, self._documents)
+            self._loaded_mtime = mtime
+            logger.info(f"Loaded NumPy vector index with {len(self._ids)} documents from {self.directory}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load NumPy vector index from {self.directory}: {e}. Keeping the current index.")
+            return False
+
+    def reload(self) -> bool:
+        try:
+            mtime = self.metadata_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        with self._lock:
+            return self._load()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def get_all(self) -> Dict[str, dict]:
+        return dict(zip(self._ids, self._metadatas))
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            count, dimension = self._matrix.shape
+            if count and dimension != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dimension}")
+            buffer = self._reserve(len(ids), vectors.shape[1])
+
+            # Lists are only appended to or overwritten in place, so a reader's snapshot
+            # still lines up with its shorter view of the buffer
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = count
+                    count += 1
+                    self._rows[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._metadatas.append(metadatas[i])
+                    self._documents.append(documents[i])
+                else:
+                    # Replaced rows are overwritten in place; only that document's score may
+                    # mix old and new values for a query running at the same time
+                    self._metadatas[row] = metadatas[i]
+                    self._documents[row] = documents[i]
+                buffer[row] = vectors[i]
+
+            self._matrix = buffer[:count]
+            self._snapshot = (self._matrix, self._documents)
+            self._dirty = True
+
+    def _reserve(self, extra: int, dimension: int) -> np.ndarray:
+        """Writable buffer with room for extra rows, grown geometrically (called with the lock held)"""
+        count = self._matrix.shape[0]
+        buffer = self._buffer
+        if buffer is None or buffer.shape[1] != dimension or buffer.shape[0] < count + extra:
+            capacity = max(count + extra, 2 * count, 64)
+            grown = np.empty((capacity, dimension), dtype=np.float32)
+            if count:
+                grown[:count] = self._matrix
+            buffer = self._buffer = grown
+        return buffer
+
+    def delete(self, ids):
+        with self._lock:
+            remove = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not remove:
+                return
+            keep = [i for i in range(len(self._ids)) if i not in remove]
+            matrix = np.ascontiguousarray(np.asarray(self._matrix, dtype=np.float32)[keep])
+            doc_ids = [self._ids[i] for i in keep]
+            self._swap(
+                matrix,
+                doc_ids,
+                [self._metadatas[i] for i in keep],
+                [self._documents[i] for i in keep],
+                {doc_id: i for i, doc_id in enumerate(doc_ids)}
+            )
+
+    def _swap(self, matrix, doc_ids, metas, docs, rows):
+        """Publish a new version of the index (called with the lock held)"""
+        self._matrix = matrix
+        self._buffer = matrix
+        self._ids = doc_ids
+        self._metadatas = metas
+        self._documents = docs
+        self._rows = rows
+        self._snapshot = (matrix, docs)
+        self._dirty = True
+
+    def query(self, embedding, k):
+        # Take a consistent snapshot; writers replace it atomically
+        matrix, documents = self._snapshot
+        n = matrix.shape[0]
+        if n == 0 or k <= 0:
+            return []
+
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        scores = matrix @ q
+
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [documents[i] for i in top]
+
+    def count(self):
+        return len(self._ids)
+
+    def persist(self):
+        """Write a new vectors file, then atomically switch metadata.json to it"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            vectors_name = f"vectors-{time.time_ns()}.npy"
+            tmp_vectors = self.directory / "vectors.tmp.npy"
+            np.save(tmp_vectors, np.asarray(self._matrix, dtype=np.float32))
+            os.replace(tmp_vectors, self.directory / vectors_name)
+
+            tmp_meta = self.directory / "metadata.tmp.json"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({"vectors": vectors_name, "ids": self._ids, "metadatas": self._metadatas,
+                           "documents": self._documents}, f, ensure_ascii=False)
+            os.replace(tmp_meta, self.metadata_path)
+            self._loaded_mtime = self.metadata_path.stat().st_mtime_ns
+            self._dirty = False
+
+            # Readers that still map an older file keep it alive until they reload
+            for old in self.directory.glob("vectors*.npy"):
+                if old.name not in (vectors_name, "vectors.tmp.npy"):
+                    old.unlink(missing_ok=True)
+            logger.info(f"Persisted NumPy vector index with {len(self._ids)} documents to {self.directory}")
+
+
+# Backend name -> index class
+VECTOR_INDEX_BACKENDS = {
+    "chroma": ChromaVectorIndex,
+    "numpy": NumpyVectorIndex,
+}
+
+
+def get_vector_index_backend_name() -> str:
+    """Resolve VECTOR_STORE_BACKEND; "auto" (the default) uses NumPy when running several workers"""
+    backend = os.getenv("VECTOR_STORE_BACKEND", "auto").lower()
+    if backend == "auto":
+        return "numpy" if worker_count() > 1 else "chroma"
+    return backend
+
+
+def create_vector_index(persist_directory: str, collection_name: str, backend: Optional[str] = None) -> VectorIndex:
+    """
+    Create the configured vector index.
+
+    Args:
+        persist_directory: Base directory for persisted data
+        collection_name: Collection to open
+        backend: Backend name; defaults to get_vector_index_backend_name()
+
+    Returns:
+        VectorIndex instance
+    """
+    backend = (backend or get_vector_index_backend_name()).lower()
+    index_class = VECTOR_INDEX_BACKENDS.get(backend)
+    if index_class is None:
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{backend}'. Available: {', '.join(sorted(VECTOR_INDEX_BACKENDS))}")
+    logger.info(f"Using {backend} vector index")
+    return index_class(persist_directory, collection_name)
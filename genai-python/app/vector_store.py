@@ -4,19 +4,30 @@ Loads veterinarian data into a vector store for semantic search.
 """
 
 import os
+import asyncio
 import logging
 import json
-from typing import List, Optional
-from pathlib import Path
-import chromadb
-from chromadb.config import Settings
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, AzureOpenAIEmbeddings
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
 # LangChain 1.x imports - updated paths
 from langchain_core.documents import Document
 
 from app.models import Vet
 from app.data_provider import DataProvider
+from app.embedding_cache import create_cached_embeddings
+from app.embeddings import REMOTE_EMBEDDING_PROVIDERS, create_embeddings, get_embedding_provider_name
+from app.vector_sync import VectorStoreSynchronizer
+from app.ingestion import IngestionPipeline
+from app.vector_index import VectorIndex, create_vector_index, get_vector_index_backend_name
+from app.vet_index import VetLookupIndex
+from app.metrics import registry as metrics
+from app.shared_state import worker_count
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -25,88 +36,163 @@ class VectorStoreController:
     """Manages the vector store for veterinarian data"""
     
     def __init__(self, data_provider: DataProvider):
+        # Chroma does not support several processes opening the same PersistentClient directory
+        if get_vector_index_backend_name() == "chroma" and worker_count() > 1:
+            raise RuntimeError(f"VECTOR_STORE_BACKEND=chroma cannot be used with {worker_count()} workers; "
+                               "use VECTOR_STORE_BACKEND=numpy (or auto)")
+        
         self.data_provider = data_provider
-        self.vector_store: Optional[Chroma] = None
+        self.vector_store: Optional[VectorIndex] = None
         self.persist_directory = "./vectorstore"
-        self.collection_name = "vets_collection"
+        # Remote providers share the original collection; other backends get their own
+        # collection because their embeddings have a different dimension
+        provider = get_embedding_provider_name()
+        default_collection = "vets_collection" if provider in REMOTE_EMBEDDING_PROVIDERS else f"vets_collection_{provider}"
+        self.collection_name = os.getenv("VECTOR_COLLECTION_NAME", default_collection)
+        
+        # Bounded pool for blocking index queries so they never run on the event loop
+        self.search_workers = int(os.getenv("VECTOR_SEARCH_WORKERS", "4"))
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=self.search_workers,
+            thread_name_prefix="vector-search"
+        )
+        
+        # Embeddings backend and ingestion pipeline are created during warm-up
+        # (load_vector_store_on_startup), since the provider SDKs are slow to import
+        self.embeddings = None
+        self.embedding_model: Optional[str] = None
+        self.ingestion: Optional[IngestionPipeline] = None
+        self.last_ingestion: Optional[dict] = None
         
-        # Initialize embeddings based on environment
-        self._init_embeddings()
+        # Incremental sync engine (diffs vets-service against stored documents)
+        self.synchronizer = VectorStoreSynchronizer(self)
         
+        # Exact/prefix lookup over vet names and specialties, in front of semantic search
+        self.lookup_index = VetLookupIndex()
+        
+        # With several workers, only the holder of the writer lock embeds and writes the
+        # index; the other workers open it read-only and reload what the writer persists
+        self.read_only = False
+        self._writer_lock = None
+        
+    def _acquire_writer_lock(self) -> bool:
+        """Try to become the single writer of the persisted index (non-blocking)"""
+        if fcntl is None:
+            return True
+        os.makedirs(self.persist_directory, exist_ok=True)
+        lock_file = open(os.path.join(self.persist_directory, ".writer.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held for the lifetime of the process; released by the OS when the worker exits
+        self._writer_lock = lock_file
+        return True
+    
     def _init_embeddings(self):
-        """Initialize the appropriate embeddings model"""
-        azure_key = os.getenv("AZURE_OPENAI_KEY")
-        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        
-        if azure_key and azure_endpoint:
-            logger.info("Using Azure OpenAI embeddings")
-            self.embeddings = AzureOpenAIEmbeddings(
-                azure_endpoint=azure_endpoint,
-                api_key=azure_key,
-                azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
-            )
-        else:
-            logger.info("Using OpenAI embeddings")
-            openai_key = os.getenv("OPENAI_API_KEY", "demo")
-            self.embeddings = OpenAIEmbeddings(
-                openai_api_key=openai_key,
-                model="text-embedding-ada-002"
-            )
+        """Initialize the configured embeddings backend, wrapped with the query embedding cache"""
+        embeddings, model_name = create_embeddings()
+        self.embedding_model = model_name
+        self.embeddings = create_cached_embeddings(embeddings, model_name, self.persist_directory)
+        # Batched embedding/writing of documents; keeps the stats of the last run
+        self.ingestion = IngestionPipeline(self.embeddings, self._write_batch)
+    
+    @property
+    def ready(self) -> bool:
+        """True once the vector store is open and semantic search is available"""
+        return self.vector_store is not None
+    
+    def embedding_cache_stats(self) -> Optional[dict]:
+        """Get query embedding cache statistics, or None when the cache is disabled"""
+        stats = getattr(self.embeddings, "stats", None)
+        return stats() if stats else None
     
     async def load_vector_store_on_startup(self):
         """
         Load veterinarian data into vector store on application startup.
-        Checks if persisted data exists; if so, loads it to save on AI credits.
-        Otherwise, fetches data from vets-service and creates embeddings.
+        Opens the persisted store (or creates an empty one) and synchronizes it
+        with vets-service, embedding only vets that are new or changed to save on AI credits.
         """
-        persist_path = Path(self.persist_directory)
-        
-        # Check if vector store already exists
-        if persist_path.exists() and any(persist_path.iterdir()):
-            logger.info(f"Loading existing vector store from {self.persist_directory}")
-            try:
-                self.vector_store = Chroma(
-                    collection_name=self.collection_name,
-                    embedding_function=self.embeddings,
-                    persist_directory=self.persist_directory
-                )
-                logger.info("Vector store loaded from existing data")
-                return
-            except Exception as e:
-                logger.warning(f"Failed to load existing vector store: {e}. Creating new one.")
+        loop = asyncio.get_running_loop()
         
-        # If vectorstore doesn't exist, create it from vets data
-        logger.info("Creating new vector store from vets data")
+        # Importing the embedding SDK and index backend is CPU-bound; keep it off the event loop
+        # so requests are served while the store warms up
+        if self.embeddings is None:
+            await loop.run_in_executor(self._search_executor, self._init_embeddings)
+        
+        self.read_only = not self._acquire_writer_lock()
+        if self.read_only and get_vector_index_backend_name() == "chroma":
+            # Another process (e.g. a gunicorn worker, which WEB_CONCURRENCY does not count) holds the store
+            raise RuntimeError("Another worker process has the Chroma vector store open; "
+                               "use VECTOR_STORE_BACKEND=numpy when running several workers")
+        logger.info(f"Opening vector store at {self.persist_directory}"
+                    f"{' read-only (another worker keeps it in sync)' if self.read_only else ''}")
+        self.vector_store = await loop.run_in_executor(
+            self._search_executor, create_vector_index, self.persist_directory, self.collection_name
+        )
         
         try:
-            # Fetch all vets from vets-service
-            vets = await self.data_provider.get_all_vets()
-            
-            if not vets:
-                logger.warning("No vets data available")
-                return
-            
-            # Convert vets to documents
-            documents = self._convert_vets_to_documents(vets)
-            
-            # Create vector store
-            self.vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                collection_name=self.collection_name,
-                persist_directory=self.persist_directory
-            )
-            
-            logger.info(f"Vector store created with {len(documents)} documents and persisted to {self.persist_directory}")
-            
+            result = await self.synchronizer.sync()
+            logger.info(f"Vector store ready ({result['added']} added, {result['changed']} changed, "
+                        f"{result['removed']} removed, {result['unchanged']} unchanged)")
         except Exception as e:
+            # Keep serving whatever was persisted; the background sync will retry
             logger.error(f"Error loading vector store: {e}")
-            # Create empty vector store as fallback
-            self.vector_store = Chroma(
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.persist_directory
+    
+    @staticmethod
+    def document_id(document: Document) -> str:
+        """Deterministic document id for a vet document"""
+        return f"vet-{document.metadata['id']}"
+    
+    async def get_stored_documents(self) -> dict:
+        """
+        Get the ids and metadata of every stored document.
+        
+        Returns:
+            Dict of document id to metadata
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._search_executor, self.vector_store.get_all)
+    
+    async def delete_documents(self, ids: List[str]):
+        """Delete documents by id"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._search_executor, self.vector_store.delete, ids)
+    
+    async def upsert_documents(self, documents: Iterable[Document], total: Optional[int] = None):
+        """
+        Embed and insert or replace documents through the batched ingestion pipeline.
+        
+        Args:
+            documents: Documents to write (may be a lazy generator)
+            total: Expected number of documents, for progress reporting
+        """
+        stats = await self.ingestion.run(documents, total=total)
+        self.last_ingestion = stats.as_dict()
+    
+    async def _write_batch(self, documents: List[Document], embeddings: List[List[float]]):
+        """Write one embedded batch to the collection, keyed by deterministic ids"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._search_executor,
+            lambda: self.vector_store.upsert(
+                ids=[self.document_id(doc) for doc in documents],
+                embeddings=embeddings,
+                metadatas=[doc.metadata for doc in documents],
+                documents=[doc.page_content for doc in documents]
             )
+        )
+    
+    async def reload_index(self) -> bool:
+        """Load the latest version persisted by the writer worker (read-only workers)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._search_executor, self.vector_store.reload)
+    
+    async def persist(self):
+        """Flush pending index writes to disk"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._search_executor, self.vector_store.persist)
     
     def _convert_vets_to_documents(self, vets: List[Vet]) -> List[Document]:
         """
@@ -118,38 +204,55 @@ class VectorStoreController:
         Returns:
             List of Document objects
         """
-        documents = []
+        return list(self.iter_vet_documents(vets))
+    
+    def iter_vet_documents(self, vets: Iterable[Vet]) -> Iterator[Document]:
+        """
+        Lazily convert Vet objects to LangChain Documents, one at a time.
         
-        for vet in vets:
-            # Create a text representation of the vet
-            vet_dict = vet.model_dump()
-            
-            # Format specialties nicely
-            specialties_str = ", ".join([s.get("name", "") for s in vet_dict.get("specialties", [])])
-            
-            # Create document content
-            content = json.dumps({
-                "id": vet_dict.get("id"),
-                "firstName": vet_dict.get("firstName"),
-                "lastName": vet_dict.get("lastName"),
-                "specialties": specialties_str
-            }, ensure_ascii=False)
-            
-            # Create metadata
-            metadata = {
-                "id": str(vet_dict.get("id")),
-                "firstName": vet_dict.get("firstName", ""),
-                "lastName": vet_dict.get("lastName", ""),
-                "specialties": specialties_str
-            }
+        Args:
+            vets: Vet objects
             
-            documents.append(Document(page_content=content, metadata=metadata))
+        Yields:
+            Document objects
+        """
+        for vet in vets:
+            yield self._vet_to_document(vet)
+    
+    @staticmethod
+    def _vet_to_document(vet: Vet) -> Document:
+        """Convert a single Vet to a Document"""
+        # Create a text representation of the vet
+        vet_dict = vet.model_dump()
+        
+        # Format specialties nicely
+        specialties_str = ", ".join([s.get("name", "") for s in vet_dict.get("specialties") or []])
         
-        return documents
+        # Create document content
+        content = json.dumps({
+            "id": vet_dict.get("id"),
+            "firstName": vet_dict.get("firstName"),
+            "lastName": vet_dict.get("lastName"),
+            "specialties": specialties_str
+        }, ensure_ascii=False)
+        
+        # Create metadata (content hash lets the sync engine detect changed vets)
+        metadata = {
+            "id": str(vet_dict.get("id")),
+            "firstName": vet_dict.get("firstName") or "",
+            "lastName": vet_dict.get("lastName") or "",
+            "specialties": specialties_str,
+            "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest()
+        }
+        
+        return Document(page_content=content, metadata=metadata)
     
-    def search_vets(self, query: str, top_k: int = 20) -> List[str]:
+    async def asearch_vets(self, query: str, top_k: int = 20) -> List[str]:
         """
-        Search for veterinarians using semantic similarity.
+        Search for veterinarians without blocking the event loop.
+        Exact name/specialty lookups are answered from the lookup index; otherwise
+        the query embedding is computed asynchronously and the index query
+        runs in the bounded search executor.
         
         Args:
             query: Search query (can be vet name, specialty, or general description)
@@ -158,24 +261,71 @@ class VectorStoreController:
         Returns:
             List of vet information as JSON strings
         """
+        if not self.lookup_index.ready:
+            # Still warming up: the lookup index only needs the (cached) vets, not embeddings
+            await self._build_lookup_index()
+        
+        with metrics.timer("vet_lookup"):
+            direct, complete = self.lookup_index.lookup(query)
+        if complete:
+            self.lookup_index.direct_hits += 1
+            return direct[:top_k]
+        
         if not self.vector_store:
             logger.warning("Vector store not initialized")
-            return []
+            return self._degraded_results(direct, top_k)
         
         try:
-            # Perform similarity search
-            docs = self.vector_store.similarity_search(query, k=top_k)
+            with metrics.timer("embedding"):
+                embedding = await self.embeddings.aembed_query(query)
             
-            # Extract content from documents
-            results = [doc.page_content for doc in docs]
-            
-            return results
+            loop = asyncio.get_running_loop()
+            with metrics.timer("vector_search"):
+                semantic = await loop.run_in_executor(
+                    self._search_executor,
+                    self.vector_store.query,
+                    embedding,
+                    top_k
+                )
+            return self._merge_results(direct, semantic, top_k)
             
         except Exception as e:
             logger.error(f"Error searching vets: {e}")
-            return []
+            return direct[:top_k]
+    
+    async def _build_lookup_index(self):
+        """Build the lookup index straight from vets-service data, ahead of the first sync"""
+        try:
+            vets = await self.data_provider.get_all_vets()
+            if not self.lookup_index.ready:
+                self.lookup_index.build(self.iter_vet_documents(vets))
+        except Exception as e:
+            logger.warning(f"Could not build vet lookup index: {e}")
+    
+    def _degraded_results(self, direct: List[str], top_k: int) -> List[str]:
+        """
+        Results while semantic search is unavailable: lookup matches, or every known
+        vet when nothing matched, so the LLM can still pick the relevant ones.
+        """
+        return (direct or self.lookup_index.documents)[:top_k]
+    
+    def _merge_results(self, direct: List[str], semantic: List[str], top_k: int) -> List[str]:
+        """Re-rank: partial lookup matches first, then semantic results not already included"""
+        if direct:
+            self.lookup_index.merged += 1
+        else:
+            self.lookup_index.semantic_only += 1
+        seen = set(direct)
+        return (direct + [doc for doc in semantic if doc not in seen])[:top_k]
+    
+    def close(self):
+        """Shut down the search executor and release the writer lock"""
+        self._search_executor.shutdown(wait=False, cancel_futures=True)
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
     
-    def get_vector_store(self) -> Optional[Chroma]:
+    def get_vector_store(self) -> Optional[VectorIndex]:
         """Get the vector store instance"""
         return self.vector_store
 
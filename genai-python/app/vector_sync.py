@@ -0,0 +1,188 @@
+"""
+Incremental synchronization of the vet vector store with vets-service.
+Only new or changed vets are embedded; vets that no longer exist are removed.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.models import Vet
+    from app.vector_store import VectorStoreController
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreSynchronizer:
+    """Diffs vets-service data against stored documents by vet id and content hash"""
+
+    def __init__(self, controller: "VectorStoreController"):
+        self.controller = controller
+        self.interval_seconds = float(os.getenv("VECTOR_SYNC_INTERVAL_SECONDS", "300"))
+        # Read-only workers only reload the persisted index, which is cheap, so they check more often
+        self.replica_reload_seconds = float(os.getenv("VECTOR_REPLICA_RELOAD_SECONDS", "10"))
+
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Cumulative counters and details of the last run
+        self.runs = 0
+        self.failures = 0
+        self.documents_added = 0
+        self.documents_changed = 0
+        self.documents_removed = 0
+        self.last_result: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+    async def sync(self, refresh: bool = False) -> dict:
+        """
+        Bring the vector store in line with the current vets. Read-only workers
+        reload the index persisted by the writer instead.
+
+        Args:
+            refresh: Bypass the DataProvider vet cache and fetch from vets-service
+
+        Returns:
+            Dict with added / changed / removed / unchanged counts for this run
+        """
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                if refresh and not self.controller.read_only:
+                    self.controller.data_provider.vets_cache.invalidate("all")
+                vets = await self.controller.data_provider.get_all_vets()
+
+                if self.controller.read_only:
+                    reloaded = await self.controller.reload_index()
+                    result = {"added": 0, "changed": 0, "removed": 0,
+                              "unchanged": self.controller.vector_store.count(), "read_only": True,
+                              "reloaded": reloaded}
+                else:
+                    result = await self._apply(vets)
+                self.controller.lookup_index.build(self.controller.iter_vet_documents(vets))
+                result["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+                result["finished_at"] = int(time.time() * 1000)
+
+                self.runs += 1
+                self.documents_added += result["added"]
+                self.documents_changed += result["changed"]
+                self.documents_removed += result["removed"]
+                self.last_result = result
+                self.last_error = None
+
+                if result["added"] or result["changed"] or result["removed"]:
+                    logger.info(f"Vector store synced: {result}")
+                else:
+                    logger.debug(f"Vector store already up to date ({result['unchanged']} documents)")
+                return result
+
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Vector store sync failed: {e}")
+                raise
+
+    async def _apply(self, vets: List["Vet"]) -> dict:
+        """Compute the diff against the store and apply deletions and upserts"""
+        stored = await self.controller.get_stored_documents()
+
+        # vet id -> list of (document id, content hash) currently stored
+        stored_by_vet: Dict[str, List[tuple]] = {}
+        for doc_id, metadata in stored.items():
+            stored_by_vet.setdefault(str(metadata.get("id")), []).append((doc_id, metadata.get("content_hash")))
+
+        # First pass keeps only ids and hashes; documents are rebuilt lazily for the upsert
+        upsert_ids = set()
+        to_delete: List[str] = []
+        wanted = set()
+        added = changed = unchanged = 0
+
+        for doc in self.controller.iter_vet_documents(vets):
+            vet_id = doc.metadata["id"]
+            wanted.add(vet_id)
+            entries = stored_by_vet.get(vet_id)
+            if not entries:
+                added += 1
+                upsert_ids.add(vet_id)
+                continue
+
+            expected_id = self.controller.document_id(doc)
+            if len(entries) == 1 and entries[0] == (expected_id, doc.metadata["content_hash"]):
+                unchanged += 1
+                continue
+
+            # Changed content, or legacy documents without a deterministic id / hash
+            changed += 1
+            to_delete.extend(doc_id for doc_id, _ in entries if doc_id != expected_id)
+            upsert_ids.add(vet_id)
+
+        removed_vets = [vet_id for vet_id in stored_by_vet if vet_id not in wanted]
+        for vet_id in removed_vets:
+            to_delete.extend(doc_id for doc_id, _ in stored_by_vet[vet_id])
+
+        try:
+            if to_delete:
+                await self.controller.delete_documents(to_delete)
+            if upsert_ids:
+                await self.controller.upsert_documents(
+                    (doc for doc in self.controller.iter_vet_documents(vets) if doc.metadata["id"] in upsert_ids),
+                    total=len(upsert_ids)
+                )
+        finally:
+            # Also after a failed run: rows already written must reach read-only workers, and
+            # the next run may find nothing to change. The index skips the write when clean.
+            await self.controller.persist()
+
+        return {
+            "added": added,
+            "changed": changed,
+            "removed": len(removed_vets),
+            "unchanged": unchanged
+        }
+
+    def start(self):
+        """Start the periodic background sync (no-op when the interval is 0)"""
+        interval = self.replica_reload_seconds if self.controller.read_only else self.interval_seconds
+        if interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run_periodically(interval))
+        logger.info(f"Background vector store {'reload' if self.controller.read_only else 'sync'} every {interval}s")
+
+    async def stop(self):
+        """Stop the periodic background sync"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(refresh=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Already logged and counted; keep serving the current store
+                pass
+
+    def stats(self) -> dict:
+        """Get sync metrics"""
+        return {
+            "interval_seconds": self.interval_seconds,
+            "read_only": self.controller.read_only,
+            "runs": self.runs,
+            "failures": self.failures,
+            "documents_added": self.documents_added,
+            "documents_changed": self.documents_changed,
+            "documents_removed": self.documents_removed,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
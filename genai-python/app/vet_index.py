@@ -0,0 +1,135 @@
+"""
+Inverted index over vet names and specialties.
+Answers exact and prefix lookups such as "radiology" or "Carter" without an
+embedding call; anything it cannot fully answer falls back to semantic search.
+"""
+
+import re
+import bisect
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+# LangChain 1.x imports - updated paths
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no lookup information in vet questions
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "for", "with", "who", "which", "what",
+    "do", "does", "is", "are", "any", "all", "list", "show", "me", "find", "named", "name",
+    "vet", "vets", "veterinarian", "veterinarians", "doctor", "doctors", "dr",
+    "specialty", "specialties", "specialist", "specialists", "specializes", "specialize",
+}
+
+# Minimum query token length for prefix matching
+_MIN_PREFIX = 3
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class VetLookupIndex:
+    """Token -> vet documents index with exact and prefix matching"""
+
+    def __init__(self):
+        self._documents: List[str] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._sorted_tokens: List[str] = []
+
+        self.direct_hits = 0
+        self.merged = 0
+        self.semantic_only = 0
+
+    def build(self, documents: Iterable[Document]):
+        """
+        Rebuild the index from vet documents.
+
+        Args:
+            documents: Documents produced by VectorStoreController.iter_vet_documents
+        """
+        contents: List[str] = []
+        postings: Dict[str, Set[int]] = {}
+        for i, doc in enumerate(documents):
+            contents.append(doc.page_content)
+            metadata = doc.metadata
+            text = " ".join([metadata.get("firstName", ""), metadata.get("lastName", ""), metadata.get("specialties", "")])
+            for token in tokenize(text):
+                postings.setdefault(token, set()).add(i)
+
+        # Swap in the new index in one step
+        self._documents, self._postings, self._sorted_tokens = contents, postings, sorted(postings)
+        logger.info(f"Vet lookup index built with {len(contents)} vets and {len(postings)} terms")
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._documents)
+
+    @property
+    def documents(self) -> List[str]:
+        """Every indexed vet document"""
+        return self._documents
+
+    def _match(self, token: str) -> Set[int]:
+        """Exact match, falling back to prefix match for longer tokens"""
+        exact = self._postings.get(token)
+        if exact:
+            return exact
+        if len(token) < _MIN_PREFIX:
+            return set()
+        matches: Set[int] = set()
+        tokens = self._sorted_tokens
+        i = bisect.bisect_left(tokens, token)
+        while i < len(tokens) and tokens[i].startswith(token):
+            matches |= self._postings[tokens[i]]
+            i += 1
+        return matches
+
+    def lookup(self, query: str) -> Tuple[List[str], bool]:
+        """
+        Look a query up in the index.
+
+        Args:
+            query: Vet search query
+
+        Returns:
+            Tuple of (matching vet documents, complete). complete is True when every
+            meaningful query term matched and the result needs no semantic search.
+        """
+        if not self.ready:
+            return [], False
+
+        terms = [t for t in tokenize(query) if t not in _STOPWORDS]
+        if not terms:
+            # Generic query such as "veterinarian": every vet matches
+            return list(self._documents), True
+
+        matched = [self._match(term) for term in terms]
+        hits = [m for m in matched if m]
+        if not hits:
+            return [], False
+
+        if len(hits) == len(terms):
+            both = set.intersection(*hits)
+            if both:
+                return [self._documents[i] for i in sorted(both)], True
+
+        # Partial match: rank vets by how many terms they matched
+        scores: Dict[int, int] = {}
+        for m in hits:
+            for i in m:
+                scores[i] = scores.get(i, 0) + 1
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        return [self._documents[i] for i in ranked], False
+
+    def stats(self) -> dict:
+        return {
+            "vets": len(self._documents),
+            "terms": len(self._postings),
+            "direct_hits": self.direct_hits,
+            "merged": self.merged,
+            "semantic_only": self.semantic_only
+        }
@@ -0,0 +1 @@
+"""Benchmarks for GenAI Python Service (not shipped in the Docker image)"""
@@ -0,0 +1,176 @@
+"""
+Cold-start benchmark.
+Starts the service repeatedly against the fake OpenAI server and the fake
+customers/vets services and measures, from process spawn:
+
+- accepting: GET /health answers
+- ready:     the readiness probe passes (chat client available)
+- warm:      the vector store is open and synced
+
+Each run uses a fresh working directory (no persisted vector store or embedding
+cache) unless --persisted is given.
+
+Usage:
+    python -m benchmark.bench_startup --runs 3 --vets 500 --latency-ms 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import numpy as np
+
+from benchmark.load_test import ROOT, _git_commit
+
+
+def _get(client: httpx.Client, url: str) -> Optional[httpx.Response]:
+    try:
+        return client.get(url)
+    except httpx.HTTPError:
+        return None
+
+
+def _ready(client: httpx.Client, url: str) -> bool:
+    response = _get(client, f"{url}/actuator/health/readiness")
+    if response is not None and response.status_code != 404:
+        return response.status_code == 200
+    # Older builds without a readiness probe are ready once /actuator/health reports the chat client
+    response = _get(client, f"{url}/actuator/health")
+    return response is not None and response.status_code == 200 and \
+        response.json()["components"]["chatClient"]["status"] == "UP"
+
+
+def _warm(client: httpx.Client, url: str) -> bool:
+    response = _get(client, f"{url}/actuator/health")
+    if response is None or response.status_code != 200:
+        return False
+    components = response.json()["components"]
+    return components["vectorStore"]["status"] == "UP" and \
+        components["vectorStore"]["details"]["sync"].get("runs", 0) > 0
+
+
+def measure(args, env: dict, workdir: str) -> dict:
+    """Spawn the service once and time the startup milestones"""
+    url = f"http://127.0.0.1:{args.service_port}"
+    checks = {"accepting": lambda c: (_get(c, f"{url}/health") or httpx.Response(599)).status_code == 200,
+              "ready": lambda c: _ready(c, url),
+              "warm": lambda c: _warm(c, url)}
+    result = {}
+
+    with open(Path(workdir) / "service.log", "a") as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.service_port), "--log-level", "warning"],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            with httpx.Client(timeout=2.0) as client:
+                deadline = started + args.timeout
+                while checks and time.perf_counter() < deadline:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Service exited with code {process.returncode}, see {workdir}/service.log")
+                    for name, check in list(checks.items()):
+                        if check(client):
+                            result[name] = round(time.perf_counter() - started, 3)
+                            del checks[name]
+                    time.sleep(args.poll_ms / 1000)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    for name in checks:
+        result[name] = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--persisted", action="store_true", help="Reuse the working directory between runs")
+    parser.add_argument("--service-port", type=int, default=18084)
+    parser.add_argument("--openai-port", type=int, default=18090)
+    parser.add_argument("--services-port", type=int, default=18091)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Fake OpenAI latency per request")
+    parser.add_argument("--vets", type=int, default=500)
+    parser.add_argument("--poll-ms", type=float, default=50)
+    parser.add_argument("--timeout", type=float, default=180.0, help="Give up on a run after this many seconds")
+    parser.add_argument("--service-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    services_url = f"http://127.0.0.1:{args.services_port}"
+    service_env = {
+        **env,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+        "CUSTOMERS_SERVICE_URL": services_url,
+        "VETS_SERVICE_URL": services_url,
+    }
+    service_env.pop("AZURE_OPENAI_KEY", None)
+    for item in args.service_env:
+        key, _, value = item.partition("=")
+        service_env[key] = value
+
+    fakes = [
+        [sys.executable, "-m", "benchmark.fake_openai", "--port", str(args.openai_port),
+         "--latency-ms", str(args.latency_ms)],
+        [sys.executable, "-m", "benchmark.fake_services", "--port", str(args.services_port),
+         "--vets", str(args.vets), "--latency-ms", "10"],
+    ]
+    fake_processes = [subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL) for command in fakes]
+    runs = []
+    try:
+        time.sleep(2.0)
+        persisted_dir = tempfile.mkdtemp(prefix="bench-startup-")
+        for i in range(args.runs):
+            workdir = persisted_dir if args.persisted else tempfile.mkdtemp(prefix="bench-startup-")
+            result = measure(args, service_env, workdir)
+            print(f"run {i + 1}: {result}", file=sys.stderr)
+            runs.append(result)
+    finally:
+        for process in fake_processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    summary = {}
+    for milestone in ("accepting", "ready", "warm"):
+        values = [run[milestone] for run in runs if run[milestone] is not None]
+        summary[milestone] = {
+            "median_seconds": round(float(np.median(values)), 3) if values else None,
+            "max_seconds": round(max(values), 3) if values else None
+        }
+
+    output = json.dumps({
+        "benchmark": "startup",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "runs": args.runs,
+            "persisted": args.persisted,
+            "latency_ms": args.latency_ms,
+            "vets": args.vets,
+            "service_env": args.service_env
+        },
+        "summary": summary,
+        "runs": runs
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
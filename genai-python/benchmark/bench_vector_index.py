@@ -0,0 +1,118 @@
+"""
+Vector index benchmark: Chroma vs NumPy.
+Each backend is populated once, then loaded in a fresh process to measure
+startup time, resident memory and query latency percentiles.
+
+Usage:
+    python -m benchmark.bench_vector_index --documents 1000 --dimensions 1536 --queries 500
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def percentile(values, p):
+    return round(float(np.percentile(values, p)), 3) if values else None
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def build(args):
+    """Populate the index with random normalized vectors"""
+    from app.vector_index import create_vector_index
+
+    rng = np.random.default_rng(0)
+    index = create_vector_index(args.directory, "bench_vets", backend=args.backend)
+    for start in range(0, args.documents, 500):
+        end = min(start + 500, args.documents)
+        vectors = rng.standard_normal((end - start, args.dimensions)).astype(np.float32)
+        index.upsert(
+            ids=[f"vet-{i}" for i in range(start, end)],
+            embeddings=vectors.tolist(),
+            metadatas=[{"id": str(i)} for i in range(start, end)],
+            documents=[json.dumps({"id": i}) for i in range(start, end)]
+        )
+    index.persist()
+
+
+def load_and_query(args) -> dict:
+    """Measure cold load (including imports) and query latency"""
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    from app.vector_index import create_vector_index
+    index = create_vector_index(args.directory, "bench_vets", backend=args.backend)
+    count = index.count()
+    startup_ms = (time.perf_counter() - started) * 1000
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32).tolist()
+    index.query(queries[0], args.top_k)  # warm-up
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        index.query(q, args.top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "backend": args.backend,
+        "documents": count,
+        "startup_ms": round(startup_ms, 1),
+        "rss_mb_before_load": rss_before,
+        "rss_mb": _rss_mb(),
+        "query_ms_p50": percentile(latencies, 50),
+        "query_ms_p95": percentile(latencies, 95),
+        "query_ms_p99": percentile(latencies, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--backends", default="chroma,numpy")
+    # Internal: run a single phase for one backend in this process
+    parser.add_argument("--phase", choices=["build", "query"])
+    parser.add_argument("--backend")
+    parser.add_argument("--directory")
+    args = parser.parse_args()
+
+    if args.phase == "build":
+        build(args)
+        return
+    if args.phase == "query":
+        print(json.dumps(load_and_query(args)))
+        return
+
+    results = []
+    for backend in args.backends.split(","):
+        directory = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+        common = [
+            sys.executable, "-m", "benchmark.bench_vector_index",
+            "--backend", backend, "--directory", directory,
+            "--documents", str(args.documents), "--dimensions", str(args.dimensions),
+            "--queries", str(args.queries), "--top-k", str(args.top_k)
+        ]
+        env = dict(os.environ, PYTHONWARNINGS="ignore")
+        subprocess.run(common + ["--phase", "build"], check=True, env=env, capture_output=True)
+        output = subprocess.run(common + ["--phase", "query"], check=True, env=env, capture_output=True, text=True)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps({"benchmark": "vector_index", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Local OpenAI-compatible stand-in for load tests.
+Serves /v1/chat/completions (plain and streaming) and /v1/embeddings with a
+configurable latency. Chat replies follow a script: the first model round calls
+the tool whose pattern matches the user message (with --parallel-tool-calls,
+every tool with a matching rule), the next round summarizes the tool results.
+With --rpm-limit / --tpm-limit, chat requests over the quota are answered with
+429 and retry hints, like the real API.
+
+Usage:
+    python -m benchmark.fake_openai --port 8090 --latency-ms 300 --jitter-ms 100
+
+Point the service at it with OPENAI_BASE_URL=http://localhost:8090/v1.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.embeddings import HashingEmbeddings
+from app.tokens import estimate_tokens
+
+# Ordered rules: the first pattern matching the latest user message selects the tool call.
+# "$1", "$2", ... in an argument value are replaced with the capture groups.
+DEFAULT_SCRIPT = [
+    {"pattern": r"\bvets?\b.*\b(radiology|surgery|dentistry|cardiology|dermatology|oncology|neurology)\b",
+     "tool": "list_vets", "args": {"query": "$1"}},
+    {"pattern": r"\b(?:vets?|veterinarians?)\b", "tool": "list_vets", "args": {"query": ""}},
+    {"pattern": r"\bowner named (\w+)", "tool": "find_owner", "args": {"name": "$1"}},
+    {"pattern": r"\bowners?\b.*\bin (\w+)", "tool": "list_owners", "args": {"city": "$1"}},
+    {"pattern": r"\bowners?\b", "tool": "list_owners", "args": {}},
+    {"pattern": r"\badd (?:a )?new owner (\w+) (\w+)", "tool": "add_owner_to_petclinic",
+     "args": {"firstName": "$1", "lastName": "$2", "address": "1 Main St", "city": "Madison",
+              "telephone": "6085550000"}},
+]
+
+
+class FakeOpenAI:
+    """Scripted chat and embedding responses with simulated latency"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, chunk_ms: float, dimensions: int, script: List[dict]):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_ms = chunk_ms
+        self.embeddings = HashingEmbeddings(dimensions=dimensions)
+        self.script = [(re.compile(rule["pattern"], re.IGNORECASE), rule) for rule in script]
+        self.requests = 0
+        self.throttled = 0
+        self.parallel_tool_calls = False
+        # Model name -> latency, for models slower or faster than the default
+        self.model_latency_ms: Dict[str, float] = {}
+        self.quotas: Dict[str, List[float]] = {}
+
+    def set_quota(self, rpm: float, tpm: float, burst_seconds: float):
+        """Enforce requests/tokens per minute with buckets holding burst_seconds worth of quota"""
+        for kind, per_minute in (("requests", rpm), ("tokens", tpm)):
+            if per_minute > 0:
+                capacity = per_minute * burst_seconds / 60
+                # [per minute, capacity, level, last update]
+                self.quotas[kind] = [per_minute, capacity, capacity, time.monotonic()]
+
+    def over_quota(self, tokens: int) -> Optional[dict]:
+        """Take one request and the prompt tokens; returns rate limit headers when over quota"""
+        now = time.monotonic()
+        amounts = {"requests": 1, "tokens": tokens}
+        waits = {}
+        for kind, quota in self.quotas.items():
+            per_minute, capacity, level, updated = quota
+            quota[2] = level = min(capacity, level + (now - updated) * per_minute / 60)
+            quota[3] = now
+            needed = min(amounts[kind], capacity)
+            if level < needed:
+                waits[kind] = (needed - level) * 60 / per_minute
+        if not waits:
+            for kind, quota in self.quotas.items():
+                quota[2] -= min(amounts[kind], quota[1])
+            return None
+        self.throttled += 1
+        headers = {"retry-after-ms": str(int(max(waits.values()) * 1000) + 1)}
+        for kind, wait in waits.items():
+            headers[f"x-ratelimit-remaining-{kind}"] = "0"
+            headers[f"x-ratelimit-reset-{kind}"] = f"{wait:.3f}s"
+        return headers
+
+    async def delay(self, model: Optional[str] = None):
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        latency_ms = self.model_latency_ms.get(model, self.latency_ms)
+        await asyncio.sleep(max(latency_ms + jitter, 0.0) / 1000)
+
+    def _tool_calls(self, text: str, tools: List[str]) -> List[dict]:
+        """First matching rule, or with parallel tool calls the first matching rule of every tool"""
+        calls = []
+        for pattern, rule in self.script:
+            match = pattern.search(text)
+            if match and rule["tool"] in tools and all(c["function"]["name"] != rule["tool"] for c in calls):
+                args = {
+                    key: re.sub(r"\$(\d)", lambda g: match.group(int(g.group(1))) or "", value)
+                    if isinstance(value, str) else value
+                    for key, value in rule["args"].items()
+                }
+                calls.append({
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": rule["tool"], "arguments": json.dumps(args)}
+                })
+                if not self.parallel_tool_calls:
+                    break
+        return calls
+
+    def reply(self, body: dict) -> dict:
+        """Build the assistant message for a chat completion request"""
+        messages = body.get("messages", [])
+        tools = [t["function"]["name"] for t in body.get("tools", []) if t.get("type") == "function"]
+        last = messages[-1] if messages else {"role": "user", "content": ""}
+
+        if last.get("role") == "tool":
+            results = []
+            for message in reversed(messages):
+                if message.get("role") != "tool":
+                    break
+                results.append(str(message.get("content", ""))[:400])
+            return {"role": "assistant", "content": f"Here is what I found: {' '.join(reversed(results))}"}
+
+        text = last.get("content") or ""
+        if isinstance(text, list):
+            text = " ".join(part.get("text", "") for part in text if isinstance(part, dict))
+        tool_calls = self._tool_calls(text, tools)
+        if tool_calls:
+            return {"role": "assistant", "content": None, "tool_calls": tool_calls}
+        return {"role": "assistant", "content": f"I can help with owners, pets and veterinarians. You said: {text[:200]}"}
+
+    @staticmethod
+    def usage(body: dict, message: dict) -> dict:
+        prompt_tokens = estimate_tokens(json.dumps(body.get("messages", [])))
+        completion_tokens = estimate_tokens(message.get("content") or json.dumps(message.get("tool_calls", [])))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+
+def create_app(fake: FakeOpenAI) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fake.requests += 1
+        throttled = fake.over_quota(estimate_tokens(json.dumps(body.get("messages", []))))
+        if throttled is not None:
+            return JSONResponse(status_code=429, headers=throttled, content={"error": {
+                "message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+        await fake.delay(body.get("model"))
+
+        message = fake.reply(body)
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "fake-model")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": fake.usage(body, message)
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish: Optional[str] = None, usage: Optional[dict] = None) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if usage is None else []}
+            if usage is not None:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            if message.get("tool_calls"):
+                for i, tool_call in enumerate(message["tool_calls"]):
+                    yield chunk({"tool_calls": [{"index": i, **tool_call}]})
+            else:
+                for word in re.findall(r"\S+\s*", message["content"]):
+                    if fake.chunk_ms:
+                        await asyncio.sleep(fake.chunk_ms / 1000)
+                    yield chunk({"content": word})
+            yield chunk({}, finish=finish_reason)
+            if include_usage:
+                yield chunk({}, usage=fake.usage(body, message))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fake.requests += 1
+        await fake.delay()
+
+        inputs = body.get("input", [])
+        if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # OpenAIEmbeddings may send token ids instead of text
+        texts = [" ".join(map(str, item)) if isinstance(item, list) else str(item) for item in inputs]
+        vectors = fake.embeddings.embed_documents(texts)
+
+        if body.get("encoding_format") == "base64":
+            data = [base64.b64encode(np.asarray(v, dtype=np.float32).tobytes()).decode("ascii") for v in vectors]
+        else:
+            data = vectors
+        tokens = sum(estimate_tokens(text) for text in texts)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": e} for i, e in enumerate(data)],
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": fake.requests, "throttled": fake.throttled}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latency of every chat/embedding request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter added to the latency")
+    parser.add_argument("--chunk-ms", type=float, default=0, help="Delay between streamed content chunks")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding dimensions")
+    parser.add_argument("--script", help="JSON file with tool-call rules (defaults to the built-in script)")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="Chat latency of a specific model (e.g. a slower, stronger model)")
+    parser.add_argument("--parallel-tool-calls", action="store_true",
+                        help="Call every tool with a matching rule in one round instead of only the first")
+    parser.add_argument("--rpm-limit", type=float, default=0, help="Chat requests per minute before 429s (0 = no limit)")
+    parser.add_argument("--tpm-limit", type=float, default=0, help="Chat prompt tokens per minute before 429s (0 = no limit)")
+    parser.add_argument("--quota-burst-seconds", type=float, default=10, help="Quota that may be used at once, in seconds")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+
+    fake = FakeOpenAI(args.latency_ms, args.jitter_ms, args.chunk_ms, args.dimensions, script)
+    fake.set_quota(args.rpm_limit, args.tpm_limit, args.quota_burst_seconds)
+    fake.parallel_tool_calls = args.parallel_tool_calls
+    for item in args.model_latency:
+        model, _, latency_ms = item.partition("=")
+        fake.model_latency_ms[model] = float(latency_ms)
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local stand-in for customers-service and vets-service.
+Serves synthetic owners and vets at a configurable size and latency from a
+single process; point both CUSTOMERS_SERVICE_URL and VETS_SERVICE_URL at it.
+
+Usage:
+    python -m benchmark.fake_services --port 8091 --owners 5000 --vets 200 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import random
+from typing import List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+from benchmark.bench_ingestion import synthetic_vets
+
+PET_TYPES = ["cat", "dog", "lizard", "snake", "bird", "hamster"]
+LAST_NAMES = ["Franklin", "Davis", "Rodriquez", "Black", "Escobito", "Estaban", "McTavish", "Schroeder", "Coleman"]
+CITIES = ["Madison", "Sun Prairie", "McFarland", "Windsor", "Monona", "Waunakee"]
+
+
+def synthetic_owners(count: int) -> List[dict]:
+    """Generate owners with 0-3 pets each, in the customers-service JSON shape"""
+    rng = random.Random(7)
+    owners = []
+    pet_id = 1
+    for i in range(1, count + 1):
+        pets = []
+        for _ in range(rng.randint(0, 3)):
+            type_id = rng.randint(1, len(PET_TYPES))
+            pets.append({
+                "id": pet_id,
+                "name": f"Pet{pet_id}",
+                "birthDate": f"20{rng.randint(10, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "type": {"id": type_id, "name": PET_TYPES[type_id - 1]}
+            })
+            pet_id += 1
+        owners.append({
+            "id": i,
+            "firstName": f"First{i}",
+            "lastName": rng.choice(LAST_NAMES),
+            "address": f"{rng.randint(1, 9999)} Main St.",
+            "city": rng.choice(CITIES),
+            "telephone": f"608555{i:04d}"[-10:],
+            "pets": pets
+        })
+    return owners
+
+
+def create_app(owners: int, vets: int, latency_ms: float) -> FastAPI:
+    app = FastAPI(title="Fake customers-service / vets-service")
+    state = {
+        "owners": synthetic_owners(owners),
+        "vets": [vet.model_dump() for vet in synthetic_vets(vets)],
+        "next_pet_id": 10 ** 6
+    }
+
+    async def delay():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    @app.get("/owners")
+    async def list_owners():
+        await delay()
+        return state["owners"]
+
+    @app.post("/owners", status_code=201)
+    async def add_owner(request: Request):
+        await delay()
+        owner = await request.json()
+        owner.update({"id": len(state["owners"]) + 1, "pets": []})
+        state["owners"].append(owner)
+        return owner
+
+    @app.post("/owners/{owner_id}/pets", status_code=201)
+    async def add_pet(owner_id: int, request: Request):
+        await delay()
+        owner = next((o for o in state["owners"] if o["id"] == owner_id), None)
+        if owner is None:
+            raise HTTPException(status_code=404, detail="Owner not found")
+        pet = await request.json()
+        type_id = pet.get("type", {}).get("id", 1)
+        pet.update({"id": state["next_pet_id"], "type": {"id": type_id, "name": PET_TYPES[(type_id - 1) % len(PET_TYPES)]}})
+        state["next_pet_id"] += 1
+        owner["pets"].append(pet)
+        return pet
+
+    @app.get("/vets")
+    async def list_vets():
+        await delay()
+        return state["vets"]
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--owners", type=int, default=1000, help="Number of synthetic owners")
+    parser.add_argument("--vets", type=int, default=100, help="Number of synthetic vets")
+    parser.add_argument("--latency-ms", type=float, default=10, help="Latency of every request")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.owners, args.vets, args.latency_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Load generator for the /chatclient endpoint.
+Runs a fixed number of requests at each concurrency level and reports latency
+percentiles, throughput and error rate as JSON.
+
+With --spawn, the fake OpenAI server, the fake customers/vets services and the
+service itself are started locally, so no API key or other service is needed.
+
+Usage:
+    python -m benchmark.load_test --spawn --concurrency 1,8,32 --requests 200 --output results.json
+    python -m benchmark.load_test --spawn --workers 4 --concurrency 32 --service-env VECTOR_STORE_BACKEND=numpy
+    python -m benchmark.load_test --spawn --concurrency 16 --llm-rpm-limit 600 --service-env LLM_RATE_LIMIT_RPM=600
+    python -m benchmark.load_test --spawn --concurrency 8 --llm-model-latency gpt-4o=900 --service-env OPENAI_STRONG_MODEL=gpt-4o
+    python -m benchmark.load_test --url http://localhost:8084 --concurrency 4,16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Mix of read-only questions; add write queries with --queries to exercise the write tools
+DEFAULT_QUERIES = [
+    "Which vets specialize in radiology?",
+    "Are there any vets that do surgery?",
+    "Tell me about the veterinarians at the clinic",
+    "List the owners in Madison",
+    "Show me the owners",
+    "Is there an owner named Franklin?",
+    "What can you help me with?",
+]
+
+# Answer text returned by the service when a turn fails
+ERROR_ANSWERS = ("Chat is currently unavailable",)
+
+
+def percentile(values, p):
+    return round(float(np.percentile(values, p)), 2) if values else None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def run_level(client: httpx.AsyncClient, url: str, queries: List[str], concurrency: int,
+                    requests: int, sessions: bool) -> dict:
+    """Send the requests with the given number of concurrent workers"""
+    latencies: List[float] = []
+    errors = 0
+    # Requests turned away by admission control (429 / 503); also counted as errors
+    shed = 0
+    remaining = iter(range(requests))
+    rng = random.Random(concurrency)
+
+    async def worker(worker_id: int):
+        nonlocal errors, shed
+        headers = {"Content-Type": "text/plain"}
+        if sessions:
+            headers["X-Session-Id"] = f"bench-{concurrency}-{worker_id}"
+        for _ in remaining:
+            query = rng.choice(queries)
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/chatclient", content=query.encode("utf-8"), headers=headers)
+                failed = response.status_code != 200 or response.text.startswith(ERROR_ANSWERS)
+                shed += response.status_code in (429, 503)
+            except httpx.HTTPError:
+                failed = True
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "shed": shed,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(float(np.mean(latencies)), 2) if latencies else None,
+            "max": round(max(latencies), 2) if latencies else None
+        }
+    }
+
+
+async def wait_ready(url: str, timeout: float, workers: int = 1):
+    """Wait until the service reports a ready chat client (on every worker, as far as polling can tell)"""
+    deadline = time.monotonic() + timeout
+    ready_pids = set()
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                # New connection per poll so that the polls spread over the workers
+                response = await client.get(f"{url}/actuator/health", headers={"Connection": "close"})
+                components = response.json().get("components", {}) if response.status_code == 200 else {}
+                if components.get("chatClient", {}).get("status") == "UP":
+                    ready_pids.add(components.get("worker", {}).get("details", {}).get("pid"))
+                    if len(ready_pids) >= workers:
+                        return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2 if ready_pids else 0.5)
+    raise TimeoutError(f"Service at {url} not ready after {timeout}s")
+
+
+@contextmanager
+def spawned_stack(args):
+    """Start the fake dependencies and the service; yields the service URL"""
+    workdir = tempfile.mkdtemp(prefix="bench-chat-")
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    fake_openai_url = f"http://127.0.0.1:{args.openai_port}/v1"
+    services_url = f"http://127.0.0.1:{args.services_port}"
+    service_env = {
+        **env,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": fake_openai_url,
+        "CUSTOMERS_SERVICE_URL": services_url,
+        "VETS_SERVICE_URL": services_url,
+        "WEB_CONCURRENCY": str(args.workers),
+    }
+    service_env.pop("AZURE_OPENAI_KEY", None)
+    for item in args.service_env:
+        key, _, value = item.partition("=")
+        service_env[key] = value
+
+    commands = [
+        ([sys.executable, "-m", "benchmark.fake_openai", "--port", str(args.openai_port),
+          "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+          "--rpm-limit", str(args.llm_rpm_limit), "--tpm-limit", str(args.llm_tpm_limit)]
+         + (["--parallel-tool-calls"] if args.llm_parallel_tool_calls else [])
+         + [f"--model-latency={item}" for item in args.llm_model_latency], env),
+        ([sys.executable, "-m", "benchmark.fake_services", "--port", str(args.services_port),
+          "--owners", str(args.owners), "--vets", str(args.vets), "--latency-ms", str(args.service_latency_ms)], env),
+        ([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.service_port),
+          "--workers", str(args.workers), "--log-level", "warning"], service_env),
+    ]
+    processes = []
+    print(f"Logs of the spawned processes are in {workdir}", file=sys.stderr)
+    try:
+        for command, command_env in commands:
+            log = open(Path(workdir) / f"{command[2].rsplit('.', 1)[-1]}.log", "w")
+            processes.append(subprocess.Popen(command, cwd=workdir, env=command_env, stdout=log, stderr=subprocess.STDOUT))
+            # Let the fakes bind their ports before the service starts loading data
+            time.sleep(1.0)
+        yield f"http://127.0.0.1:{args.service_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def _provider_stats(client: httpx.AsyncClient, args) -> Optional[dict]:
+    """Request counters of the spawned fake OpenAI server"""
+    if not args.spawn:
+        return None
+    try:
+        return (await client.get(f"http://127.0.0.1:{args.openai_port}/stats")).json()
+    except httpx.HTTPError:
+        return None
+
+
+async def run(args, url: str) -> dict:
+    await wait_ready(url, args.ready_timeout, args.workers if args.spawn else 1)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    levels = []
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        if args.warmup:
+            await run_level(client, url, queries, 1, args.warmup, args.sessions)
+        for concurrency in args.concurrency:
+            provider_before = await _provider_stats(client, args)
+            result = await run_level(client, url, queries, concurrency, args.requests, args.sessions)
+            provider_after = await _provider_stats(client, args)
+            if provider_before and provider_after:
+                # LLM requests that reached the fake provider and were answered with 429
+                result["provider_requests"] = provider_after["requests"] - provider_before["requests"]
+                result["provider_throttled"] = provider_after["throttled"] - provider_before["throttled"]
+            print(f"concurrency={concurrency}: {result['throughput_rps']} req/s, "
+                  f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                  f"p99={result['latency_ms']['p99']}ms errors={result['error_rate']:.2%}", file=sys.stderr)
+            levels.append(result)
+
+    return {
+        "benchmark": "chat_load",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "url": url,
+            "spawned": args.spawn,
+            "workers": args.workers if args.spawn else None,
+            "requests_per_level": args.requests,
+            "sessions": args.sessions,
+            "queries": len(queries),
+            "llm_latency_ms": args.llm_latency_ms if args.spawn else None,
+            "llm_rpm_limit": args.llm_rpm_limit if args.spawn else None,
+            "llm_tpm_limit": args.llm_tpm_limit if args.spawn else None,
+            "owners": args.owners if args.spawn else None,
+            "vets": args.vets if args.spawn else None,
+            "service_env": args.service_env
+        },
+        "results": levels
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8084", help="Service URL (ignored with --spawn)")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential warm-up requests (not reported)")
+    parser.add_argument("--queries", help="File with one query per line (defaults to a built-in mix)")
+    parser.add_argument("--sessions", action="store_true", help="Send a session id per worker")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write the JSON result to this file")
+
+    spawn = parser.add_argument_group("local stack (--spawn)")
+    spawn.add_argument("--spawn", action="store_true", help="Start fake dependencies and the service locally")
+    spawn.add_argument("--service-port", type=int, default=18084)
+    spawn.add_argument("--workers", type=int, default=1, help="Service worker processes (sets WEB_CONCURRENCY)")
+    spawn.add_argument("--openai-port", type=int, default=18090)
+    spawn.add_argument("--services-port", type=int, default=18091)
+    spawn.add_argument("--llm-latency-ms", type=float, default=300)
+    spawn.add_argument("--llm-jitter-ms", type=float, default=50)
+    spawn.add_argument("--llm-model-latency", action="append", default=[], metavar="MODEL=MS",
+                       help="Fake latency of a specific model, e.g. the strong tier")
+    spawn.add_argument("--llm-parallel-tool-calls", action="store_true",
+                       help="Let the fake model call several tools in one round")
+    spawn.add_argument("--llm-rpm-limit", type=float, default=0, help="Fake provider requests per minute quota")
+    spawn.add_argument("--llm-tpm-limit", type=float, default=0, help="Fake provider tokens per minute quota")
+    spawn.add_argument("--service-latency-ms", type=float, default=10)
+    spawn.add_argument("--owners", type=int, default=1000)
+    spawn.add_argument("--vets", type=int, default=100)
+    spawn.add_argument("--service-env", action="append", default=[], metavar="KEY=VALUE",
+                       help="Extra environment for the service, e.g. RESPONSE_CACHE_SIZE=0")
+    args = parser.parse_args()
+
+    if args.spawn:
+        with spawned_stack(args) as url:
+            result = asyncio.run(run(args, url))
+    else:
+        result = asyncio.run(run(args, args.url))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
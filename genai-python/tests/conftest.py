@@ -0,0 +1,67 @@
+"""
+Shared fixtures. The tests run without OpenAI or the Spring services: the chat model
+is scripted, downstream HTTP calls go to an in-process mock transport, and embeddings
+use the local backend.
+"""
+
+import os
+import asyncio
+
+import httpx
+import pytest
+
+# Read by module-level singletons, so set before the app modules are imported
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "numpy")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.pop("AZURE_OPENAI_KEY", None)
+
+from app.data_provider import DataProvider  # noqa: E402
+from app.vector_store import VectorStoreController  # noqa: E402
+from tests.fakes import FakeServices, ScriptedChatModel  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_workdir(tmp_path, monkeypatch):
+    """Vector store, embedding cache and state files are written relative to the working directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "0")
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh event loop"""
+    return asyncio.run
+
+
+@pytest.fixture
+def services():
+    return FakeServices()
+
+
+@pytest.fixture
+def data_provider(services):
+    provider = DataProvider()
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(services.handle))
+    return provider
+
+
+@pytest.fixture
+def vector_store_controller(data_provider):
+    controller = VectorStoreController(data_provider)
+    yield controller
+    controller.close()
+
+
+@pytest.fixture
+def make_chat_client(data_provider, vector_store_controller, monkeypatch):
+    """Build a PetclinicChatClient around scripted fast (and optionally strong) models"""
+    from app.chat_client import PetclinicChatClient
+
+    def make(fast: ScriptedChatModel, strong_model: ScriptedChatModel = None, state_backend=None):
+        monkeypatch.setattr(PetclinicChatClient, "_init_llm",
+                            lambda self, strong=False: strong_model if strong else fast)
+        return PetclinicChatClient(data_provider, vector_store_controller, state_backend)
+
+    return make
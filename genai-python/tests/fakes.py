@@ -0,0 +1,116 @@
+"""Scripted chat model and in-process customers / vets services for the tests"""
+
+import json
+import asyncio
+from typing import Callable, List, Optional, Union
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+Reply = Union[AIMessage, Exception, Callable[[List[BaseMessage]], AIMessage]]
+
+
+def tool_call(name: str, args: Optional[dict] = None, call_id: str = "call_1") -> dict:
+    return {"name": name, "args": args or {}, "id": call_id}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that replays a script of replies, one per call.
+    A reply may be an AIMessage, an exception to raise, or a function of the prompt messages.
+    Streaming splits the content into word chunks; stall_seconds delays every chunk and
+    fail_after_chunks makes the stream break off with an error.
+    """
+
+    replies: list
+    model_name: str = "scripted"
+    stall_seconds: float = 0.0
+    fail_after_chunks: Optional[int] = None
+    calls: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next(self, messages: List[BaseMessage]) -> AIMessage:
+        self.calls.append(messages)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply(messages) if callable(reply) else reply
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.stall_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._next(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next(messages)
+        for i, word in enumerate(message.content.split(" ") if message.content else []):
+            if i == self.fail_after_chunks:
+                raise RuntimeError("stream broke off")
+            await asyncio.sleep(self.stall_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(word + " ", chunk=chunk)
+            yield chunk
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ]))
+
+
+OWNERS = [
+    {"id": i, "firstName": first, "lastName": last, "address": "110 W. Liberty St.", "city": city,
+     "telephone": f"60855510{i:02d}",
+     "pets": [{"id": i, "name": f"Pet{i}", "birthDate": "2020-01-01", "type": {"id": 1, "name": "cat"}}]}
+    for i, (first, last, city) in enumerate([
+        ("George", "Franklin", "Madison"), ("Betty", "Davis", "Sun Prairie"),
+        ("Eduardo", "Rodriquez", "McFarland"), ("Harold", "Davis", "Windsor"),
+    ], start=1)
+]
+
+VETS = [
+    {"id": 1, "firstName": "James", "lastName": "Carter", "specialties": []},
+    {"id": 2, "firstName": "Helen", "lastName": "Leary", "specialties": [{"id": 1, "name": "radiology"}]},
+    {"id": 3, "firstName": "Linda", "lastName": "Douglas",
+     "specialties": [{"id": 2, "name": "surgery"}, {"id": 3, "name": "dentistry"}]},
+]
+
+
+class FakeServices:
+    """customers-service and vets-service behind an httpx.MockTransport"""
+
+    def __init__(self):
+        self.owners = [dict(owner) for owner in OWNERS]
+        self.vets = [dict(vet) for vet in VETS]
+        # Set to an HTTP status to make every request fail
+        self.fail_with: Optional[int] = None
+        self.requests: List[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fail_with:
+            return httpx.Response(self.fail_with, json={"error": "unavailable"})
+        path = request.url.path
+        if path == "/owners" and request.method == "GET":
+            return httpx.Response(200, json=self.owners)
+        if path == "/owners" and request.method == "POST":
+            owner = {**json.loads(request.content), "id": len(self.owners) + 1, "pets": []}
+            self.owners.append(owner)
+            return httpx.Response(201, json=owner)
+        if path.endswith("/pets") and request.method == "POST":
+            data = json.loads(request.content)
+            return httpx.Response(201, json={"id": 100, "name": data["name"], "birthDate": data["birthDate"],
+                                             "type": {"id": data["type"]["id"], "name": "cat"}})
+        if path == "/vets":
+            return httpx.Response(200, json=self.vets)
+        return httpx.Response(404)
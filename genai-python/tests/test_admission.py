@@ -0,0 +1,122 @@
+import gc
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+from app.main import _shed_response, _stream_response
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENCY", "1")
+    monkeypatch.setenv("ADMISSION_MAX_QUEUE", "3")
+    monkeypatch.setenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5")
+    return AdmissionController()
+
+
+async def _settle():
+    """Let the tasks started so far run up to their next wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slots_are_handed_to_waiters_in_arrival_order(controller, run):
+    async def scenario():
+        order = []
+        first = await controller.acquire()
+
+        async def request(name):
+            ticket = await controller.acquire()
+            order.append(name)
+            await asyncio.sleep(0)
+            ticket.release()
+
+        tasks = []
+        for name in ("a", "b", "c"):
+            tasks.append(asyncio.create_task(request(name)))
+            await _settle()
+        first.release()
+        # A newcomer arriving while others wait queues behind them
+        tasks.append(asyncio.create_task(request("late")))
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == ["a", "b", "c", "late"]
+    assert controller.in_flight == 0
+    assert controller.stats()["queued"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot(controller, run):
+    async def scenario():
+        holder = await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        handed_over = asyncio.create_task(controller.acquire())
+        await _settle()
+
+        queued.cancel()
+        await _settle()
+        assert controller.stats()["queued"] == 1
+
+        # The slot is handed to the second waiter, which is cancelled before it resumes
+        holder.release()
+        handed_over.cancel()
+        await asyncio.gather(queued, handed_over, return_exceptions=True)
+        assert controller.in_flight == 0
+
+        ticket = await asyncio.wait_for(controller.acquire(), 1)
+        ticket.release()
+
+    run(scenario())
+    assert controller.in_flight == 0
+    assert controller.stats()["queued"] == 0
+
+
+def test_full_queue_is_shed_with_429(controller, run):
+    async def scenario():
+        holder = await controller.acquire()
+
+        async def request():
+            (await controller.acquire()).release()
+
+        waiters = [asyncio.create_task(request()) for _ in range(3)]
+        await _settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        holder.release()
+        await asyncio.gather(*waiters)
+        return rejected.value
+
+    rejection = run(scenario())
+    assert (rejection.reason, rejection.status_code) == ("queue_full", 429)
+    response = _shed_response(rejection)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert controller.stats()["rejected"]["queue_full"] == 1
+
+
+def test_waiting_past_the_queue_timeout_is_shed_with_503(controller, run):
+    controller.queue_timeout_seconds = 0.01
+
+    async def scenario():
+        holder = await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        holder.release()
+        return rejected.value
+
+    rejection = run(scenario())
+    assert (rejection.reason, rejection.status_code) == ("queue_timeout", 503)
+    assert controller.in_flight == 0
+    assert controller.stats()["queued"] == 0
+
+
+def test_unstarted_streaming_response_releases_its_slot(controller, run):
+    ticket = run(controller.acquire())
+    response = _stream_response(None, ticket, "List all vets", None, False)
+    assert controller.in_flight == 1
+
+    # The client disconnected before the body was sent; the generator never ran
+    del ticket, response
+    gc.collect()
+    assert controller.in_flight == 0
@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.agent_middleware import ModelRouterMiddleware
+from tests.fakes import ScriptedChatModel, tool_call
+
+
+def test_tool_reporting_an_error_is_counted_as_failed(make_chat_client, services, run):
+    services.fail_with = 503
+    model = ScriptedChatModel(replies=[
+        AIMessage(content="", tool_calls=[tool_call("list_owners")]),
+        AIMessage(content="I couldn't reach the customers service."),
+    ])
+    client = make_chat_client(model)
+
+    run(client.chat("How many owners are there?"))
+    stats = client.tool_execution.stats()["list_owners"]
+    assert stats["calls"] == 1
+    assert stats["error"] == 1
+    assert stats["ok"] == 0
+
+
+def test_router_escalates_after_an_error_payload():
+    router = ModelRouterMiddleware(ScriptedChatModel(replies=[AIMessage(content="")]), write_tools=[])
+    messages = [
+        HumanMessage(content="How many owners are there?"),
+        AIMessage(content="", tool_calls=[tool_call("list_owners", call_id="call_1")]),
+        ToolMessage(content='{"error": "customers-service unavailable"}', tool_call_id="call_1", name="list_owners"),
+    ]
+    assert router.route(messages) == ("strong", "tool_error")
+
+
+def test_answer_after_a_failed_tool_call_comes_from_the_strong_model(make_chat_client, services, run):
+    services.fail_with = 503
+    fast = ScriptedChatModel(replies=[
+        AIMessage(content="", tool_calls=[tool_call("list_owners")]),
+        AIMessage(content="fast answer"),
+    ])
+    strong = ScriptedChatModel(replies=[AIMessage(content="The customers service is unavailable right now.")])
+    client = make_chat_client(fast, strong_model=strong)
+
+    assert run(client.chat("How many owners are there?")) == "The customers service is unavailable right now."
+    assert len(fast.calls) == 1
+    assert client.model_router.stats()["decisions"]["strong:tool_error"] == 1
+
+
+@pytest.mark.parametrize("question", ["Can I book an appointment with Dr. Leary?", "Did the vet schedule change?"])
+def test_write_words_alone_keep_dispatch_on_the_fast_model(question):
+    router = ModelRouterMiddleware(ScriptedChatModel(replies=[AIMessage(content="")]),
+                                   write_tools=["add_owner_to_petclinic", "add_pet_to_owner"])
+    assert router.route([HumanMessage(content=question)]) == ("fast", "lookup")
+
+    messages = [
+        HumanMessage(content="Add a dog named Rex to owner 1"),
+        AIMessage(content="", tool_calls=[tool_call("add_pet_to_owner", {"owner_id": 1}, "call_1")]),
+        ToolMessage(content='{"id": 14, "name": "Rex"}', tool_call_id="call_1", name="add_pet_to_owner"),
+    ]
+    assert router.route(messages[:1]) == ("fast", "lookup")
+    assert router.route(messages) == ("strong", "write")
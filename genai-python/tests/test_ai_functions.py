@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from app.ai_functions import AIFunctions
+
+
+@pytest.fixture
+def tools(data_provider, vector_store_controller):
+    return {tool.name: tool for tool in AIFunctions(data_provider, vector_store_controller).get_tools()}
+
+
+def test_list_owners_clamps_a_negative_offset(tools, run):
+    result = json.loads(run(tools["list_owners"].ainvoke({"offset": -5, "limit": 2})))
+
+    assert result["offset"] == 0
+    assert [owner["id"] for owner in result["owners"]] == [1, 2]
+    assert result["nextOffset"] == 2
+
+
+def test_list_owners_pages_with_next_offset(tools, run):
+    first = json.loads(run(tools["list_owners"].ainvoke({"limit": 3, "fields": "lastName"})))
+    second = json.loads(run(tools["list_owners"].ainvoke({"offset": first["nextOffset"], "limit": 0})))
+
+    assert first["total"] == 4 and first["more"] is True
+    assert [owner["id"] for owner in second["owners"]] == [4]
+    assert "more" not in second
+
+
+def test_tool_timeout_default_applies_to_read_tools(data_provider, vector_store_controller, monkeypatch):
+    monkeypatch.setenv("TOOL_TIMEOUT_SECONDS", "3")
+    monkeypatch.setenv("TOOL_TIMEOUT_LIST_VETS", "7")
+    timeouts = AIFunctions(data_provider, vector_store_controller).get_tool_timeouts()
+
+    assert timeouts["list_owners"] == timeouts["find_owner"] == 3.0
+    assert timeouts["list_vets"] == 7.0
+    assert timeouts["add_owner_to_petclinic"] == timeouts["add_pet_to_owner"] == 20.0
@@ -0,0 +1,89 @@
+import asyncio
+
+from app.cache import SingleFlightCache
+
+
+class GatedLoader:
+    """Loader whose calls block until released, returning the value current at release"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.gate = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.value
+        await self.gate.wait()
+        return value
+
+
+async def _settle():
+    """Let the tasks started so far run up to their next wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_misses_share_one_load(run):
+    cache = SingleFlightCache("test", ttl=30)
+
+    async def scenario():
+        loader = GatedLoader("owners")
+        readers = [asyncio.create_task(cache.get("all", loader)) for _ in range(5)]
+        await _settle()
+        loader.gate.set()
+        return loader.calls, await asyncio.gather(*readers)
+
+    calls, values = run(scenario())
+    assert calls == 1
+    assert values == ["owners"] * 5
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(run):
+    cache = SingleFlightCache("test", ttl=30, stale_ttl=60)
+
+    async def scenario():
+        loader = GatedLoader("old")
+        loader.gate.set()
+        await cache.get("all", loader)
+        cache._entries["all"].loaded_at -= 45
+
+        loader.value = "new"
+        served = [await cache.get("all", loader), await cache.get("all", loader)]
+        await _settle()
+        return loader.calls, served, await cache.get("all", loader)
+
+    calls, served, refreshed = run(scenario())
+    assert served == ["old", "old"]
+    assert calls == 2
+    assert refreshed == "new"
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_reader_after_invalidate_does_not_join_the_older_load(run):
+    cache = SingleFlightCache("test", ttl=30)
+
+    async def scenario():
+        before = GatedLoader("before write")
+        early = asyncio.create_task(cache.get("all", before))
+        await _settle()
+
+        cache.invalidate("all")
+        after = GatedLoader("after write")
+        late = asyncio.create_task(cache.get("all", after))
+        await _settle()
+
+        # The older load finishes first; it must neither be stored nor drop the newer load
+        before.gate.set()
+        early_value = await early
+        assert "all" in cache._inflight
+        after.gate.set()
+        return early_value, await late, await cache.get("all", after), after.calls
+
+    early_value, late_value, cached, calls = run(scenario())
+    assert early_value == "before write"
+    assert late_value == "after write"
+    assert cached == "after write"
+    assert calls == 1
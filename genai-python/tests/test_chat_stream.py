@@ -0,0 +1,50 @@
+import time
+
+from langchain_core.messages import AIMessage
+
+from tests.fakes import ScriptedChatModel, tool_call
+
+
+async def _collect(client, query):
+    return [event async for event in client.chat_stream(query)]
+
+
+def _text(events):
+    return "".join(event["data"] for event in events if event["event"] == "token")
+
+
+def test_stream_sends_only_the_final_answer(make_chat_client, run):
+    model = ScriptedChatModel(replies=[
+        AIMessage(content="Let me look up the owners first.", tool_calls=[tool_call("list_owners")]),
+        AIMessage(content="There are 4 owners."),
+    ])
+    client = make_chat_client(model)
+
+    events = run(_collect(client, "How many owners are there?"))
+
+    assert _text(events).strip() == "There are 4 owners."
+    assert events[-1]["event"] == "done"
+
+
+def test_stream_drops_text_of_a_retried_round(make_chat_client, run):
+    strong = ScriptedChatModel(model_name="strong", replies=[AIMessage(content="Strong answer.")])
+    fast = ScriptedChatModel(model_name="fast", replies=[AIMessage(content="Partial fast answer that breaks off")],
+                             fail_after_chunks=3)
+    client = make_chat_client(fast, strong)
+
+    events = run(_collect(client, "Which vets are there?"))
+
+    assert _text(events).strip() == "Strong answer."
+
+
+def test_stalled_model_stream_ends_at_the_turn_deadline(make_chat_client, run, monkeypatch):
+    monkeypatch.setenv("AGENT_TURN_DEADLINE_SECONDS", "0.3")
+    model = ScriptedChatModel(replies=[AIMessage(content="never finishes")], stall_seconds=5)
+    client = make_chat_client(model)
+
+    start = time.perf_counter()
+    events = run(_collect(client, "hello"))
+
+    assert time.perf_counter() - start < 2
+    assert [event["event"] for event in events] == ["error"]
+    assert "took too long" in events[0]["data"]
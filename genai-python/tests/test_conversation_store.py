@@ -0,0 +1,76 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.conversation_store import ConversationStore
+
+
+def _turn(question: str, answer: str = "ok"):
+    return [HumanMessage(content=question), AIMessage(content=answer)]
+
+
+def test_sessions_do_not_share_history(run):
+    store = ConversationStore()
+
+    async def scenario():
+        await store.save_history("alice", _turn("Who owns Leo?"))
+        await store.save_history("bob", _turn("List the vets"))
+        return await store.get_history("alice"), await store.get_history("bob"), await store.get_history("carol")
+
+    alice, bob, carol = run(scenario())
+    assert [m.content for m in alice] == ["Who owns Leo?", "ok"]
+    assert [m.content for m in bob] == ["List the vets", "ok"]
+    assert carol == []
+
+
+def test_least_recently_used_session_is_evicted(run, monkeypatch):
+    monkeypatch.setenv("CONVERSATION_MAX_SESSIONS", "2")
+    store = ConversationStore()
+
+    async def scenario():
+        await store.save_history("a", _turn("first"))
+        await store.save_history("b", _turn("second"))
+        store.get_session("a")
+        await store.save_history("c", _turn("third"))
+
+    run(scenario())
+    assert list(store._sessions) == ["a", "c"]
+    assert store.evictions == 1
+
+
+def test_idle_sessions_expire(run, monkeypatch):
+    monkeypatch.setenv("CONVERSATION_TTL_SECONDS", "60")
+    store = ConversationStore()
+    run(store.save_history("idle", _turn("hello")))
+    store._sessions["idle"].last_access -= 61
+
+    store.get_session("active")
+    assert run(store.get_history("idle")) == []
+    assert list(store._sessions) == ["active"]
+
+
+def test_total_size_cap_evicts_other_sessions(run, monkeypatch):
+    monkeypatch.setenv("CONVERSATION_MAX_TOTAL_CHARS", "100")
+    store = ConversationStore()
+
+    async def scenario():
+        await store.save_history("a", _turn("x" * 40))
+        await store.save_history("b", _turn("y" * 40))
+        # Over the cap: the older session goes, the one just saved is kept
+        await store.save_history("c", _turn("z" * 40))
+
+    run(scenario())
+    assert list(store._sessions) == ["b", "c"]
+    assert (run(store.stats()))["total_chars"] == 2 * (40 + 2)
+
+
+def test_reset_only_clears_the_given_session(run):
+    store = ConversationStore()
+
+    async def scenario():
+        await store.save_history("a", _turn("first"))
+        await store.save_history("b", _turn("second"))
+        await store.reset("a")
+        return await store.get_history("a"), await store.get_history("b")
+
+    a, b = run(scenario())
+    assert a == []
+    assert len(b) == 2
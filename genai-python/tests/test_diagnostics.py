@@ -0,0 +1,27 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.diagnostics import diagnostics
+from tests.fakes import ScriptedChatModel
+
+
+@pytest.fixture(autouse=True)
+def diagnostics_off():
+    diagnostics.configure(enabled=False)
+    yield
+    diagnostics.configure(enabled=False)
+
+
+def test_agent_callbacks_are_attached_only_while_enabled(make_chat_client, run, monkeypatch):
+    client = make_chat_client(ScriptedChatModel(replies=[AIMessage(content="Hello!")]))
+    model_starts = []
+    monkeypatch.setattr(client.diagnostics_handler, "on_chat_model_start",
+                        lambda *args, **kwargs: model_starts.append(kwargs["run_id"]))
+
+    run(client.chat("Hi there"))
+    assert model_starts == []
+
+    # Switching at runtime takes effect on the next run
+    diagnostics.configure(enabled=True)
+    run(client.chat("Hi again"))
+    assert len(model_starts) == 1
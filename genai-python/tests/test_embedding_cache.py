@@ -0,0 +1,61 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.embedding_cache import CachedEmbeddings, create_cached_embeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path, run):
+    path = str(tmp_path / "cache" / "query.sqlite3")
+    first = CachedEmbeddings(CountingEmbeddings(), "model", disk_path=path)
+    run(first.aembed_query("Radiology vets"))
+
+    model = CountingEmbeddings()
+    second = CachedEmbeddings(model, "model", disk_path=path)
+    assert run(second.aembed_query("radiology  VETS")) == [14.0, 1.0]
+    assert model.calls == 0
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_unreadable_disk_tier_falls_back_to_the_model(tmp_path, run):
+    path = tmp_path / "query.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, "model", disk_path=str(path))
+
+    assert run(cache.aembed_query("surgery")) == [7.0, 1.0]
+    assert model.calls == 1
+
+
+def test_disk_errors_during_a_query_count_as_a_miss(tmp_path, run):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, "model", disk_path=str(tmp_path / "query.sqlite3"))
+    # Every later use of the connection raises sqlite3.ProgrammingError
+    cache._db.close()
+
+    assert run(cache.aembed_query("dentistry")) == [9.0, 1.0]
+    assert cache.embed_query("dentistry") == [9.0, 1.0]
+    assert model.calls == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_only_remote_providers_are_cached(tmp_path, monkeypatch):
+    model = CountingEmbeddings()
+    monkeypatch.setenv("EMBEDDING_PROVIDER", "local")
+    assert create_cached_embeddings(model, "local:hashing-512", str(tmp_path / "vectorstore")) is model
+
+    monkeypatch.setenv("EMBEDDING_PROVIDER", "openai")
+    cached = create_cached_embeddings(model, "text-embedding-3-small", str(tmp_path / "vectorstore"))
+    assert isinstance(cached, CachedEmbeddings)
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.history import SUMMARY_PREFIX, HistoryManager
+from app.tokens import estimate_message_tokens
+from tests.fakes import tool_call
+
+
+def _turn(n: int, tool_output_chars: int = 2000):
+    call_id = f"call_{n}"
+    return [
+        HumanMessage(content=f"Question {n} about owner {n}?"),
+        AIMessage(content="", tool_calls=[tool_call("list_owners", {"limit": 10}, call_id)]),
+        ToolMessage(content=json.dumps({"owners": "x" * tool_output_chars}), tool_call_id=call_id, name="list_owners"),
+        AIMessage(content=f"Answer {n}: owner {n} has two pets."),
+    ]
+
+
+def _conversation(turns: int, **kwargs):
+    return [message for n in range(turns) for message in _turn(n, **kwargs)]
+
+
+def _assert_tool_pairs_intact(messages):
+    """Every tool call is answered by a ToolMessage, and every ToolMessage answers a preceding call"""
+    pending = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            assert not pending, "tool calls left without results"
+            pending = {call["id"] for call in message.tool_calls}
+        elif isinstance(message, ToolMessage):
+            assert message.tool_call_id in pending, "tool result without its tool call"
+            pending.discard(message.tool_call_id)
+    assert not pending
+
+
+def _tokens(messages):
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+@pytest.fixture
+def history(monkeypatch):
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "1500")
+    monkeypatch.setenv("HISTORY_KEEP_TURNS", "3")
+    monkeypatch.setenv("HISTORY_TOOL_OUTPUT_TOKENS", "150")
+    return HistoryManager()
+
+
+@pytest.mark.parametrize("turns, tool_output_chars", [(2, 200), (5, 2000), (20, 2000), (8, 20000)])
+def test_compacted_history_keeps_tool_pairs_and_budget(history, turns, tool_output_chars):
+    kept = history.for_prompt(_conversation(turns, tool_output_chars=tool_output_chars))
+
+    _assert_tool_pairs_intact(kept)
+    assert _tokens(kept) <= history.token_budget
+    assert isinstance(kept[0], HumanMessage)
+    # The latest turn is always kept, with its tool call
+    assert kept[-1].content == f"Answer {turns - 1}: owner {turns - 1} has two pets."
+    assert any(isinstance(m, ToolMessage) and m.tool_call_id == f"call_{turns - 1}" for m in kept)
+
+
+def test_older_turns_are_condensed_to_question_and_answer(history):
+    kept = history.for_prompt(_conversation(5, tool_output_chars=100))
+
+    assert [m.content for m in kept[:4]] == ["Question 0 about owner 0?", "Answer 0: owner 0 has two pets.",
+                                             "Question 1 about owner 1?", "Answer 1: owner 1 has two pets."]
+    assert sum(isinstance(m, ToolMessage) for m in kept) == 3
+
+
+def test_summary_is_placed_once_at_the_start(run, monkeypatch):
+    monkeypatch.setenv("HISTORY_TOKEN_BUDGET", "600")
+    monkeypatch.setenv("HISTORY_SUMMARY_ENABLED", "true")
+    prompts = []
+
+    async def summarizer(prompt):
+        prompts.append(prompt)
+        return f"Summary {len(prompts)}"
+
+    history = HistoryManager(summarizer)
+    stored = []
+    for n in range(12):
+        stored = run(history.for_storage(stored + _turn(n)))
+        summaries = [m for m in stored if isinstance(m, SystemMessage)]
+        assert len(summaries) <= 1
+        if summaries:
+            assert stored[0] is summaries[0]
+            assert stored[0].content.startswith(SUMMARY_PREFIX)
+        _assert_tool_pairs_intact(stored)
+        assert _tokens(stored) <= history.token_budget
+
+    assert history.summaries == len(prompts) > 0
+    assert stored[0].content == f"{SUMMARY_PREFIX}Summary {len(prompts)}"
+    # Later summaries build on the previous one
+    assert f"Summary {len(prompts) - 1}" in prompts[-1]
+
+    # Compacting the stored history for the next prompt keeps the single summary in front
+    kept = history.for_prompt(stored)
+    assert [m for m in kept if isinstance(m, SystemMessage)] == [stored[0]]
+    assert kept[0] is stored[0]
@@ -0,0 +1,114 @@
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings import HashingEmbeddings
+from app.ingestion import IngestionPipeline
+from tests.fakes import FakeServices
+
+SPECIALTIES = ["radiology", "surgery", "dentistry", "cardiology", "dermatology", "oncology"]
+
+
+def synthetic_vets(count: int) -> List[dict]:
+    return [
+        {"id": i, "firstName": f"Vet{i}", "lastName": f"Surname{i % 97}",
+         "specialties": [{"id": j, "name": SPECIALTIES[j]} for j in range(i % 3)]}
+        for i in range(1, count + 1)
+    ]
+
+
+class FailingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        raise RuntimeError("provider unavailable")
+
+
+def test_synthetic_catalog_is_ingested_in_bounded_batches(data_provider, vector_store_controller, services, run):
+    services.vets = synthetic_vets(1000)
+    data_provider.vets_cache.invalidate("all")
+
+    run(vector_store_controller.load_vector_store_on_startup())
+
+    assert vector_store_controller.vector_store.count() == 1000
+    stats = vector_store_controller.last_ingestion
+    assert stats["documents"] == 1000
+    assert stats["batches"] == 16  # 64 documents per batch
+    assert stats["failed_batches"] == 0
+
+    # A second start only embeds what changed
+    services.vets[0]["specialties"] = [{"id": 9, "name": "ophthalmology"}]
+    services.vets.append(synthetic_vets(1001)[-1])
+    data_provider.vets_cache.invalidate("all")
+    result = run(vector_store_controller.synchronizer.sync())
+    assert (result["added"], result["changed"]) == (1, 1)
+    assert vector_store_controller.last_ingestion["documents"] == 2
+
+
+def test_pipeline_holds_at_most_concurrency_batches(run):
+    in_flight, peak, written = 0, 0, []
+
+    async def writer(documents, embeddings):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        written.extend(documents)
+        in_flight -= 1
+
+    documents = (Document(page_content=f"vet {i}") for i in range(500))
+    pipeline = IngestionPipeline(HashingEmbeddings(dimensions=32), writer, batch_size=10, concurrency=3)
+    stats = run(pipeline.run(documents, total=500))
+
+    assert len(written) == 500
+    assert stats.batches == 50
+    assert peak <= 3
+
+
+def test_embedding_failures_are_not_retried_per_batch(run):
+    embeddings = FailingEmbeddings()
+
+    async def writer(documents, vectors):
+        pass
+
+    pipeline = IngestionPipeline(embeddings, writer, batch_size=10, max_retries=3, retry_base_delay=0)
+    with pytest.raises(RuntimeError):
+        run(pipeline.run(Document(page_content=f"vet {i}") for i in range(30)))
+
+    # One attempt per batch; retries belong to the embeddings' rate limiter
+    assert embeddings.calls == 3
+
+
+def test_failed_writes_are_retried_without_embedding_again(run):
+    embed_calls, attempts = 0, 0
+
+    class CountingEmbeddings(HashingEmbeddings):
+        async def aembed_documents(self, texts):
+            nonlocal embed_calls
+            embed_calls += 1
+            return self.embed_documents(texts)
+
+    async def flaky_writer(documents, vectors):
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise OSError("index busy")
+
+    pipeline = IngestionPipeline(CountingEmbeddings(dimensions=16), flaky_writer, batch_size=10,
+                                 max_retries=3, retry_base_delay=0)
+    stats = run(pipeline.run(Document(page_content=f"vet {i}") for i in range(10)))
+
+    assert stats.documents == 10
+    assert stats.retries == 2
+    assert embed_calls == 1
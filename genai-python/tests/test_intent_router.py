@@ -0,0 +1,57 @@
+import pytest
+
+from app.ai_functions import AIFunctions
+from app.intent_router import IntentRouter
+
+
+@pytest.fixture
+def router(data_provider, vector_store_controller, services, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "true")
+    services.vets.append({"id": 4, "firstName": "Rafael", "lastName": "Ortega",
+                          "specialties": [{"id": 4, "name": "dental surgery"}]})
+    tools = AIFunctions(data_provider, vector_store_controller).get_tools()
+    return IntentRouter(tools, data_provider)
+
+
+def test_unique_specialty_prefix_is_answered(router, run):
+    answer = run(router.route("Which vets do radio?"))
+
+    assert answer.startswith("These veterinarians specialize in radiology")
+    assert "Leary" in answer
+
+
+def test_exact_specialty_wins_over_longer_prefix_matches(router, run):
+    answer = run(router.route("Which vets do dentistry?"))
+
+    assert answer.startswith("These veterinarians specialize in dentistry")
+    assert "Douglas" in answer and "Ortega" not in answer
+
+
+def test_ambiguous_specialty_prefix_is_left_to_the_agent(router, run):
+    assert run(router.route("Which vets do dent?")) is None
+    assert router.stats()["deferred"] == 1
+
+
+def _radiologists(count: int):
+    return [{"id": 100 + i, "firstName": f"Vet{i}", "lastName": "Ray", "specialties": [{"id": 2, "name": "radiology"}]}
+            for i in range(count)]
+
+
+def test_specialty_list_is_never_truncated(router, services, data_provider, run):
+    services.vets.extend(_radiologists(59))
+    router.max_items = 100
+
+    answer = run(router.route("Which vets do radiology?"))
+    assert answer.count("\n- Dr.") == 60
+
+    router.max_items = 50
+    assert run(router.route("Which vets do radiology?")) is None
+
+
+def test_long_vet_list_is_left_to_the_agent(router, services, data_provider, run):
+    assert run(router.route("List all vets")).count("\n- Dr.") == 4
+
+    services.vets.extend(_radiologists(router.max_items))
+    data_provider.vets_cache.invalidate("all")
+    assert run(router.route("List all vets")) is None
+    assert router.stats()["deferred"] == 1
@@ -0,0 +1,59 @@
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.diagnostics import diagnostics
+from app.main import app
+from tests.fakes import ScriptedChatModel
+
+
+async def _post_diagnostics(body):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.post("/actuator/diagnostics", json=body)
+
+
+@pytest.fixture(autouse=True)
+def diagnostics_off():
+    diagnostics.configure(enabled=False)
+    yield
+    diagnostics.configure(enabled=False, level="DEBUG", sample_rate=1.0)
+
+
+@pytest.mark.parametrize("body", [
+    {"enabled": "false"},
+    {"enabled": 0.0001},
+    {"enabled": 1},
+    {"enabled": True, "sample_rate": "0.5"},
+    ["enabled"],
+])
+def test_diagnostics_rejects_values_of_the_wrong_type(body, run):
+    response = run(_post_diagnostics(body))
+
+    assert response.status_code == 400
+    assert diagnostics.enabled is False
+
+
+def test_diagnostics_can_be_switched_on_and_off(run):
+    assert run(_post_diagnostics({"enabled": True, "sample_rate": 0.5})).json()["enabled"] is True
+    assert run(_post_diagnostics({"enabled": False})).json()["enabled"] is False
+
+
+def test_reset_requires_a_session_id(make_chat_client, run, monkeypatch):
+    client = make_chat_client(ScriptedChatModel(replies=[AIMessage(content="ok")]))
+    monkeypatch.setattr(app.state, "chat_client", client, raising=False)
+    history = [HumanMessage(content="hi"), AIMessage(content="ok")]
+
+    async def scenario():
+        await client.conversation_store.save_history("a", history)
+        await client.conversation_store.save_history("b", history)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            anonymous = await http.post("/chat/reset")
+            own = await http.post("/chat/reset", headers={"X-Session-Id": "a"})
+        return anonymous, own, await client.conversation_store.get_history("a"), \
+            await client.conversation_store.get_history("b")
+
+    anonymous, own, a, b = run(scenario())
+    assert anonymous.status_code == 400
+    assert own.status_code == 200
+    assert a == []
+    assert len(b) == 2
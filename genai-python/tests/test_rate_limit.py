@@ -0,0 +1,138 @@
+import pytest
+
+from app import rate_limit
+from app.rate_limit import RateLimiter, RateLimitExceeded, TokenBucket, classify_error, parse_retry_hint
+
+
+class FakeClock:
+    """Replaces time.monotonic / time.sleep in the rate limiter; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int, headers: dict = None, code: str = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.code = code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    # No jitter: backoff delays are their lower bound
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: low)
+    return clock
+
+
+def _limiter(monkeypatch, **env) -> RateLimiter:
+    for name, value in env.items():
+        monkeypatch.setenv(f"TEST_LIMIT_{name}", str(value))
+    return RateLimiter("test", "TEST_LIMIT")
+
+
+def test_bucket_reserves_in_arrival_order_and_refills(clock):
+    bucket = TokenBucket(per_minute=60, burst_seconds=10)
+    assert bucket.capacity == 10
+
+    assert bucket.reserve(10, scale=1.0) == 0.0
+    # The bucket goes into debt; each caller waits for its own share of the refill
+    assert bucket.reserve(1, scale=1.0) == pytest.approx(1.0)
+    assert bucket.reserve(1, scale=1.0) == pytest.approx(2.0)
+
+    clock.now += 5
+    assert bucket.reserve(1, scale=1.0) == 0.0
+    # A lowered send rate stretches the wait
+    assert bucket.reserve(3, scale=0.5) == pytest.approx(2.0)
+    # Reservations larger than the bucket are capped at its capacity
+    assert bucket.reserve(1000, scale=1.0) == pytest.approx(11.0)
+
+
+def test_settle_refunds_overestimated_tokens(clock, monkeypatch):
+    limiter = _limiter(monkeypatch, TPM=600)
+
+    assert limiter._reserve(100) == 0.0
+    assert limiter._reserve(100) == pytest.approx(10.0)
+    limiter._settle(estimated=100, actual=10)
+    assert limiter._reserve(10) == pytest.approx(2.0)
+
+
+def test_wait_beyond_the_max_is_rejected_and_refunded(clock, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_MAX_WAIT_SECONDS", "5")
+    limiter = _limiter(monkeypatch, RPM=60)
+
+    for _ in range(10):
+        limiter._reserve(0)
+    assert limiter._reserve(0) == pytest.approx(1.0)
+    with pytest.raises(RateLimitExceeded):
+        for _ in range(10):
+            limiter._reserve(0)
+    # The rejected reservation was given back, so one second later the next call fits
+    clock.now += 1
+    assert limiter._reserve(0) == pytest.approx(5.0)
+    assert limiter.rejected == 1
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500", "retry-after": "9"}, 1.5),
+    ({"retry-after": "2"}, 2.0),
+    ({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "1m30s",
+      "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "250ms"}, 90.0),
+    ({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT",
+      "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "6s"}, 6.0),
+    ({"x-ratelimit-remaining-tokens": "12", "x-ratelimit-reset-tokens": "30s"}, None),
+    ({}, None),
+    (None, None),
+])
+def test_retry_hint_parsing(headers, expected):
+    assert parse_retry_hint(headers) == expected
+
+
+def test_error_classification():
+    assert classify_error(ProviderError(429, {"retry-after": "3"})) == (True, True, 3.0)
+    assert classify_error(ProviderError(429, code="insufficient_quota")) == (False, True, None)
+    assert classify_error(ProviderError(503)) == (True, False, None)
+    assert classify_error(ProviderError(400)) == (False, False, None)
+    assert classify_error(ConnectionError("reset")) == (True, False, None)
+    assert classify_error(ValueError("bad")) == (False, False, None)
+
+
+def test_provider_429_pauses_every_caller_and_lowers_the_rate(clock, monkeypatch):
+    limiter = _limiter(monkeypatch, RPM=600)
+    responses = [ProviderError(429, {"retry-after": "2"}), "ok"]
+
+    def call():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call_sync(call, estimated_tokens=10) == "ok"
+    assert clock.sleeps == [pytest.approx(2.0)]
+    assert (limiter.provider_throttled, limiter.retries) == (1, 1)
+    # Lowered once, then recovering by one step with the successful call
+    assert limiter._scale == pytest.approx(0.8 + RateLimiter.RECOVERY_STEP)
+
+    # Another caller arriving during a pause waits it out too
+    limiter._backoff(ProviderError(429, {"retry-after": "4"}), attempt=0)
+    assert limiter._reserve(10) == pytest.approx(4.0)
+
+
+def test_quota_is_split_between_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    limiter = _limiter(monkeypatch, RPM=400, TPM=100000)
+
+    assert (limiter.rpm, limiter.tpm) == (100.0, 25000.0)
+    assert limiter.stats()["workers"] == 4
@@ -0,0 +1,40 @@
+from langchain_core.messages import AIMessage
+
+from tests.fakes import ScriptedChatModel, tool_call
+
+
+def _owners_model():
+    return ScriptedChatModel(replies=[
+        AIMessage(content="", tool_calls=[tool_call("list_owners")]),
+        lambda messages: AIMessage(content="I couldn't reach the customers service."
+                                   if '"error"' in messages[-1].content else "There are 4 owners."),
+    ])
+
+
+def test_answers_of_read_only_turns_are_cached(make_chat_client, data_provider, run, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "16")
+    model = _owners_model()
+    client = make_chat_client(model)
+    # Answers computed while the owner cache was first filled are not stored
+    run(data_provider.get_all_owners())
+
+    assert run(client.chat("How many owners are there?")) == "There are 4 owners."
+    calls = len(model.calls)
+    assert run(client.chat("how many owners are there?")) == "There are 4 owners."
+    assert len(model.calls) == calls
+
+
+def test_turn_with_a_failed_tool_call_is_not_cached(make_chat_client, services, run, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "16")
+    services.fail_with = 503
+    model = _owners_model()
+    client = make_chat_client(model)
+
+    assert run(client.chat("How many owners are there?")) == "I couldn't reach the customers service."
+    assert run(client.response_cache.stats())["stores"] == 0
+    assert run(client.response_cache.stats())["bypassed"] == 1
+
+    # Once the service is back, the next user gets a fresh answer rather than the failure
+    services.fail_with = None
+    model.replies[:] = _owners_model().replies
+    assert run(client.chat("How many owners are there?")) == "There are 4 owners."
@@ -0,0 +1,84 @@
+import threading
+
+import httpx
+
+from app.data_provider import DataProvider
+from app.models import OwnerRequest
+from app.shared_state import SQLiteStateBackend
+
+
+def _broken_backend(tmp_path) -> SQLiteStateBackend:
+    backend = SQLiteStateBackend(str(tmp_path / "state.sqlite3"))
+    backend._db.close()
+    return backend
+
+
+def test_sqlite_errors_fall_back_to_defaults(tmp_path, run):
+    backend = _broken_backend(tmp_path)
+
+    backend.set("sessions", "a", [1])
+    backend.delete("sessions", "a")
+    backend.clear("sessions")
+    assert backend.get("sessions", "a") is None
+    assert backend.count("sessions") == 0
+    assert backend.increment("versions", "owners") is None
+    assert backend.counter("versions", "owners") == 0
+    assert run(backend.acounter("versions", "owners")) == 0
+    assert backend.stats()["errors"] == 8
+
+
+def test_async_calls_run_off_the_event_loop(tmp_path, run, monkeypatch):
+    backend = SQLiteStateBackend(str(tmp_path / "state.sqlite3"))
+    threads = []
+    get = backend.get
+    monkeypatch.setattr(backend, "get", lambda *args: threads.append(threading.current_thread()) or get(*args))
+
+    async def roundtrip():
+        await backend.aset("sessions", "a", {"turns": 1})
+        return await backend.aget("sessions", "a")
+
+    assert run(roundtrip()) == {"turns": 1}
+    assert threads and threads[0] is not threading.main_thread()
+    backend.close()
+
+
+def test_owner_write_succeeds_when_shared_state_fails(tmp_path, services, run):
+    provider = DataProvider(state=_broken_backend(tmp_path))
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(services.handle))
+    request = OwnerRequest(firstName="Jean", lastName="Coleman", address="105 N. Lake St.",
+                           city="Monona", telephone="6085552654")
+
+    async def add_and_list():
+        await provider.get_all_owners()
+        owner = await provider.add_owner(request)
+        return owner, await provider.get_all_owners()
+
+    owner, owners = run(add_and_list())
+    assert owner.lastName == "Coleman"
+    # The cached list could not be patched safely, so it was reloaded from the service
+    assert [o.id for o in owners] == [o["id"] for o in services.owners]
+    assert len([r for r in services.requests if r.method == "POST"]) == 1
+
+
+def test_refreshed_vets_change_the_version_of_every_worker(tmp_path, services, run):
+    def worker():
+        provider = DataProvider(state=SQLiteStateBackend(str(tmp_path / "state.sqlite3")))
+        provider.client = httpx.AsyncClient(transport=httpx.MockTransport(services.handle))
+        return provider
+
+    first, second = worker(), worker()
+
+    async def scenario():
+        await first.get_all_vets()
+        await second.get_all_vets()
+        before = await second.data_version()
+
+        # The vet list changes upstream; only the first worker's refresh sees it
+        services.vets = services.vets[:1]
+        first.vets_cache.invalidate("all")
+        await first.get_all_vets()
+        return before, await second.data_version(), await second.get_all_vets()
+
+    before, after, vets = run(scenario())
+    assert before != after
+    assert len(vets) == 1
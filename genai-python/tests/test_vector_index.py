@@ -0,0 +1,69 @@
+import numpy as np
+
+from app.vector_index import NumpyVectorIndex
+
+
+def _vector(i: int, dimension: int = 8):
+    vector = np.zeros(dimension, dtype=np.float32)
+    vector[i % dimension] = 1.0
+    vector[(i + 1) % dimension] = 0.1 * (i // dimension + 1)
+    return vector.tolist()
+
+
+def _upsert(index, numbers, version="v1"):
+    index.upsert(
+        ids=[f"vet-{i}" for i in numbers],
+        embeddings=[_vector(i) for i in numbers],
+        metadatas=[{"id": str(i), "content_hash": version} for i in numbers],
+        documents=[f"Vet {i} {version}" for i in numbers]
+    )
+
+
+def test_upsert_delete_persist_and_reload_round_trip(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), "vets")
+    for start in range(0, 300, 25):
+        _upsert(index, range(start, start + 25))
+    _upsert(index, [3], version="v2")
+    index.delete(["vet-4", "vet-unknown"])
+    _upsert(index, [300])
+
+    assert index.count() == 300
+    assert index.get_all()["vet-3"]["content_hash"] == "v2"
+    assert "vet-4" not in index.get_all()
+    assert index.query(_vector(3), 1) == ["Vet 3 v2"]
+
+    index.persist()
+    replica = NumpyVectorIndex(str(tmp_path), "vets")
+    assert replica.get_all() == index.get_all()
+    for i in (0, 3, 150, 300):
+        assert replica.query(_vector(i), 3) == index.query(_vector(i), 3)
+
+    # A replica picks up later versions, and can write on top of the mapped file
+    _upsert(index, [301])
+    index.persist()
+    assert replica.reload()
+    _upsert(replica, [302])
+    assert replica.count() == 302
+
+
+def test_appends_grow_the_buffer_geometrically(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), "vets")
+    buffers = set()
+    for start in range(0, 1000, 10):
+        _upsert(index, range(start, start + 10))
+        buffers.add(id(index._buffer))
+
+    assert index.count() == 1000
+    assert len(buffers) <= 6
+
+
+def test_query_snapshot_is_unaffected_by_later_writes(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), "vets")
+    _upsert(index, range(10))
+    matrix, documents = index._snapshot
+
+    _upsert(index, range(10, 20))
+    index.delete(["vet-0"])
+
+    assert matrix.shape[0] == 10
+    assert documents[:10] == [f"Vet {i} v1" for i in range(10)]
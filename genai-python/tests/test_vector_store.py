@@ -0,0 +1,72 @@
+import time
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.vector_index import get_vector_index_backend_name
+from app.vector_store import VectorStoreController
+
+
+class SlowIndex:
+    """Index whose (blocking) query takes a while, like a large Chroma collection"""
+
+    backend = "numpy"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def query(self, embedding: List[float], top_k: int) -> List[str]:
+        time.sleep(self.seconds)
+        return ['{"id": 3, "firstName": "Linda", "lastName": "Douglas"}']
+
+
+class StaticEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_slow_vector_search_does_not_block_other_requests(vector_store_controller, run):
+    vector_store_controller.vector_store = SlowIndex(0.5)
+    vector_store_controller.embeddings = StaticEmbeddings()
+
+    async def scenario():
+        gaps = []
+
+        async def heartbeat():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(heartbeat())
+        results = await vector_store_controller.asearch_vets("someone gentle with anxious cats")
+        ticker.cancel()
+        return results, gaps
+
+    results, gaps = run(scenario())
+
+    assert "Douglas" in results[0]
+    # The loop kept serving other work while the index query ran in the search executor
+    assert len(gaps) > 20
+    assert max(gaps) < 0.2
+
+
+def test_several_workers_use_the_numpy_index_unless_chroma_is_forced(data_provider, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "auto")
+    assert get_vector_index_backend_name() == "numpy"
+
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "chroma")
+    with pytest.raises(RuntimeError):
+        VectorStoreController(data_provider)
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "auto")
+    assert get_vector_index_backend_name() == "chroma"
@@ -0,0 +1,33 @@
+import pytest
+
+from app.vector_index import create_vector_index
+from tests.test_ingestion import synthetic_vets
+
+
+def test_rows_written_before_a_failed_sync_are_persisted(data_provider, vector_store_controller, services, run):
+    services.vets = synthetic_vets(10)
+    data_provider.vets_cache.invalidate("all")
+    run(vector_store_controller.load_vector_store_on_startup())
+
+    index = vector_store_controller.vector_store
+    upsert = index.upsert
+    writes = 0
+
+    def upsert_first_batch_only(*args, **kwargs):
+        nonlocal writes
+        writes += 1
+        if writes > 1:
+            raise OSError("disk full")
+        upsert(*args, **kwargs)
+
+    index.upsert = upsert_first_batch_only
+    vector_store_controller.ingestion.max_retries = 0
+    vector_store_controller.ingestion.concurrency = 1
+    services.vets = synthetic_vets(200)
+    data_provider.vets_cache.invalidate("all")
+    with pytest.raises(RuntimeError):
+        run(vector_store_controller.synchronizer.sync())
+
+    # A read-only worker loads what the writer persisted
+    replica = create_vector_index(vector_store_controller.persist_directory, vector_store_controller.collection_name)
+    assert replica.count() == index.count() == 10 + 64